@@ -0,0 +1,201 @@
+# Model backends for the agent loop
+# generate_content only needs an object shaped like genai.Client: something with
+# client.models.generate_content(...) (and client.aio.models.generate_content_stream(...)
+# for --stream). That makes the model pluggable - this module has three clients built on that:
+# - ReplayClient serves recorded responses from a fixture file, with no network at all
+# - RecordingClient wraps a real client and saves every response to a fixture file
+# - RateLimitedClient wraps a client shared by many conversations (--batch) and paces its calls
+# The first two let us record a real run once and replay it offline (for benchmarks and tests).
+
+# Standard library for reading and writing fixture files
+import json
+# Standard library for building simple attribute containers (client.models, client.aio.models)
+from types import SimpleNamespace
+# Standard libraries for pacing and retrying calls from several threads
+import random
+import threading
+import time
+
+# Google Gemini types, for turning fixture JSON back into real response objects
+from google.genai import types
+# API errors carry the HTTP status code, which tells us whether a retry makes sense
+from google.genai import errors
+
+
+def load_fixture(path):
+    """
+    Loads recorded responses from a fixture file.
+    A fixture is a JSON object with a "responses" list; each item is one model turn in
+    GenerateContentResponse form (as written by RecordingClient), for example:
+        {"candidates": [{"content": {"role": "model", "parts": [
+            {"function_call": {"name": "get_files_info", "args": {}}}]}}],
+         "usage_metadata": {"prompt_token_count": 120, "candidates_token_count": 8}}
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return [types.GenerateContentResponse.model_validate(response) for response in data["responses"]]
+
+
+class ReplayClient:
+    """
+    Stand-in for genai.Client that returns recorded responses in order, one per model call.
+    The conversation sent to it is ignored - the fixture decides what the "model" does.
+    """
+
+    def __init__(self, fixture_path):
+        self.fixture_path = fixture_path
+        self.responses = load_fixture(fixture_path)
+        self.calls = 0
+        self.models = SimpleNamespace(
+            generate_content=self._generate_content,
+            generate_content_stream=self._generate_content_stream,
+        )
+        self.aio = SimpleNamespace(models=SimpleNamespace(
+            generate_content=self._generate_content_async,
+            generate_content_stream=self._generate_content_stream_async,
+        ))
+
+    def _next_response(self):
+        if self.calls >= len(self.responses):
+            raise RuntimeError(f"Replay fixture {self.fixture_path} has no more responses (used {self.calls})")
+        response = self.responses[self.calls]
+        self.calls += 1
+        # Hand out a copy, so the agent loop can't change the recorded response
+        return response.model_copy(deep=True)
+
+    def _generate_content(self, *, model, contents, config=None):
+        return self._next_response()
+
+    def _generate_content_stream(self, *, model, contents, config=None):
+        # A recorded turn is replayed as a single chunk
+        yield self._next_response()
+
+    async def _generate_content_async(self, *, model, contents, config=None):
+        return self._next_response()
+
+    async def _generate_content_stream_async(self, *, model, contents, config=None):
+        response = self._next_response()
+
+        async def chunks():
+            yield response
+
+        return chunks()
+
+
+class RecordingClient:
+    """
+    Wraps a real client and records every response it returns, so the run can be
+    replayed later with ReplayClient. Call save() when the run is over.
+    Streamed responses are recorded as one merged response per turn.
+    """
+
+    def __init__(self, client, fixture_path):
+        self.client = client
+        self.fixture_path = fixture_path
+        self.responses = []
+        self.models = SimpleNamespace(
+            generate_content=self._generate_content,
+            generate_content_stream=self._generate_content_stream,
+        )
+        self.aio = SimpleNamespace(models=SimpleNamespace(
+            generate_content=self._generate_content_async,
+            generate_content_stream=self._generate_content_stream_async,
+        ))
+
+    def _generate_content(self, **kwargs):
+        response = self.client.models.generate_content(**kwargs)
+        self.responses.append(response)
+        return response
+
+    def _generate_content_stream(self, **kwargs):
+        chunks = []
+        for chunk in self.client.models.generate_content_stream(**kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self.responses.append(merge_chunks(chunks))
+
+    async def _generate_content_async(self, **kwargs):
+        response = await self.client.aio.models.generate_content(**kwargs)
+        self.responses.append(response)
+        return response
+
+    async def _generate_content_stream_async(self, **kwargs):
+        stream = await self.client.aio.models.generate_content_stream(**kwargs)
+
+        async def chunks():
+            received = []
+            async for chunk in stream:
+                received.append(chunk)
+                yield chunk
+            self.responses.append(merge_chunks(received))
+
+        return chunks()
+
+    def save(self):
+        """Writes the recorded responses to the fixture file."""
+        with open(self.fixture_path, "w") as f:
+            json.dump(
+                {"responses": [response.model_dump(mode="json", exclude_none=True) for response in self.responses]},
+                f,
+                indent=2,
+            )
+
+
+def merge_chunks(chunks):
+    """Combines streamed chunks into one response: all parts in order, plus the last usage numbers."""
+    parts = []
+    usage_metadata = None
+    for chunk in chunks:
+        if chunk.usage_metadata:
+            usage_metadata = chunk.usage_metadata
+        if chunk.candidates and chunk.candidates[0].content:
+            parts.extend(chunk.candidates[0].content.parts or [])
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=usage_metadata,
+    )
+
+
+# HTTP status codes worth retrying: rate limited, server error, unavailable, gateway timeout
+RETRYABLE_STATUS_CODES = {429, 500, 503, 504}
+
+
+class RateLimitedClient:
+    """
+    Wraps a client that many threads share (see batch.py).
+    - Model calls are spaced at least 60 / requests_per_minute seconds apart, across all threads
+    - Calls that fail with a retryable API error are retried with exponential backoff plus jitter,
+      so workers that were rejected together don't all come back at the same moment
+    Only client.models.generate_content is provided - batch mode doesn't stream.
+    """
+
+    def __init__(self, client, requests_per_minute, max_retries, retry_delay):
+        self.client = client
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.lock = threading.Lock()
+        # Earliest time the next call may start
+        self.next_start = time.monotonic()
+        self.retries = 0
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _wait_for_slot(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _generate_content(self, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            try:
+                return self.client.models.generate_content(**kwargs)
+            except errors.APIError as e:
+                if e.code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    raise
+            with self.lock:
+                self.retries += 1
+            time.sleep(self.retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
@@ -0,0 +1,99 @@
+# Batch mode (--batch=FILE)
+# Runs many independent conversations from a JSON lines file in one process, so the client,
+# imports, caches and worker pool are set up once instead of once per task.
+# Each task gets its own copy of WORKING_DIR, so tasks can't see or break each other's changes.
+#
+# Input:  one JSON object per line, {"id": "fix-1", "prompt": "fix the calculator"}
+#         ("id" is optional and defaults to the line number)
+# Output: one JSON object per finished task, in the order they finish:
+#         {"id", "response", "error", "iterations", "prompt_tokens", "response_tokens", "seconds"}
+
+# Standard libraries
+import os
+import sys
+import json
+import time
+import contextlib
+# Thread pool: each task spends most of its time waiting on the API, so threads are enough
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Google Gemini types for building the user message
+from google.genai import types
+
+from config import WORKING_DIR, MAX_PROMPT_TOKENS, BATCH_WORKERS
+# Private copy of WORKING_DIR for each task
+from sandbox import Sandbox
+
+
+def load_tasks(tasks_path):
+    """Reads the tasks file, skipping blank lines. Returns a list of {"id", "prompt"} dictionaries."""
+    tasks = []
+    with open(tasks_path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            if not task.get("prompt"):
+                raise ValueError(f'{tasks_path}:{line_number}: task has no "prompt"')
+            task.setdefault("id", line_number)
+            tasks.append(task)
+    return tasks
+
+
+def run_task(client, agent_loop, task, token_budget):
+    """
+    Runs one conversation in a private copy of the sandbox and returns its result record.
+    agent_loop is main.generate_content, passed in because main.py imports this module.
+    """
+    stats = {}
+    result = {"id": task["id"], "response": None, "error": None}
+    started = time.perf_counter()
+    with Sandbox(WORKING_DIR) as sandbox:
+        messages = [types.Content(role="user", parts=[types.Part(text=task["prompt"])])]
+        try:
+            result["response"] = agent_loop(
+                client, messages, False, token_budget,
+                working_directory=sandbox.path, stats=stats,
+            )
+        except Exception as e:
+            # One failing task shouldn't stop the batch
+            result["error"] = f"{type(e).__name__}: {e}"
+    result["iterations"] = stats.get("iterations", 0)
+    result["prompt_tokens"] = stats.get("prompt_tokens", 0)
+    result["response_tokens"] = stats.get("response_tokens", 0)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(client, agent_loop, tasks_path, output_path, workers=BATCH_WORKERS, token_budget=MAX_PROMPT_TOKENS):
+    """
+    Runs every task in tasks_path with up to `workers` conversations at a time.
+    agent_loop(client, messages, verbose, token_budget, working_directory=..., stats=...)
+    runs one conversation and returns the final response (main.generate_content).
+    Results are appended to output_path as soon as each task finishes, so a crash halfway
+    through still leaves the finished results on disk.
+
+    Returns:
+        The number of tasks that failed
+    """
+    tasks = load_tasks(tasks_path)
+    failed = 0
+
+    # The agent loop prints its progress for every call, which is just noise with many
+    # conversations interleaved - so only one progress line per finished task is shown (on stderr)
+    with open(output_path, "w") as output, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(run_task, client, agent_loop, task, token_budget) for task in tasks]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                if result["error"]:
+                    failed += 1
+                status = f"error: {result['error']}" if result["error"] else "ok"
+                print(
+                    f"[{done}/{len(tasks)}] {result['id']}: {status} "
+                    f"({result['iterations']} iterations, {result['seconds']}s)",
+                    file=sys.stderr,
+                )
+    return failed
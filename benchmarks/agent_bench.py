@@ -0,0 +1,120 @@
+# Offline benchmark for the agent loop
+# Replays recorded model responses (benchmarks/fixtures/*.json) against a fresh copy of the
+# calculator sandbox, so everything except the model itself runs for real: function dispatch,
+# file reads and writes, script runs, and building the function responses.
+# No network or API key is needed, so the numbers can be compared between commits.
+#
+# Usage: python benchmarks/agent_bench.py [task ...] [--repeat=N] [--warm-pool] [--json=FILE]
+# Record new fixtures from real runs with: python main.py "prompt" --record=benchmarks/fixtures/NAME.json
+
+# Standard libraries
+import sys
+import os
+import io
+import json
+import statistics
+import contextlib
+
+# Let the benchmark import the agent's modules when run from anywhere
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Google Gemini types, for building the user message
+from google.genai import types
+
+from main import generate_content                    # The agent loop being measured
+from backends import ReplayClient                    # Serves the recorded responses
+from sandbox import Sandbox                          # Fresh copy of the sandbox for every run
+from tracing import tracer                           # Collects the per-phase timings
+from tool_cache import tool_cache                    # Caches are reset between runs
+from functions.dir_index import directory_index
+from functions.python_pool import enable_worker_pool
+
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+SANDBOX_SOURCE = os.path.join(ROOT, "calculator")
+
+# Phases reported for each task, in table order
+PHASES = ["wall", "model", "dispatch", "io", "subprocess", "serialization", "compaction"]
+
+
+def run_task(name):
+    """Runs one fixture against a fresh sandbox copy and returns {phase: milliseconds}."""
+    with Sandbox(SANDBOX_SOURCE, root=os.path.join(ROOT, ".sandboxes")) as sandbox:
+        # Every run starts cold, like a new agent session
+        tool_cache.clear()
+        directory_index.clear()
+        tracer.enable()
+
+        client = ReplayClient(os.path.join(FIXTURE_DIR, name + ".json"))
+        messages = [types.Content(role="user", parts=[types.Part(text=f"benchmark task: {name}")])]
+
+        # The agent loop prints its progress; keep the benchmark output readable
+        started = tracer.now()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_content(client, messages, verbose=False, working_directory=sandbox.path)
+        wall = (tracer.now() - started) * 1000
+
+        if client.calls != len(client.responses):
+            raise RuntimeError(f"{name}: agent stopped after {client.calls} of {len(client.responses)} responses")
+
+    return phase_timings(tracer.spans, wall)
+
+
+def phase_timings(spans, wall):
+    """
+    Adds up span durations per phase (in milliseconds).
+    Parallel function calls overlap, so phases can add up to more than the wall time.
+    "dispatch" is the time spent in call_function outside the tool bodies and serialization.
+    """
+    totals = dict.fromkeys(PHASES, 0.0)
+    totals["wall"] = wall
+    for span in spans:
+        milliseconds = span["dur"] / 1000
+        if span["name"] == "call_function":
+            totals["dispatch"] += milliseconds
+        elif span["name"] == "model_call":
+            totals["model"] += milliseconds
+        elif span["name"] == "compaction":
+            totals["compaction"] += milliseconds
+        elif span["cat"] in ("io", "subprocess", "serialization"):
+            totals[span["cat"]] += milliseconds
+            # These run inside call_function, so take them out of the dispatch time
+            totals["dispatch"] -= milliseconds
+    return totals
+
+
+def main():
+    repeat = 5
+    json_path = None
+    for arg in sys.argv[1:]:
+        if arg.startswith("--repeat="):
+            repeat = int(arg.split("=", 1)[1])
+        elif arg.startswith("--json="):
+            json_path = arg.split("=", 1)[1]
+        elif arg == "--warm-pool":
+            enable_worker_pool()
+
+    tasks = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not tasks:
+        tasks = sorted(name[:-len(".json")] for name in os.listdir(FIXTURE_DIR) if name.endswith(".json"))
+
+    # Median of each phase over the repeats, per task
+    results = {}
+    for name in tasks:
+        runs = [run_task(name) for _ in range(repeat)]
+        results[name] = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+
+    print(f"Median ms over {repeat} runs")
+    print(f"{'task':<16}" + "".join(f"{phase:>15}" for phase in PHASES))
+    for name, timings in results.items():
+        print(f"{name:<16}" + "".join(f"{timings[phase]:>15.1f}" for phase in PHASES))
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"repeat": repeat, "results": results}, f, indent=2)
+        print(f"\nResults written to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
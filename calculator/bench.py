@@ -0,0 +1,126 @@
+# bench.py
+
+import ast
+import operator
+import time
+import timeit
+from decimal import Decimal
+from fractions import Fraction
+from pkg.calculator import Calculator, compile, tokenize
+from pkg import ast_eval
+
+EXPRESSIONS = [
+    "3 + 5",
+    "2 * 3 - 8 / 2 + 5",
+    "(1.5 + 2.25) * (3 - 4 / 8) ** 2 - 10 / (2 + 3)",
+]
+
+
+def main():
+    calculator = Calculator()
+    number = 20000
+    print(f"{'expression':<50}{'parse + eval':>14}{'compiled':>14}{'evaluate':>14}{'speedup':>10}")
+    for expression in EXPRESSIONS:
+        # compile.__wrapped__ skips the cache: the cost of parsing on every call
+        uncached = timeit.timeit(lambda: compile.__wrapped__(expression).evaluate(), number=number)
+        compiled = compile(expression)
+        precompiled = timeit.timeit(compiled.evaluate, number=number)
+        cached = timeit.timeit(lambda: calculator.evaluate(expression), number=number)
+        print(
+            f"{expression:<50}"
+            f"{uncached / number * 1e6:>12.2f}us"
+            f"{precompiled / number * 1e6:>12.2f}us"
+            f"{cached / number * 1e6:>12.2f}us"
+            f"{uncached / precompiled:>9.1f}x"
+        )
+
+    print()
+    expression = large_expression(1_000_000)
+    for name, function in [
+        ("tokenize", lambda: sum(1 for _ in tokenize(expression))),
+        ("compile", lambda: compile.__wrapped__(expression)),
+        ("compile + evaluate", lambda: compile.__wrapped__(expression).evaluate()),
+    ]:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        print(f"{name + ' (1 MB)':<50}{seconds * 1000:>12.1f}ms{len(expression) / seconds / 1e6:>12.1f} MB/s")
+
+    print()
+    bench_backends(number)
+
+    print()
+    bench_ast_eval(number)
+
+
+def bench_backends(number):
+    expression = "(1.5 + x) * (3 - 4 / 8) ** 2 - x / (2 + 3)"
+    print(f"{'backend: ' + expression:<50}{'evaluate':>14}")
+    for numbers, x in [("float", 2.25), ("decimal", Decimal("2.25")), ("fraction", Fraction(9, 4))]:
+        compiled = Calculator(numbers).compile(expression)
+        seconds = timeit.timeit(lambda: compiled.evaluate(x=x), number=number)
+        print(f"{numbers:<50}{seconds / number * 1e6:>12.2f}us")
+
+
+def bench_ast_eval(number):
+    # The shared evaluator of calculator.py and expression_calculator.py against the
+    # recursive version they used before
+    print(f"{'ast expression':<50}{'recursive':>14}{'uncached':>14}{'cached':>14}")
+    for expression in ["(2 + 3) * 4", "-(1.5 + 2.25) * (3 - 4 / 8) ** 2 - 10 / (2 + 3)"]:
+        recursive = timeit.timeit(lambda: recursive_evaluate(expression), number=number)
+        uncached = timeit.timeit(lambda: run_uncached(expression), number=number)
+        cached = timeit.timeit(lambda: ast_eval.evaluate(expression), number=number)
+        print(
+            f"{expression:<50}"
+            f"{recursive / number * 1e6:>12.2f}us"
+            f"{uncached / number * 1e6:>12.2f}us"
+            f"{cached / number * 1e6:>12.2f}us"
+        )
+
+    print(f"{'deepest 1+1+...+1 chain':<50}{deepest(recursive_evaluate):>14}{deepest(ast_eval.evaluate):>28}")
+
+
+def run_uncached(expression):
+    ast_eval.compile_expression.cache_clear()
+    return ast_eval.evaluate(expression)
+
+
+def recursive_evaluate(expression):
+    operators = {
+        ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+        ast.Div: operator.truediv, ast.Pow: operator.pow, ast.USub: operator.neg
+    }
+
+    def eval_expr(node):
+        if isinstance(node, ast.Constant):
+            return node.value
+        elif isinstance(node, ast.BinOp):
+            return operators[type(node.op)](eval_expr(node.left), eval_expr(node.right))
+        elif isinstance(node, ast.UnaryOp):
+            return operators[type(node.op)](eval_expr(node.operand))
+        raise TypeError(node)
+
+    return eval_expr(ast.parse(expression, mode="eval").body)
+
+
+def deepest(evaluate, limit=100_000):
+    # Binary search for the longest chain that evaluates without RecursionError
+    low, high = 1, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        try:
+            evaluate("+".join(["1"] * middle))
+            low = middle
+        except (RecursionError, MemoryError):
+            high = middle - 1
+    return low
+
+
+def large_expression(size):
+    # Long literals, every operator and nested parentheses
+    term = "(123456.789 + 2 ** 3) * 4.5 / (6 - 7.25) + 1000000 - "
+    return term * (size // len(term)) + "1"
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,50 @@
 import sys
 from pkg.calculator import Calculator
 from pkg.render import render
+from pkg.bulk import run_bulk
+from pkg.server import serve, DEFAULT_PORT
 
 
 def main():
-    calculator = Calculator()
-    if len(sys.argv) <= 1:
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    numbers = get_flag_value(flags, "--numbers", "float")
+
+    if "--serve" in flags:
+        try:
+            port = get_int_flag(flags, "--port", DEFAULT_PORT, 0)
+            workers = get_int_flag(flags, "--workers", 0, 0)
+        except ValueError as e:
+            usage_error(e)
+        serve(path=get_flag_value(flags, "--socket"), port=port, numbers=numbers, workers=workers)
+        return
+
+    input_path = get_flag_value(flags, "--input")
+    if input_path:
+        output_format = get_flag_value(flags, "--format", "plain")
+        try:
+            workers = get_int_flag(flags, "--workers", 1, 1)
+        except ValueError as e:
+            usage_error(e)
+        try:
+            if input_path == "-":
+                errors = run_bulk(sys.stdin, sys.stdout, output_format, numbers, workers)
+            else:
+                with open(input_path) as lines:
+                    errors = run_bulk(lines, sys.stdout, output_format, numbers, workers)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        sys.exit(1 if errors else 0)
+
+    if not args:
         print("Calculator App")
-        print('Usage: python main.py "<expression>"')
-        print('Example: python main.py "3 + 5"')
+        print_usage()
         return
 
-    expression = " ".join(sys.argv[1:])
+    expression = " ".join(args)
     try:
+        calculator = Calculator(numbers)
         result = calculator.evaluate(expression)
         to_print = render(expression, result)
         print(to_print)
@@ -22,5 +54,37 @@ def main():
         print(f"Error: {e}")
 
 
+def print_usage(file=None):
+    print('Usage: python main.py "<expression>" [--numbers=float|decimal|fraction]', file=file)
+    print("       python main.py --input=FILE|- [--format=plain|csv|jsonl] [--workers=N] [--numbers=...]", file=file)
+    print("       python main.py --serve [--socket=PATH | --port=N] [--workers=N] [--numbers=...]", file=file)
+    print('Example: python main.py "3 + 5"', file=file)
+    print("Example: python main.py --input=- --format=csv < expressions.txt", file=file)
+
+
+def usage_error(error):
+    print(f"Error: {error}", file=sys.stderr)
+    print_usage(sys.stderr)
+    sys.exit(2)
+
+
+def get_int_flag(flags, name, default, minimum):
+    value = get_flag_value(flags, name, default)
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or number < minimum:
+        raise ValueError(f"{name} must be a whole number of at least {minimum}, not {value}")
+    return number
+
+
+def get_flag_value(flags, name, default=None):
+    for flag in flags:
+        if flag.startswith(name + "="):
+            return flag[len(name) + 1:]
+    return default
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
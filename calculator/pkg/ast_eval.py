@@ -0,0 +1,73 @@
+# ast_eval.py
+
+import ast
+import operator as op
+from functools import lru_cache
+from pkg.optimizer import PUSH, APPLY, UNARY, STORE, optimize
+
+BINARY_OPERATORS = {
+    ast.Add: op.add,
+    ast.Sub: op.sub,
+    ast.Mult: op.mul,
+    ast.Div: op.truediv,
+    ast.Pow: op.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.USub: op.neg,
+}
+
+PARSE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def compile_expression(expression):
+    """
+    Parses a Python-syntax arithmetic expression into optimized postfix instructions.
+    Cached by expression string. Walks the tree with an explicit stack, so nesting depth
+    is only limited by ast.parse itself, not by the evaluator.
+    """
+    tree = ast.parse(expression, mode="eval").body
+    code = []
+    # (node, None) is a node still to visit; (None, instruction) is emitted once its operands are
+    pending = [(tree, None)]
+    while pending:
+        node, instruction = pending.pop()
+        if node is None:
+            code.append(instruction)
+        elif isinstance(node, ast.Constant) and _is_number(node.value):
+            code.append((PUSH, node.value))
+        elif isinstance(node, ast.BinOp):
+            pending.append((None, (APPLY, BINARY_OPERATORS[type(node.op)])))
+            pending.append((node.right, None))
+            pending.append((node.left, None))
+        elif isinstance(node, ast.UnaryOp):
+            pending.append((None, (UNARY, UNARY_OPERATORS[type(node.op)])))
+            pending.append((node.operand, None))
+        else:
+            raise TypeError(node)
+    return optimize(code)
+
+
+def evaluate(expression):
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    registers = []
+    for opcode, argument in compile_expression(expression):
+        if opcode == PUSH:
+            push(argument)
+        elif opcode == APPLY:
+            b = pop()
+            push(argument(pop(), b))
+        elif opcode == UNARY:
+            push(argument(pop()))
+        elif opcode == STORE:
+            registers.append(stack[-1])
+        else:
+            push(registers[argument])
+    return stack[0]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, complex)) and not isinstance(value, bool)
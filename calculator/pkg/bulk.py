@@ -0,0 +1,126 @@
+# bulk.py
+
+import csv
+import json
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pkg.calculator import Calculator
+from pkg.render import format_result
+
+OUTPUT_FORMATS = ("plain", "csv", "jsonl")
+
+# Lines sent to a worker process at a time, and chunks in flight per worker
+CHUNK_SIZE = 1000
+CHUNKS_PER_WORKER = 2
+
+# One Calculator per number type in each process, so its compile cache is reused
+_calculators = {}
+
+
+def get_calculator(numbers="float"):
+    calculator = _calculators.get(numbers)
+    if calculator is None:
+        calculator = _calculators[numbers] = Calculator(numbers)
+    return calculator
+
+
+def json_value(result):
+    # Finite floats stay JSON numbers; exact types (and inf/nan) are written as strings
+    if result is None or (isinstance(result, float) and math.isfinite(result)):
+        return result
+    return format_result(result)
+
+
+def evaluate_lines(lines, numbers="float", start=1):
+    """
+    Yields (line_number, expression, result, error) for each line; error is None or the
+    message of the exception the line raised. Blank lines give a None result.
+    """
+    calculator = get_calculator(numbers)
+    for line_number, line in enumerate(lines, start):
+        expression = line.rstrip("\r\n")
+        try:
+            yield line_number, expression, calculator.evaluate(expression), None
+        except Exception as e:
+            yield line_number, expression, None, str(e)
+
+
+def _evaluate_chunk(chunk):
+    start, lines, numbers = chunk
+    return list(evaluate_lines(lines, numbers, start))
+
+
+def evaluate_parallel(lines, numbers="float", workers=2, chunk_size=CHUNK_SIZE):
+    """
+    Like evaluate_lines, but spread over worker processes in chunks. Rows come back in
+    input order, and only a few chunks per worker are held at once, so memory stays
+    bounded however long the input is.
+    """
+    lines = iter(lines)
+    pending = deque()
+    start = 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(pending) < workers * CHUNKS_PER_WORKER:
+                chunk = list(islice(lines, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_evaluate_chunk, (start, chunk, numbers)))
+                start += len(chunk)
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def write_plain(rows, output):
+    errors = 0
+    for _, _, result, error in rows:
+        if error is not None:
+            errors += 1
+            output.write(f"Error: {error}\n")
+        else:
+            output.write("\n" if result is None else format_result(result) + "\n")
+    return errors
+
+
+def write_csv(rows, output):
+    errors = 0
+    writer = csv.writer(output)
+    writer.writerow(["line", "expression", "result", "error"])
+    for line_number, expression, result, error in rows:
+        errors += error is not None
+        writer.writerow([
+            line_number, expression, "" if result is None else format_result(result), error or "",
+        ])
+    return errors
+
+
+def write_jsonl(rows, output):
+    errors = 0
+    for line_number, expression, result, error in rows:
+        errors += error is not None
+        output.write(json.dumps({
+            "line": line_number, "expression": expression, "result": json_value(result), "error": error,
+        }) + "\n")
+    return errors
+
+
+WRITERS = {
+    "plain": write_plain,
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+}
+
+
+def run_bulk(lines, output, output_format="plain", numbers="float", workers=1):
+    """Evaluates every line and writes one result per line as it goes. Returns the number of errors."""
+    if output_format not in WRITERS:
+        raise ValueError(f"unknown format: {output_format} (use {', '.join(OUTPUT_FORMATS)})")
+    Calculator(numbers)  # Fail early on an unknown number type
+    if workers > 1:
+        rows = evaluate_parallel(lines, numbers, workers)
+    else:
+        rows = evaluate_lines(lines, numbers)
+    return WRITERS[output_format](rows, output)
@@ -1,117 +1,341 @@
 # calculator.py
 
+import decimal
+import operator
+import re
+from fractions import Fraction
+from functools import lru_cache
+from pkg.optimizer import PUSH, APPLY, LOAD, STORE, optimize
+
+
 def divide(a, b):
     if b == 0:
         raise ValueError("division by zero")
     return a / b
 
-class Calculator:
-    def __init__(self):
-        self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": divide,
-            "**": lambda a, b: a ** b,
-        }
-        self.precedence = {
-            "+": 1,
-            "-": 1,
-            "*": 2,
-            "/": 2,
-            "**": 3,
-        }
-
-    def evaluate(self, expression):
-        if not expression or expression.isspace():
-            return None
-        tokens = self._tokenize(expression)
-        return self._evaluate_infix(tokens)
-
-    def _tokenize(self, expression):
-        tokens = []
-        current_number = ""
-        i = 0
-        while i < len(expression):
-            char = expression[i]
-            if char.isdigit() or char == '.':
-                current_number += char
-            elif char == '*':
-                if i + 1 < len(expression) and expression[i + 1] == '*':
-                    if current_number:
-                        tokens.append(current_number)
-                        current_number = ""
-                    tokens.append("**")
-                    i += 1  # Skip the second *
-                else:
-                    if current_number:
-                        tokens.append(current_number)
-                        current_number = ""
-                    tokens.append("*")
-            elif char in self.operators or char in ["(", ")"]:
-                if current_number:
-                    tokens.append(current_number)
-                    current_number = ""
-                tokens.append(char)
-            elif char.isspace():
-                if current_number:
-                    tokens.append(current_number)
-                    current_number = ""
+
+OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": divide,
+    "**": operator.pow,
+}
+
+PRECEDENCE = {
+    "+": 1,
+    "-": 1,
+    "*": 2,
+    "/": 2,
+    "**": 3,
+}
+
+# Constant operands the optimizer may drop: x + 0, 0 + x, x - 0, x * 1, 1 * x, x / 1, x ** 1
+LEFT_IDENTITIES = {"+": 0, "*": 1}
+RIGHT_IDENTITIES = {"+": 0, "-": 0, "*": 1, "/": 1, "**": 1}
+
+# What evaluate_batch does with rows that divide by zero
+ZERO_DIVISION_POLICIES = ("raise", "mask")
+
+COMPILE_CACHE_SIZE = 1024
+
+
+class NumberBackend:
+    """
+    The kind of number a Calculator computes with: how literals are converted and which
+    function each operator calls. Compiled code holds these functions directly, so the
+    float backend runs exactly the same instructions as a float-only calculator would.
+    """
+
+    __slots__ = ("name", "number", "operators", "left_identities", "right_identities")
+
+    def __init__(self, name, number, operators, drop_identities=True):
+        self.name = name
+        self.number = number
+        self.operators = operators
+        self.left_identities = {}
+        self.right_identities = {}
+        if drop_identities:
+            self.left_identities = {operators[symbol]: value for symbol, value in LEFT_IDENTITIES.items()}
+            self.right_identities = {operators[symbol]: value for symbol, value in RIGHT_IDENTITIES.items()}
+
+    def __repr__(self):
+        return f"NumberBackend({self.name!r})"
+
+
+FLOAT = NumberBackend("float", float, OPERATORS)
+FRACTION = NumberBackend("fraction", Fraction, OPERATORS)
+
+
+def decimal_backend(context=None):
+    """
+    A backend computing with decimal.Decimal in the given context (precision, rounding,
+    traps); a fresh default context if None. Literals are converted exactly, operations
+    round to the context, and overflow raises instead of giving inf.
+    """
+    if context is None:
+        context = decimal.Context()
+
+    def divide(a, b):
+        if b == 0:
+            raise ValueError("division by zero")
+        return context.divide(a, b)
+
+    # x + 0 or x * 1 still rounds x to the context's precision, so they can't be dropped
+    return NumberBackend("decimal", decimal.Decimal, {
+        "+": context.add,
+        "-": context.subtract,
+        "*": context.multiply,
+        "/": divide,
+        "**": context.power,
+    }, drop_identities=False)
+
+
+class CompiledExpression:
+    """An expression parsed and optimized once into postfix (RPN) instructions, ready to be evaluated many times."""
+
+    __slots__ = ("expression", "code", "variables", "backend")
+
+    def __init__(self, expression, code, backend=FLOAT):
+        self.expression = expression
+        self.code = code
+        self.backend = backend
+        self.variables = tuple(dict.fromkeys(argument for opcode, argument in code if opcode == LOAD))
+
+    def evaluate(self, **variables):
+        # Converted up front, so dropped identities (x / 1, x + 0) can't change the result type
+        values = self._number_variables(variables)
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        registers = []
+        for opcode, argument in self.code:
+            if opcode == PUSH:
+                push(argument)
+            elif opcode == APPLY:
+                b = pop()
+                push(argument(pop(), b))
+            elif opcode == LOAD:
+                push(values[argument])
+            elif opcode == STORE:
+                registers.append(stack[-1])
             else:
-                raise ValueError(f"Invalid character: {char}")
-            i += 1
-        if current_number:
-            tokens.append(current_number)
-        return tokens
-
-
-    def _evaluate_infix(self, tokens):
-        values = []
-        operators = []
-
-        for token in tokens:
-            if token == "(":
-                operators.append(token)
-            elif token == ")":
-                while operators and operators[-1] != "(":
-                    self._apply_operator(operators, values)
-                if not operators:
-                    raise ValueError("Mismatched parentheses")
-                operators.pop()  # Remove the opening parenthesis
-            elif token in self.operators:
-                while (
-                    operators
-                    and operators[-1] != "("
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
+                push(registers[argument])
+        return stack[0]
+
+    def evaluate_batch(self, arrays, zero_division="raise"):
+        """
+        Evaluates the expression over whole NumPy arrays (one per variable) at once.
+        zero_division="raise" raises ValueError if any row divides by zero;
+        "mask" returns a numpy.ma.MaskedArray with those rows masked.
+        """
+        import numpy
+
+        if self.backend is not FLOAT:
+            raise ValueError(f"evaluate_batch only supports float numbers, not {self.backend.name}")
+        if zero_division not in ZERO_DIVISION_POLICIES:
+            raise ValueError(f"zero_division must be one of {', '.join(ZERO_DIVISION_POLICIES)}")
+        self._check_variables(arrays)
+        columns = {name: numpy.asarray(arrays[name], dtype=float) for name in self.variables}
+        if zero_division == "mask":
+            columns = {name: numpy.ma.asarray(column) for name, column in columns.items()}
+
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        registers = []
+        for opcode, argument in self.code:
+            if opcode == PUSH:
+                push(argument)
+            elif opcode == APPLY:
+                b = pop()
+                a = pop()
+                if argument is divide:
+                    push(_divide_arrays(numpy, a, b, zero_division))
+                else:
+                    push(argument(a, b))
+            elif opcode == LOAD:
+                push(columns[argument])
+            elif opcode == STORE:
+                registers.append(stack[-1])
             else:
-                try:
-                    val = float(token)
-                    values.append(val)
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                push(registers[argument])
+        return stack[0]
+
+    def _check_variables(self, variables):
+        for name in self.variables:
+            if name not in variables:
+                raise ValueError(f"undefined variable: {name}")
+
+    def _number_variables(self, variables):
+        self._check_variables(variables)
+        number = self.backend.number
+        values = {}
+        for name in self.variables:
+            value = variables[name]
+            try:
+                values[name] = value if type(value) is number else number(value)
+            except (TypeError, ValueError, ArithmeticError):
+                raise ValueError(f"variable {name} must be a number, not {value!r}") from None
+        return values
+
+    def __repr__(self):
+        symbols = {function: symbol for symbol, function in self.backend.operators.items()}
+        program = " ".join(
+            symbols[argument] if opcode == APPLY
+            else f"store{argument}" if opcode == STORE
+            else f"recall{argument}" if opcode not in (PUSH, LOAD)
+            else str(argument)
+            for opcode, argument in self.code
+        )
+        return f"CompiledExpression({self.expression!r}: {program})"
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile(expression, backend=FLOAT):
+    """
+    Parses an expression into a CompiledExpression (None for an empty expression).
+    Results are cached by expression string and backend, so repeated formulas are only
+    parsed and optimized once. Raises ValueError for malformed expressions; errors that
+    depend on the values (division by zero) are raised by evaluate().
+    """
+    if not expression or expression.isspace():
+        return None
+    code = optimize(
+        _to_postfix(tokenize(expression), backend),
+        left_identities=backend.left_identities,
+        right_identities=backend.right_identities,
+    )
+    return CompiledExpression(expression, code, backend)
+
+
+# One token per match, with the whitespace before it; "**" is listed before "*" so it is never
+# split in two. Any other non-space character is an error, reported with its column
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>[\d.]+)
+      | (?P<name>[^\W\d]\w*)
+      | (?P<operator>\*\*|[-+*/])
+      | (?P<paren>[()])
+      | (?P<error>\S)
+    )
+""", re.VERBOSE)
+
+
+def tokenize(expression):
+    """Yields (kind, text, column) for each token, with 1-based columns."""
+    for match in TOKEN_PATTERN.finditer(expression):
+        kind = match.lastgroup
+        if kind == "error":
+            raise ValueError(f"Invalid character: {match.group(kind)} at column {match.start(kind) + 1}")
+        yield kind, match.group(kind), match.start(kind) + 1
+
+
+def _to_postfix(tokens, backend):
+    # Shunting-yard, emitting instructions instead of computing values.
+    # depth tracks how many values the stack will hold at run time, so malformed
+    # expressions are rejected here, with the same errors evaluation used to raise
+    code = []
+    operators = []  # (symbol, column)
+    depth = 0
+
+    for kind, text, column in tokens:
+        if kind == "number":
+            try:
+                value = backend.number(text)
+            except (ValueError, ArithmeticError):
+                raise ValueError(f"invalid token: {text} at column {column}")
+            code.append((PUSH, value))
+            depth += 1
+        elif kind == "name":
+            code.append((LOAD, text))
+            depth += 1
+        elif kind == "operator":
+            precedence = PRECEDENCE[text]
+            while (
+                operators
+                and operators[-1][0] != "("
+                and PRECEDENCE[operators[-1][0]] >= precedence
+            ):
+                depth = _emit_operator(operators.pop(), code, depth, backend)
+            operators.append((text, column))
+        elif text == "(":
+            operators.append((text, column))
+        else:
+            while operators and operators[-1][0] != "(":
+                depth = _emit_operator(operators.pop(), code, depth, backend)
+            if not operators:
+                raise ValueError(f"Mismatched parentheses at column {column}")
+            operators.pop()  # Remove the opening parenthesis
 
-        while operators:
-            if operators[-1] == "(":
-                raise ValueError("Mismatched parentheses")
-            self._apply_operator(operators, values)
+    while operators:
+        if operators[-1][0] == "(":
+            raise ValueError(f"Mismatched parentheses at column {operators[-1][1]}")
+        depth = _emit_operator(operators.pop(), code, depth, backend)
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+    if depth != 1:
+        raise ValueError("invalid expression")
 
-        return values[0]
+    return tuple(code)
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+def _divide_arrays(numpy, a, b, zero_division):
+    zero = numpy.equal(b, 0)
+    if not numpy.any(zero):
+        return a / b
+    if zero_division == "raise":
+        raise ValueError("division by zero")
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        result = numpy.ma.asarray(numpy.true_divide(a, b))
+    return numpy.ma.masked_where(numpy.broadcast_to(zero, result.shape), result)
+
+
+def _emit_operator(operator_token, code, depth, backend):
+    symbol, column = operator_token
+    if depth < 2:
+        raise ValueError(f"not enough operands for operator {symbol} at column {column}")
+    code.append((APPLY, backend.operators[symbol]))
+    return depth - 1
+
+
+# Backends that need no configuration; "decimal" is created per Calculator for its context
+NUMBER_BACKENDS = {
+    "float": FLOAT,
+    "fraction": FRACTION,
+}
+
+
+class Calculator:
+    """
+    numbers selects what the calculator computes with: "float" (the default and fastest),
+    "decimal" (decimal.Decimal, using context if given) or "fraction" (exact fractions.Fraction).
+    """
+
+    def __init__(self, numbers="float", context=None):
+        if numbers == "decimal":
+            self.backend = decimal_backend(context)
+        elif numbers in NUMBER_BACKENDS:
+            if context is not None:
+                raise ValueError("context is only used with numbers=\"decimal\"")
+            self.backend = NUMBER_BACKENDS[numbers]
+        else:
+            raise ValueError(f"unknown numbers: {numbers} (use float, decimal or fraction)")
+
+    def evaluate(self, expression, **variables):
+        compiled = compile(expression, self.backend)
+        if compiled is None:
+            return None
+        return compiled.evaluate(**variables)
+
+    def evaluate_batch(self, expression, /, zero_division="raise", **arrays):
+        """
+        Evaluates expression for every row of the given arrays, e.g.
+        evaluate_batch("x * 2 + y ** 2", x=xs, y=ys). Requires NumPy.
+        """
+        compiled = compile(expression, self.backend)
+        if compiled is None:
+            return None
+        return compiled.evaluate_batch(arrays, zero_division)
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
\ No newline at end of file
+    def compile(self, expression):
+        return compile(expression, self.backend)
@@ -0,0 +1,143 @@
+# optimizer.py
+
+import operator as op
+
+# Instructions shared by the compiled forms in calculator.py and ast_eval.py
+PUSH = 0    # (PUSH, number)
+APPLY = 1   # (APPLY, binary function)
+LOAD = 2    # (LOAD, variable name)
+UNARY = 3   # (UNARY, unary function)
+STORE = 4   # (STORE, slot): keep a copy of the top of the stack for reuse
+RECALL = 5  # (RECALL, slot): push a value kept by STORE
+
+# Constant operands that can be dropped: x + 0, 0 + x, x - 0, x * 1, 1 * x, x / 1, x ** 1
+LEFT_IDENTITIES = {
+    op.add: 0,
+    op.mul: 1,
+}
+
+RIGHT_IDENTITIES = {
+    op.add: 0,
+    op.sub: 0,
+    op.mul: 1,
+    op.truediv: 1,
+    op.pow: 1,
+}
+
+
+def optimize(code, left_identities=LEFT_IDENTITIES, right_identities=RIGHT_IDENTITIES):
+    """
+    Simplifies postfix code: folds constant subexpressions, drops identity operations and
+    computes repeated subexpressions once (STORE / RECALL). Operations that raise, like a
+    division by zero, are left in place so they still raise when the code is evaluated.
+    """
+    if not _can_simplify(code, left_identities, right_identities):
+        return tuple(code)
+
+    nodes = []  # node id -> (instruction, operand node ids)
+    ids = {}    # structural key -> node id, so equal subexpressions share a node
+    stack = []
+
+    def node(key, instruction, operands=()):
+        if key not in ids:
+            ids[key] = len(nodes)
+            nodes.append((instruction, operands))
+        return ids[key]
+
+    def constant(value):
+        # repr keeps 1 and 1.0, or 0.0 and -0.0, apart
+        return node((PUSH, type(value), repr(value)), (PUSH, value))
+
+    def value_of(node_id):
+        instruction, _ = nodes[node_id]
+        return instruction[1] if instruction[0] == PUSH else None
+
+    def is_constant(node_id):
+        return nodes[node_id][0][0] == PUSH
+
+    for instruction in code:
+        opcode, argument = instruction
+        if opcode == PUSH:
+            stack.append(constant(argument))
+        elif opcode == LOAD:
+            stack.append(node(instruction, instruction))
+        elif opcode == UNARY:
+            a = stack.pop()
+            if is_constant(a):
+                try:
+                    stack.append(constant(argument(value_of(a))))
+                    continue
+                except Exception:
+                    pass
+            stack.append(node((opcode, argument, a), instruction, (a,)))
+        else:
+            b = stack.pop()
+            a = stack.pop()
+            if is_constant(a) and is_constant(b):
+                try:
+                    stack.append(constant(argument(value_of(a), value_of(b))))
+                    continue
+                except Exception:
+                    pass
+            if is_constant(b) and _is_identity(right_identities, argument, value_of(b)):
+                stack.append(a)
+            elif is_constant(a) and _is_identity(left_identities, argument, value_of(a)):
+                stack.append(b)
+            else:
+                stack.append(node((opcode, argument, a, b), instruction, (a, b)))
+
+    return _emit(nodes, stack[0])
+
+
+def _can_simplify(code, left_identities, right_identities):
+    # Building the DAG costs as much as parsing, so only do it if the leaves allow a change:
+    # folding needs two constants (or a unary one), CSE a repeated leaf, and dropping an
+    # identity a constant like 0 or 1. One-off expressions such as "x * 2 + y" skip it
+    constants = [argument for opcode, argument in code if opcode == PUSH]
+    names = [argument for opcode, argument in code if opcode == LOAD]
+    if len(constants) > 1 or len(set(names)) < len(names):
+        return True
+    if not constants:
+        return False
+    identities = set(left_identities.values()) | set(right_identities.values())
+    return constants[0] in identities or any(opcode == UNARY for opcode, _ in code)
+
+
+def _is_identity(identities, function, value):
+    return function in identities and value == identities[function]
+
+
+def _emit(nodes, root):
+    # How many times each node's value is needed
+    uses = [0] * len(nodes)
+    seen = set()
+    pending = [root]
+    while pending:
+        node_id = pending.pop()
+        if node_id in seen:
+            continue
+        seen.add(node_id)
+        for operand in nodes[node_id][1]:
+            uses[operand] += 1
+            pending.append(operand)
+
+    # Post-order walk; values needed more than once are stored the first time and recalled after
+    code = []
+    slots = {}
+    pending = [(root, False)]
+    while pending:
+        node_id, expanded = pending.pop()
+        instruction, operands = nodes[node_id]
+        if node_id in slots:
+            code.append((RECALL, slots[node_id]))
+        elif not operands:
+            code.append(instruction)
+        elif expanded:
+            code.append(instruction)
+            if uses[node_id] > 1:
+                slots[node_id] = len(slots)
+                code.append((STORE, slots[node_id]))
+        else:
+            pending.append((node_id, True))
+            pending.extend((operand, False) for operand in reversed(operands))
+    return tuple(code)
@@ -0,0 +1,280 @@
+# server.py
+
+import asyncio
+import json
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pkg.bulk import get_calculator, json_value
+from pkg.calculator import compile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Largest request line accepted (a batch is one line)
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+# Latency percentiles are computed over this many most recent requests
+LATENCY_WINDOW = 10000
+
+METHODS = ("evaluate", "evaluate_batch", "metrics")
+
+
+def evaluate_items(numbers, items):
+    """
+    Evaluates [(expression, variables), ...] with this process's Calculator.
+    Returns the (result, error) rows and this process's compile cache (hits, misses).
+    Runs in worker processes, so it only takes and returns picklable values.
+    """
+    calculator = get_calculator(numbers)
+    rows = []
+    for expression, variables in items:
+        try:
+            variables = {
+                name: _variable_value(name, value, calculator.backend) for name, value in variables.items()
+            }
+            rows.append((json_value(calculator.evaluate(expression, **variables)), None))
+        except Exception as e:
+            rows.append((None, str(e)))
+    info = compile.cache_info()
+    return rows, (info.hits, info.misses)
+
+
+def _variable_value(name, value, backend):
+    """
+    Converts a JSON variable value to the backend's number type. Only JSON numbers are
+    accepted, and for the exact backends also strings like "0.10".
+    """
+    if backend.number is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif isinstance(value, (int, float, str)) and not isinstance(value, bool):
+        try:
+            # str() keeps the decimal digits a JSON number was written with
+            return backend.number(str(value))
+        except (ValueError, ArithmeticError):
+            pass
+    raise ValueError(f"variable {name} must be a number, not {json.dumps(value)}")
+
+
+class CalculatorServer:
+    """
+    Evaluates expressions for clients over newline-delimited JSON, one request and one
+    response per line, answered in order on each connection:
+
+        {"id": 1, "expression": "x * 2", "variables": {"x": 3}}
+        -> {"id": 1, "result": 6, "error": null}
+        {"id": 2, "method": "evaluate_batch", "requests": [{"expression": "1 / 0"}, ...]}
+        -> {"id": 2, "results": [{"result": null, "error": "division by zero"}, ...]}
+        {"method": "metrics"}
+        -> {"requests": ..., "latency_ms": {"p50": ...}, "cache": {"hit_rate": ...}, ...}
+
+    With workers=0 expressions are evaluated in the server process, which is fastest for
+    cheap expressions. With workers=N each expression always goes to the same one of N
+    processes (by hash), so every expression is parsed once and the workers' compile
+    caches together act as one shared cache.
+    """
+
+    def __init__(self, numbers="float", workers=0):
+        get_calculator(numbers)  # Fail early on an unknown number type
+        self.numbers = numbers
+        self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+        self.server = None
+        self.connections = set()  # Handler tasks of the open connections
+        self.started = time.monotonic()
+        self.requests = 0
+        self.expressions = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        # Compile cache (hits, misses) of the server process at start, and of each worker
+        info = compile.cache_info()
+        self.cache_baseline = (info.hits, info.misses)
+        self.worker_cache = [(0, 0)] * workers
+
+    async def start(self, path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Listens on the Unix socket at path, or on host:port. Returns the address."""
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path, limit=MAX_REQUEST_BYTES)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_BYTES)
+        return self.server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # Stop the connection handlers too; server.close() only stops accepting new ones
+        for task in self.connections:
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        for executor in self.executors:
+            executor.shutdown()
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than MAX_REQUEST_BYTES; the rest of the stream can't be trusted
+                    writer.write(b'{"error": "request too large"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                started = time.perf_counter()
+                response = await self.respond(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+                self.latencies.append(time.perf_counter() - started)
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by close(); end normally, as asyncio reports handlers that end cancelled
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def respond(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            self.requests += 1
+            self.errors += 1
+            return {"error": f"invalid request: {e}"}
+
+        method = request.get("method", "evaluate")
+        if method == "metrics":
+            return self.metrics()
+        self.requests += 1
+        response = {"id": request.get("id")}
+        try:
+            if method == "evaluate":
+                (result, error), = await self.evaluate([_item(request)])
+                response.update(result=result, error=error)
+            elif method == "evaluate_batch":
+                requests = request.get("requests", [])
+                if not isinstance(requests, list):
+                    raise ValueError("requests must be a list")
+                items = [_item(item) for item in requests]
+                rows = await self.evaluate(items)
+                response["results"] = [{"result": result, "error": error} for result, error in rows]
+            else:
+                raise ValueError(f"unknown method: {method} (use {', '.join(METHODS)})")
+        except ValueError as e:
+            self.errors += 1
+            response["error"] = f"invalid request: {e}"
+        except Exception as e:
+            # Anything else is a bug, but it must not close the client's connection
+            self.errors += 1
+            response["error"] = f"internal error: {type(e).__name__}: {e}"
+        return response
+
+    async def evaluate(self, items):
+        """Evaluates [(expression, variables), ...] and returns the (result, error) rows in order."""
+        self.expressions += len(items)
+        if not self.executors:
+            rows, _ = evaluate_items(self.numbers, items)
+        else:
+            rows = await self._evaluate_in_workers(items)
+        self.errors += sum(error is not None for _, error in rows)
+        return rows
+
+    async def _evaluate_in_workers(self, items):
+        # Group the items by the worker that owns their expression
+        groups = {}
+        for index, item in enumerate(items):
+            worker = zlib.crc32(item[0].encode()) % len(self.executors)
+            groups.setdefault(worker, []).append(index)
+
+        loop = asyncio.get_running_loop()
+        workers = list(groups)
+        answers = await asyncio.gather(*[
+            loop.run_in_executor(
+                self.executors[worker], evaluate_items, self.numbers, [items[i] for i in groups[worker]]
+            )
+            for worker in workers
+        ])
+
+        rows = [None] * len(items)
+        for worker, (worker_rows, cache) in zip(workers, answers):
+            self.worker_cache[worker] = cache
+            for index, row in zip(groups[worker], worker_rows):
+                rows[index] = row
+        return rows
+
+    def metrics(self):
+        if self.executors:
+            hits = sum(cache[0] for cache in self.worker_cache)
+            misses = sum(cache[1] for cache in self.worker_cache)
+        else:
+            info = compile.cache_info()
+            hits = info.hits - self.cache_baseline[0]
+            misses = info.misses - self.cache_baseline[1]
+
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "expressions": self.expressions,
+            "errors": self.errors,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "workers": len(self.executors),
+            "latency_ms": {
+                name: round(_percentile(latencies, fraction) * 1000, 3)
+                for name, fraction in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)]
+            },
+            "cache": {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            },
+        }
+
+
+def _item(request):
+    if not isinstance(request, dict):
+        raise ValueError("each request must be a JSON object")
+    expression = request.get("expression")
+    variables = request.get("variables")
+    if variables is None:
+        variables = {}
+    if not isinstance(expression, str):
+        raise ValueError("expression must be a string")
+    if not isinstance(variables, dict):
+        raise ValueError("variables must be an object")
+    return expression, variables
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def serve(path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, numbers="float", workers=0):
+    """Runs a CalculatorServer until interrupted."""
+    async def run():
+        server = CalculatorServer(numbers, workers)
+        address = await server.start(path, host, port)
+        print(f"Calculator server listening on {address}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
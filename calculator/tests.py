@@ -1,7 +1,24 @@
 # tests.py
 
+import asyncio
+import io
+import json
+import os
+import tempfile
 import unittest
-from pkg.calculator import Calculator
+from decimal import Context, Decimal
+from fractions import Fraction
+from pkg.calculator import Calculator, compile, tokenize
+from pkg.ast_eval import evaluate as ast_evaluate, compile_expression as ast_compile
+from pkg.optimizer import PUSH, STORE, RECALL
+from pkg.render import render
+from pkg.bulk import run_bulk, evaluate_lines, evaluate_parallel
+from pkg.server import CalculatorServer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestCalculator(unittest.TestCase):
@@ -44,6 +61,278 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_compiled_expression(self):
+        compiled = self.calculator.compile("2 ** 3 * (4 - 1)")
+        self.assertEqual(compiled.evaluate(), 24)
+        self.assertEqual(compiled.evaluate(), self.calculator.evaluate("2 ** 3 * (4 - 1)"))
+
+    def test_compile_is_cached(self):
+        self.assertIs(compile("1 + 2 * 3"), compile("1 + 2 * 3"))
+
+    def test_compile_invalid_expression(self):
+        for expression in ["(1 + 2", "1 + 2)", "1 2", "3 +", "1..2 + 1"]:
+            with self.assertRaises(ValueError):
+                compile(expression)
+
+    def test_division_by_zero(self):
+        compiled = compile("1 / (2 - 2)")
+        with self.assertRaises(ValueError):
+            compiled.evaluate()
+
+    def test_tokenize_power(self):
+        tokens = list(tokenize("2**3 * x"))
+        self.assertEqual(tokens, [
+            ("number", "2", 1), ("operator", "**", 2), ("number", "3", 4),
+            ("operator", "*", 6), ("name", "x", 8),
+        ])
+
+    def test_error_column(self):
+        with self.assertRaisesRegex(ValueError, "Invalid character: \\$ at column 5"):
+            self.calculator.evaluate("3 + $")
+
+    def test_constant_folding(self):
+        self.assertEqual(compile("(2 + 3) * 2 ** 10").code, ((PUSH, 5120.0),))
+
+    def test_identity_elimination(self):
+        compiled = compile("x * 1 + 0 + y / 1 - 0")
+        self.assertEqual(len(compiled.code), 3)
+        self.assertEqual(compiled.evaluate(x=2, y=3), 5)
+
+    def test_identity_keeps_number_type(self):
+        for expression in ["x / 1", "x + 0", "x * 1", "x ** 1"]:
+            result = compile(expression).evaluate(x=3)
+            self.assertIs(type(result), float, expression)
+            self.assertEqual(result, 3.0, expression)
+
+    def test_non_numeric_variable(self):
+        with self.assertRaisesRegex(ValueError, "variable x must be a number"):
+            compile("x + 0").evaluate(x="abc")
+
+    def test_common_subexpressions(self):
+        compiled = compile("(x + y) * (x + y) - (x + y)")
+        opcodes = [opcode for opcode, _ in compiled.code]
+        self.assertEqual(opcodes.count(STORE), 1)
+        self.assertEqual(opcodes.count(RECALL), 2)
+        self.assertEqual(compiled.evaluate(x=1, y=2), 6)
+
+    def test_nothing_to_optimize(self):
+        # Distinct leaves and no foldable constant: the parsed code is kept as it is
+        compiled = compile("x * 2 + y")
+        self.assertEqual(len(compiled.code), 5)
+        self.assertEqual(compiled.evaluate(x=2, y=3), 7)
+
+    def test_folded_division_by_zero(self):
+        compiled = compile("x + 1 / (2 - 2)")
+        with self.assertRaises(ValueError):
+            compiled.evaluate(x=1)
+
+    def test_variables(self):
+        result = self.calculator.evaluate("x * 2 + y ** 2", x=3, y=4)
+        self.assertEqual(result, 22)
+
+    def test_undefined_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+
+class TestNumberBackends(unittest.TestCase):
+    def test_decimal(self):
+        calculator = Calculator("decimal")
+        self.assertEqual(calculator.evaluate("0.1 + 0.2"), Decimal("0.3"))
+        self.assertEqual(calculator.evaluate("x * 2", x=Decimal("1.25")), Decimal("2.50"))
+
+    def test_decimal_context(self):
+        calculator = Calculator("decimal", Context(prec=50))
+        self.assertEqual(len(str(calculator.evaluate("1 / 3"))), 52)
+
+    def test_decimal_identities_round(self):
+        calculator = Calculator("decimal", Context(prec=3))
+        x = Decimal("1.23456")
+        for expression in ["x + 0", "x * 1", "x / 1", "x - 0", "0 + x", "x + 1 - 1"]:
+            self.assertEqual(calculator.evaluate(expression, x=x), Decimal("1.23"), expression)
+
+    def test_decimal_no_overflow_to_inf(self):
+        self.assertEqual(Calculator("decimal").evaluate("10 ** 400"), Decimal("1E+400"))
+
+    def test_fraction(self):
+        calculator = Calculator("fraction")
+        self.assertEqual(calculator.evaluate("1 / 3 + 1 / 6"), Fraction(1, 2))
+        self.assertEqual(calculator.evaluate("2 ** 100"), 2 ** 100)
+
+    def test_fraction_identity_keeps_number_type(self):
+        result = Calculator("fraction").evaluate("x / 1", x=3)
+        self.assertIs(type(result), Fraction)
+        self.assertEqual(result, Fraction(3))
+
+    def test_division_by_zero(self):
+        for numbers in ["decimal", "fraction"]:
+            with self.assertRaisesRegex(ValueError, "division by zero"):
+                Calculator(numbers).evaluate("1 / (2 - 2)")
+
+    def test_unknown_numbers(self):
+        with self.assertRaises(ValueError):
+            Calculator("complex")
+
+    def test_render(self):
+        self.assertIn("│  10.50  │", render("x", Decimal("10.50")))
+        self.assertIn("│  1/3  │", render("x", Fraction(1, 3)))
+        self.assertIn("│  8  │", render("x", Fraction(8)))
+
+
+class TestBulk(unittest.TestCase):
+    lines = ["3 + 5\n", "1 / 0\n", "\n", "0.5 * 3\n"]
+
+    def test_plain(self):
+        output = io.StringIO()
+        errors = run_bulk(self.lines, output)
+        self.assertEqual(errors, 1)
+        self.assertEqual(output.getvalue(), "8\nError: division by zero\n\n1.5\n")
+
+    def test_csv(self):
+        output = io.StringIO()
+        run_bulk(self.lines, output, "csv")
+        rows = output.getvalue().splitlines()
+        self.assertEqual(rows[0], "line,expression,result,error")
+        self.assertEqual(rows[2], "2,1 / 0,,division by zero")
+
+    def test_jsonl(self):
+        output = io.StringIO()
+        run_bulk(self.lines, output, "jsonl", numbers="fraction")
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(rows[0], {"line": 1, "expression": "3 + 5", "result": "8", "error": None})
+        self.assertEqual(rows[3]["result"], "3/2")
+
+    def test_parallel_keeps_order(self):
+        lines = [f"{i} * 2" for i in range(50)]
+        rows = list(evaluate_parallel(lines, workers=2, chunk_size=7))
+        self.assertEqual(rows, list(evaluate_lines(lines)))
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "calculator.sock")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def start(self, **options):
+        server = CalculatorServer(**options)
+        await server.start(self.path)
+        self.addAsyncCleanup(server.close)
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        self.addAsyncCleanup(self.disconnect, writer)
+        return reader, writer
+
+    async def disconnect(self, writer):
+        writer.close()
+        await writer.wait_closed()
+
+    async def request(self, connection, request):
+        reader, writer = connection
+        writer.write(json.dumps(request).encode() + b"\n")
+        return json.loads(await reader.readline())
+
+    async def test_evaluate(self):
+        connection = await self.start()
+        response = await self.request(connection, {"id": 1, "expression": "x * 2", "variables": {"x": 3}})
+        self.assertEqual(response, {"id": 1, "result": 6, "error": None})
+
+    async def test_batch_and_metrics(self):
+        connection = await self.start()
+        requests = [{"expression": "3 + 5"}, {"expression": "1 / 0"}, {"expression": "3 + 5"}]
+        response = await self.request(connection, {"id": 2, "method": "evaluate_batch", "requests": requests})
+        self.assertEqual([row["result"] for row in response["results"]], [8, None, 8])
+        self.assertEqual(response["results"][1]["error"], "division by zero")
+
+        metrics = await self.request(connection, {"method": "metrics"})
+        self.assertEqual(metrics["expressions"], 3)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertGreaterEqual(metrics["cache"]["hits"], 1)
+        self.assertIn("p99", metrics["latency_ms"])
+
+    async def test_invalid_request(self):
+        connection = await self.start()
+        response = await self.request(connection, {"id": 3, "method": "unknown"})
+        self.assertTrue(response["error"].startswith("invalid request"))
+        response = await self.request(connection, {"id": 4, "expression": "2 ** 3"})
+        self.assertEqual(response["result"], 8)
+
+    async def test_malformed_batch(self):
+        connection = await self.start()
+        for requests in [[1], 5, [{"expression": 3}], [{"expression": "x", "variables": []}]]:
+            response = await self.request(connection, {"id": 5, "method": "evaluate_batch", "requests": requests})
+            self.assertEqual(response["id"], 5)
+            self.assertTrue(response["error"].startswith("invalid request"))
+        # The connection is still open
+        response = await self.request(connection, {"expression": "1 + 1"})
+        self.assertEqual(response["result"], 2)
+
+    async def test_variables_must_be_numbers(self):
+        connection = await self.start()
+        for variables in [{"x": "a", "y": "b"}, {"x": [1], "y": [2]}, {"x": True, "y": 1}]:
+            response = await self.request(connection, {"expression": "x + y", "variables": variables})
+            self.assertIsNone(response["result"])
+            self.assertIn("must be a number", response["error"])
+
+    async def test_exact_variables(self):
+        connection = await self.start(numbers="decimal")
+        response = await self.request(connection, {"expression": "x * 3", "variables": {"x": "0.10"}})
+        self.assertEqual(response["result"], "0.30")
+
+    async def test_workers(self):
+        connection = await self.start(numbers="fraction", workers=2)
+        requests = [{"expression": f"{i} / 3"} for i in range(10)]
+        response = await self.request(connection, {"method": "evaluate_batch", "requests": requests})
+        self.assertEqual([row["result"] for row in response["results"]][:4], ["0", "1/3", "2/3", "1"])
+
+    async def test_tcp(self):
+        server = CalculatorServer()
+        host, port = await server.start(port=0)
+        self.addAsyncCleanup(server.close)
+        reader, writer = await asyncio.open_connection(host, port)
+        self.addAsyncCleanup(self.disconnect, writer)
+        response = await self.request((reader, writer), {"expression": "1.5 * 2"})
+        self.assertEqual(response["result"], 3)
+
+
+class TestAstEval(unittest.TestCase):
+    def test_expression(self):
+        self.assertEqual(ast_evaluate("-(2 + 3) * 4 ** 2"), -80)
+
+    def test_deep_expression(self):
+        self.assertEqual(ast_evaluate("+".join(["1"] * 2500)), 2500)
+
+    def test_unsupported_node(self):
+        with self.assertRaises(TypeError):
+            ast_evaluate("x + 1")
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            ast_evaluate("1 / (2 - 2)")
+
+    def test_constant_folding(self):
+        self.assertEqual(ast_compile("-(2 + 3) * 4 ** 2"), ((PUSH, -80),))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestEvaluateBatch(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    def test_arrays(self):
+        result = self.calculator.evaluate_batch("x * 2 + y ** 2", x=[1, 2, 3], y=numpy.array([4, 5, 6]))
+        self.assertEqual(result.tolist(), [18, 29, 42])
+
+    def test_division_by_zero_raises(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("x / (y - 2)", x=[1, 2, 3], y=[1, 2, 3])
+
+    def test_division_by_zero_masked(self):
+        result = self.calculator.evaluate_batch("x / (y - 2) + 1", zero_division="mask", x=[1, 2, 3], y=[1, 2, 3])
+        self.assertEqual(result.mask.tolist(), [False, True, False])
+        self.assertEqual(result.compressed().tolist(), [0, 4])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,3 +1,10 @@
+# Standard library for path normalization (used by the per-file ordering guard)
+import os
+# Thread pool for running several function calls from one AI turn at the same time
+from concurrent.futures import ThreadPoolExecutor
+# Event loop support for the streaming (async) agent loop in main.py
+import asyncio
+
 # Google Gemini types for creating properly formatted API responses
 from google.genai import types
 
@@ -7,9 +14,23 @@ from functions.get_files_info import get_files_info, schema_get_files_info
 from functions.get_file_content import get_file_content, schema_get_file_content    # Read file contents
 from functions.run_python import run_python_file, schema_run_python_file           # Execute Python scripts
 from functions.write_file_content import write_file, schema_write_file             # Create/modify files
+from functions.edit_file import edit_file, schema_edit_file                        # Patch parts of files
+from functions.search_code import search_code, schema_search_code                  # Search all files at once
+from functions.run_tests import run_tests, schema_run_tests                        # Re-run affected tests
 
 # Import our configuration (like which directory we're allowed to work in)
-from config import WORKING_DIR
+from config import WORKING_DIR, MAX_PARALLEL_CALLS
+
+# Cache of recent read results, so repeated reads of unchanged files skip the disk
+from tool_cache import tool_cache, target_path, CACHEABLE_FUNCTIONS
+# Timing spans for --trace
+from tracing import tracer
+# Cached directory listings used by get_files_info
+from functions.dir_index import directory_index
+# Index of file contents used by search_code
+from functions.code_index import code_index
+# Optional background reads of freshly listed files (--prefetch)
+from prefetch import prefetcher
 
 # This is the master list of all functions the AI can call
 # We package them into a Tool object that gets sent to the AI
@@ -19,11 +40,14 @@ available_functions = types.Tool(
         schema_get_file_content,    # AI can read files
         schema_run_python_file,     # AI can run Python scripts
         schema_write_file,          # AI can create/modify files
+        schema_edit_file,           # AI can change parts of files without rewriting them
+        schema_search_code,         # AI can search the code for text, regexes, or definitions
+        schema_run_tests,           # AI can run the tests affected by its changes
     ]
 )
 
 
-def call_function(function_call_part, verbose=False):
+def call_function(function_call_part, verbose=False, working_directory=WORKING_DIR):
     """
     This is the bridge between the AI and our actual Python functions.
     When the AI says "I want to call get_files_info", this function:
@@ -35,11 +59,32 @@ def call_function(function_call_part, verbose=False):
     Args:
         function_call_part: The AI's request to call a function (includes name and arguments)
         verbose: Whether to print detailed information about what's happening
+        working_directory: The sandbox the functions run in (benchmarks point this at a copy)
     
     Returns:
         A properly formatted response that the AI can understand
     """
     
+    # Time the whole dispatch (lookup, cache, tool body, formatting) for --trace
+    with tracer.span("call_function", "dispatch", function=function_call_part.name) as span_args:
+        return _call_function(function_call_part, verbose, span_args, working_directory)
+
+
+# What kind of work each tool's body does, so traces can be broken down by phase
+TOOL_CATEGORIES = {
+    "get_files_info": "io",
+    "get_file_content": "io",
+    "write_file": "io",
+    "edit_file": "io",
+    "search_code": "io",
+    "run_python_file": "subprocess",
+    "run_tests": "subprocess",
+}
+
+
+def _call_function(function_call_part, verbose, span_args, working_directory=WORKING_DIR):
+    """Does the actual work of call_function; span_args collects details for the trace."""
+    
     # Show what function is being called (for user feedback)
     if verbose:
         # In verbose mode, show the function name and all its arguments
@@ -55,6 +100,9 @@ def call_function(function_call_part, verbose=False):
         "get_file_content": get_file_content,    # Maps to the actual Python function
         "run_python_file": run_python_file,      # Maps to the actual Python function
         "write_file": write_file,                # Maps to the actual Python function
+        "edit_file": edit_file,                  # Maps to the actual Python function
+        "search_code": search_code,              # Maps to the actual Python function
+        "run_tests": run_tests,                  # Maps to the actual Python function
     }
     
     # Get the name of the function the AI wants to call
@@ -80,21 +128,213 @@ def call_function(function_call_part, verbose=False):
     # SECURITY: Add the working directory to the arguments
     # This ensures all functions operate in our safe sandbox directory
     # The AI doesn't control this - we inject it for security
-    args["working_directory"] = WORKING_DIR
+    args["working_directory"] = working_directory
+    
+    # Reads of files that haven't changed since last time can be answered from the cache
+    cache_key = None
+    function_result = None
+    # (Recursive listings depend on the whole tree, so they rely on the directory index instead)
+    if function_name in CACHEABLE_FUNCTIONS and not args.get("recursive"):
+        cache_key = tool_cache.make_key(function_name, args)
+        function_result = tool_cache.get(cache_key)
+        if verbose and function_result is not None:
+            print(f" - Cache hit: {function_name}")
+    span_args["cache_hit"] = function_result is not None
+    
+    if function_result is None:
+        # Actually call the Python function with the arguments
+        # The ** syntax "unpacks" the dictionary into keyword arguments
+        # So {a: 1, b: 2} becomes function_name(a=1, b=2)
+        with tracer.span(function_name, TOOL_CATEGORIES.get(function_name, "tool")):
+            function_result = function_map[function_name](**args)
+        
+        if cache_key is not None:
+            tool_cache.put(cache_key, function_result)
     
-    # Actually call the Python function with the arguments
-    # The ** syntax "unpacks" the dictionary into keyword arguments
-    # So {a: 1, b: 2} becomes function_name(a=1, b=2)
-    function_result = function_map[function_name](**args)
+    # Start reading the files the AI just listed, and attach the smallest ones
+    # (after caching, so the cached listing never carries file contents that could go stale)
+    if function_name == "get_files_info" and prefetcher.enabled:
+        function_result = prefetcher.after_listing(args, function_result)
+    
+    # Forget cached results that this call may have made out of date
+    if function_name in WRITE_FUNCTIONS:
+        tool_cache.invalidate(target_path(args))
+        directory_index.invalidate(target_path(args))
+        code_index.invalidate(target_path(args))
+    elif function_name in ("run_python_file", "run_tests"):
+        # A script (or a test) can change any file in the sandbox
+        tool_cache.clear()
+        directory_index.clear()
+    
+    span_args["result_chars"] = len(function_result) if isinstance(function_result, str) else None
     
     # Format the result so the AI can understand it
     # We wrap everything in the proper Google AI types
-    return types.Content(
-        role="tool",  # This is a response from a tool
-        parts=[
-            types.Part.from_function_response(
-                name=function_name,                        # Which function was called
-                response={"result": function_result},      # What the function returned
+    with tracer.span("from_function_response", "serialization", function=function_name):
+        return types.Content(
+            role="tool",  # This is a response from a tool
+            parts=[
+                types.Part.from_function_response(
+                    name=function_name,                        # Which function was called
+                    response={"result": function_result},      # What the function returned
+                )
+            ],
+        )
+
+
+# Functions that change files in the working directory
+# Any call to one of these must never run at the same time as another call on the same path
+WRITE_FUNCTIONS = {"write_file", "edit_file"}
+
+
+def get_call_access(function_call_part):
+    """
+    Works out which path a function call touches and whether it writes to it.
+    The parallel runner uses this to decide which calls are safe to run together.
+
+    Args:
+        function_call_part: The AI's request to call a function (includes name and arguments)
+
+    Returns:
+        A (path, is_write) tuple, where path is normalized and relative to the working directory,
+        or None if the call does not touch the file system
+    """
+    name = function_call_part.name
+    args = function_call_part.args or {}
+
+    if name in ("get_files_info", "search_code"):
+        # Listing or searching a directory reads everything in it
+        path = args.get("directory") or "."
+    elif name in ("run_python_file", "run_tests"):
+        # A script or test can import or read anything in the sandbox, so treat it as reading the whole tree
+        path = "."
+    elif "file_path" in args:
+        path = args["file_path"]
+    else:
+        return None
+
+    return os.path.normpath(path), name in WRITE_FUNCTIONS
+
+
+def _paths_overlap(path_a, path_b):
+    """Returns True if one path is the same as, or inside, the other."""
+    if path_a == "." or path_b == ".":
+        return True
+    common = os.path.commonpath([path_a, path_b])
+    return common in (path_a, path_b)
+
+
+def calls_conflict(access_a, access_b):
+    """
+    Returns True if two calls must not run at the same time.
+    Two reads never conflict; a write conflicts with anything on an overlapping path.
+    """
+    if access_a is None or access_b is None:
+        return False
+    path_a, writes_a = access_a
+    path_b, writes_b = access_b
+    return (writes_a or writes_b) and _paths_overlap(path_a, path_b)
+
+
+def call_functions(function_calls, verbose=False, max_workers=MAX_PARALLEL_CALLS, working_directory=WORKING_DIR):
+    """
+    Runs every function call from one AI turn, running independent calls concurrently.
+
+    Calls are started in the order the AI sent them. Before a call runs, it waits for every
+    earlier call it conflicts with (see calls_conflict), so a write_file and a get_file_content
+    on the same path always happen in the order the AI asked for them.
+
+    Args:
+        function_calls: List of function calls from the AI's response
+        verbose: Whether to print detailed information about what's happening
+        max_workers: Maximum number of calls running at the same time
+        working_directory: The sandbox the functions run in
+
+    Returns:
+        A list of results from call_function, in the same order as function_calls
+    """
+
+    # A single call (the most common case) doesn't need a thread pool at all
+    if len(function_calls) <= 1 or max_workers <= 1:
+        return [call_function(function_call_part, verbose, working_directory) for function_call_part in function_calls]
+
+    accesses = [get_call_access(function_call_part) for function_call_part in function_calls]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+
+        for index, function_call_part in enumerate(function_calls):
+            # Collect the earlier calls this one has to wait for
+            dependencies = [
+                futures[earlier]
+                for earlier in range(index)
+                if calls_conflict(accesses[earlier], accesses[index])
+            ]
+
+            # The executor hands out work in submission order, so every dependency
+            # was picked up by a worker before this call was - waiting on it can't deadlock
+            futures.append(
+                executor.submit(_call_after, dependencies, function_call_part, verbose, working_directory)
             )
-        ],
-    )
+
+        # Collect results in the original order, no matter which call finished first
+        return [future.result() for future in futures]
+
+
+def _call_after(dependencies, function_call_part, verbose, working_directory):
+    """Waits for the given calls to finish, then runs this one."""
+    for dependency in dependencies:
+        # Only the ordering matters here; a failed dependency is reported by its own future
+        dependency.exception()
+    return call_function(function_call_part, verbose, working_directory)
+
+
+class AsyncCallDispatcher:
+    """
+    Starts function calls as soon as the streaming agent loop sees them, instead of
+    waiting for the AI to finish its whole response.
+
+    Uses the same ordering rules as call_functions: a call waits for every earlier call
+    in the same turn that it conflicts with, and at most max_workers calls run at once.
+    The blocking tool functions run in worker threads so the event loop keeps streaming text.
+    """
+
+    def __init__(self, verbose=False, max_workers=MAX_PARALLEL_CALLS, working_directory=WORKING_DIR):
+        self.verbose = verbose
+        self.working_directory = working_directory
+        # Limits how many tool functions run at the same time
+        self.semaphore = asyncio.Semaphore(max(1, max_workers))
+        # (access, task) for every call started so far this turn, in the order the AI sent them
+        self.started = []
+
+    def submit(self, function_call_part):
+        """Starts a function call in the background (must be called from inside the event loop)."""
+        access = get_call_access(function_call_part)
+        dependencies = [
+            task for earlier_access, task in self.started
+            if calls_conflict(earlier_access, access)
+        ]
+        task = asyncio.create_task(self._run(dependencies, function_call_part))
+        self.started.append((access, task))
+
+    async def _run(self, dependencies, function_call_part):
+        if dependencies:
+            # Only the ordering matters here; a failed dependency is reported by its own task
+            await asyncio.wait(dependencies)
+        async with self.semaphore:
+            return await asyncio.to_thread(call_function, function_call_part, self.verbose, self.working_directory)
+
+    async def results(self):
+        """Waits for every started call and returns their results in submission order."""
+        return [await task for _, task in self.started]
+
+    async def cancel(self):
+        """
+        Cancels every call that hasn't finished and waits for them to stop (does nothing once
+        results() has returned). A tool function already running in its worker thread can't
+        be interrupted; asyncio.run waits for those threads before it returns.
+        """
+        tasks = [task for _, task in self.started if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,205 @@
+# Conversation history compaction
+# Every iteration of the agent loop resends the whole conversation to the AI.
+# Old tool results (file bodies, script output, directory listings) pile up and make every
+# request bigger and slower, even when newer results have made them useless.
+# This module shrinks the history before each model call by swapping stale results for short notes.
+
+# Standard library for turning function arguments into text (to estimate their size)
+import json
+# Standard library for normalizing paths so "pkg/../main.py" and "main.py" match
+import os
+
+# Google Gemini types for building the replacement message parts
+from google.genai import types
+
+# Functions that change files - a read of a file is stale once one of these rewrites it
+from call_function import WRITE_FUNCTIONS
+
+
+# Rough number of characters per token, used to estimate prompt size without calling the API
+CHARS_PER_TOKEN = 4
+
+# Every replacement starts with this marker, so already-compacted results are never touched again
+COMPACTED_MARKER = "[compacted"
+
+# Results shorter than this are not worth summarizing when trimming down to the budget
+MIN_SUMMARIZE_CHARS = 200
+
+
+def estimate_tokens(messages):
+    """
+    Estimates how many tokens a list of messages will cost as a prompt.
+    This is only an approximation (characters / CHARS_PER_TOKEN), but it is free to compute.
+    """
+    return sum(_part_chars(part) for content in messages for part in content.parts or []) // CHARS_PER_TOKEN
+
+
+def _part_chars(part):
+    """Returns the approximate size of one message part in characters."""
+    if part.text:
+        return len(part.text)
+    if part.function_call:
+        return len(part.function_call.name or "") + len(json.dumps(part.function_call.args or {}, default=str))
+    if part.function_response:
+        return len(part.function_response.name or "") + len(json.dumps(part.function_response.response or {}, default=str))
+    return 0
+
+
+def compact_messages(messages, token_budget):
+    """
+    Shrinks the conversation history in place so it fits the token budget.
+
+    Runs in two passes, stopping as soon as the history fits:
+    1. Replace stale tool results with short notes:
+       - reads of a file that was rewritten (or read again) later
+       - output of a script that was run again later with the same arguments
+       - duplicate listings of the same directory
+       - the content of a write_file call that was later overwritten
+    2. Summarize the oldest remaining tool results (and drop old write_file bodies), oldest first.
+
+    The results of the most recent turn are never touched, since the AI hasn't seen them yet.
+
+    Args:
+        messages: List of conversation messages (modified in place)
+        token_budget: Target size of the prompt in (estimated) tokens
+
+    Returns:
+        The estimated number of tokens saved
+    """
+    tokens_before = estimate_tokens(messages)
+    if tokens_before <= token_budget:
+        return 0
+
+    calls = _collect_calls(messages)
+
+    # Results from the latest tool message are still "new" to the AI
+    last_tool_index = max((call["message_index"] for call in calls), default=-1)
+    older_calls = [call for call in calls if call["message_index"] != last_tool_index]
+
+    # Pass 1: stale results
+    for position, call in enumerate(older_calls):
+        note = _stale_note(call, calls[position + 1:])
+        if note:
+            _replace_result(messages, call, note)
+        if call["name"] in WRITE_FUNCTIONS and _is_overwritten(call, calls[position + 1:]):
+            _replace_write_content(messages, call, "overwritten later")
+
+    # Pass 2: summarize what's left, oldest first, until we fit
+    for call in older_calls:
+        if estimate_tokens(messages) <= token_budget:
+            break
+        if call["name"] in WRITE_FUNCTIONS:
+            # The file on disk already holds what was written, so the AI can read it back if needed
+            _replace_write_content(messages, call, "read the file to see its current content")
+        result = _result_text(messages, call)
+        if result.startswith(COMPACTED_MARKER) or len(result) < MIN_SUMMARIZE_CHARS:
+            continue
+        first_line = result.splitlines()[0][:100] if result.strip() else ""
+        _replace_result(
+            messages,
+            call,
+            f"{COMPACTED_MARKER}: {call['name']} result ({len(result)} chars) omitted to save tokens, "
+            f"call the function again if you need it. It started with: {first_line}]",
+        )
+
+    return tokens_before - estimate_tokens(messages)
+
+
+def _collect_calls(messages):
+    """
+    Pairs every function call with its result, in conversation order.
+
+    The AI's function calls live in a "model" message and the results in the "tool" message
+    right after it, in the same order - so the N-th call matches the N-th result.
+    """
+    calls = []
+    for message_index in range(1, len(messages)):
+        tool_message = messages[message_index]
+        model_message = messages[message_index - 1]
+        if tool_message.role != "tool" or not model_message.parts:
+            continue
+
+        call_positions = [i for i, part in enumerate(model_message.parts) if part.function_call]
+        result_positions = [i for i, part in enumerate(tool_message.parts or []) if part.function_response]
+
+        for call_position, result_position in zip(call_positions, result_positions):
+            function_call = model_message.parts[call_position].function_call
+            args = dict(function_call.args or {})
+            calls.append({
+                "name": function_call.name,
+                "args": args,
+                "path": os.path.normpath(args.get("file_path") or args.get("directory") or "."),
+                "message_index": message_index,
+                "call_position": call_position,
+                "result_position": result_position,
+            })
+    return calls
+
+
+def _same_args(call, other):
+    """Returns True if two calls are the same function with the same arguments (ignoring path spelling)."""
+    if call["name"] != other["name"] or call["path"] != other["path"]:
+        return False
+    return _non_path_args(call) == _non_path_args(other)
+
+
+def _non_path_args(call):
+    """Returns a call's arguments without the path (which is compared separately, normalized)."""
+    return {key: value for key, value in call["args"].items() if key not in ("file_path", "directory")}
+
+
+def _is_overwritten(call, later_calls):
+    """Returns True if a later call writes to the same path as this one."""
+    return any(other["name"] in WRITE_FUNCTIONS and other["path"] == call["path"] for other in later_calls)
+
+
+def _stale_note(call, later_calls):
+    """Returns a short replacement note if this call's result is stale, otherwise None."""
+    name, path = call["name"], call["path"]
+
+    if name == "get_file_content":
+        if _is_overwritten(call, later_calls):
+            return f'{COMPACTED_MARKER}: earlier read of "{path}" omitted, the file was rewritten later]'
+        if any(_same_args(call, other) for other in later_calls):
+            return f'{COMPACTED_MARKER}: earlier read of "{path}" omitted, a newer read appears later]'
+
+    elif name == "get_files_info":
+        if any(_same_args(call, other) for other in later_calls):
+            return f'{COMPACTED_MARKER}: duplicate listing of "{path}" omitted, a newer listing appears later]'
+
+    elif name == "run_python_file":
+        if any(_same_args(call, other) for other in later_calls):
+            return f'{COMPACTED_MARKER}: older output of "{path}" omitted, it was run again later]'
+
+    return None
+
+
+def _result_text(messages, call):
+    """Returns the text of a call's result (or an empty string if it isn't text)."""
+    response = messages[call["message_index"]].parts[call["result_position"]].function_response.response or {}
+    result = response.get("result", response.get("error", ""))
+    return result if isinstance(result, str) else json.dumps(result, default=str)
+
+
+def _replace_result(messages, call, note):
+    """Swaps a call's result for a short note, keeping the function name so the pairing stays valid."""
+    if _result_text(messages, call).startswith(COMPACTED_MARKER):
+        return
+    messages[call["message_index"]].parts[call["result_position"]] = types.Part.from_function_response(
+        name=call["name"],
+        response={"result": note},
+    )
+
+
+def _replace_write_content(messages, call, reason):
+    """Drops the file body from an old write_file call, leaving a note with the given reason."""
+    model_message = messages[call["message_index"] - 1]
+    function_call = model_message.parts[call["call_position"]].function_call
+    args = dict(function_call.args or {})
+    content = args.get("content")
+    if not isinstance(content, str) or content.startswith(COMPACTED_MARKER) or len(content) < MIN_SUMMARIZE_CHARS:
+        return
+    args["content"] = f"{COMPACTED_MARKER}: {len(content)} chars, {reason}]"
+    model_message.parts[call["call_position"]] = types.Part(
+        function_call=function_call.model_copy(update={"args": args})
+    )
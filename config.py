@@ -17,3 +17,100 @@ MAX_CHARS = 10000
 # - Accessing files outside the project
 # "./calculator" means the "calculator" folder in the current directory
 WORKING_DIR = "./calculator"
+
+# Maximum number of function calls from a single model turn that may run at the same time
+# The AI often asks for several independent reads (plus maybe a slow script run) in one turn
+# Running them concurrently means the turn only takes as long as the slowest call
+# Calls that touch the same path are still run in their original order (see call_function.py)
+MAX_PARALLEL_CALLS = 4
+
+# The Gemini model the agent talks to
+# Shared by the regular and streaming agent loops in main.py
+MODEL_NAME = "gemini-2.0-flash-001"
+
+# Approximate token budget for the conversation history sent to the AI on each iteration
+# Before every model call, stale tool results (old file reads, old script output,
+# duplicate listings) are replaced with short notes until the history fits (see compaction.py)
+# Can be changed per run with --token-budget=N
+MAX_PROMPT_TOKENS = 30000
+
+# Limits for the tool result cache (see tool_cache.py)
+# Repeated get_file_content / get_files_info calls on unchanged paths are served from memory
+# The least recently used results are dropped when either limit is exceeded
+TOOL_CACHE_MAX_ENTRIES = 256
+TOOL_CACHE_MAX_BYTES = 4_000_000
+
+# Warm Python worker pool for run_python_file (enabled with --warm-pool, see functions/python_pool.py)
+# Each worker imports these modules once and then runs scripts in forked children,
+# so small scripts don't pay for interpreter startup and imports on every run
+PYTHON_WORKER_POOL_SIZE = 2
+# A worker is replaced with a fresh one after this many scripts (or as soon as it crashes)
+PYTHON_WORKER_MAX_RUNS = 50
+# Seconds past the script timeout to wait for a worker's reply before killing the worker
+PYTHON_WORKER_REPLY_GRACE = 5
+PYTHON_WORKER_PRELOAD = [
+    "unittest", "json", "re", "math", "collections", "itertools", "functools",
+    "operator", "ast", "decimal", "fractions", "argparse", "random", "string",
+]
+
+# Output limits for run_python_file (see functions/output_capture.py)
+# At most MAX_OUTPUT_BYTES of each stream (stdout/stderr) is kept: the first half and the last half,
+# so the last lines and any traceback survive. A script that prints more than OUTPUT_KILL_BYTES
+# in total is stopped early instead of running until the timeout
+MAX_OUTPUT_BYTES = 20000
+OUTPUT_KILL_BYTES = 4_000_000
+
+# Directory listing limits for get_files_info
+# A recursive listing stops after LIST_MAX_ENTRIES entries (and says so),
+# and directories matching LIST_DEFAULT_EXCLUDES are never listed or entered
+LIST_MAX_ENTRIES = 500
+LIST_DEFAULT_EXCLUDES = ["__pycache__", ".git", "*.pyc"]
+
+# Limits for the search_code tool (see functions/search_code.py)
+# At most SEARCH_MAX_RESULTS matching lines are returned, each cut to SEARCH_SNIPPET_CHARS,
+# and files larger than SEARCH_MAX_FILE_BYTES are not indexed
+SEARCH_MAX_RESULTS = 50
+SEARCH_SNIPPET_CHARS = 160
+SEARCH_MAX_FILE_BYTES = 1_000_000
+
+# Batch mode (--batch=FILE, see batch.py)
+# BATCH_WORKERS conversations run at the same time, sharing one client. Model calls from all of
+# them together are spaced out to stay under BATCH_REQUESTS_PER_MINUTE, and calls rejected with
+# "rate limited" or "unavailable" errors are retried up to BATCH_MAX_RETRIES times with
+# exponential backoff starting at BATCH_RETRY_DELAY seconds
+BATCH_WORKERS = 4
+BATCH_REQUESTS_PER_MINUTE = 60
+BATCH_MAX_RETRIES = 5
+BATCH_RETRY_DELAY = 2.0
+
+# Per-run sandboxes (--isolated, and every --batch task, see sandbox.py)
+# Each run works in its own snapshot of WORKING_DIR, created under SANDBOX_ROOT
+# (on the same file system as the project, so files can be cloned instead of copied)
+# SANDBOX_STRATEGY: "auto" (reflink clone if the file system supports it, else copy),
+# "reflink", "hardlink" (fast everywhere, but scripts writing into files in place would
+# change the originals), or "copy"
+SANDBOX_ROOT = "./.sandboxes"
+SANDBOX_STRATEGY = "auto"
+
+# On-disk cache of model responses (--response-cache[=DIR], see response_cache.py)
+# A conversation that exactly matches an earlier one (same model, system prompt, tools and
+# messages) gets the earlier response from disk instead of calling the API.
+# Entries older than RESPONSE_CACHE_TTL seconds are ignored, and the least recently used
+# entries are deleted once the cache is larger than RESPONSE_CACHE_MAX_BYTES
+RESPONSE_CACHE_DIR = "./.response_cache"
+RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60
+RESPONSE_CACHE_MAX_BYTES = 50_000_000
+
+# Speculative prefetch after directory listings (--prefetch, see prefetch.py)
+# After get_files_info, the listed files of at most PREFETCH_MAX_FILE_BYTES each are read into the
+# tool result cache in the background, up to PREFETCH_MAX_BYTES per listing, so the follow-up
+# get_file_content is answered from memory. The smallest ones, up to PREFETCH_INLINE_BYTES in total,
+# are also attached to the listing itself, which can save the AI a whole turn
+PREFETCH_MAX_BYTES = 200_000
+PREFETCH_MAX_FILE_BYTES = 10000
+PREFETCH_INLINE_BYTES = 3000
+
+# Incremental test runner (the run_tests tool, see functions/run_tests.py)
+# Test files run in up to RUN_TESTS_SHARDS processes at once, each stopped after RUN_TESTS_TIMEOUT seconds
+RUN_TESTS_SHARDS = 4
+RUN_TESTS_TIMEOUT = 60
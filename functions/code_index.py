@@ -0,0 +1,187 @@
+# Code index for the search_code tool
+# Instead of re-reading every file on every search, we keep each text file's lines in memory,
+# plus two lookup tables built from them:
+# - an inverted index: identifier-like word -> files containing it (narrows literal searches)
+# - a symbol table: function/class name -> where it is defined (from Python's ast module)
+# Files are (re)indexed lazily: only when a search runs and the file changed since last time.
+
+# Standard library for operating system operations
+import os
+# Standard library for regular expressions (word splitting and regex search)
+import re
+# Standard library for parsing Python files to find function and class definitions
+import ast
+# Lock so parallel function calls can share the index safely
+import threading
+
+# Walks the sandbox reusing cached directory listings, skipping the same names listings skip
+from functions.dir_index import directory_index, is_excluded
+# Files bigger than this are not indexed
+from config import SEARCH_MAX_FILE_BYTES
+
+
+# Identifier-like words - what people usually search for in code
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class IndexedFile:
+    """Everything the index knows about one file."""
+
+    def __init__(self, fingerprint, lines, words, symbols):
+        # (mtime_ns, size) when the file was indexed
+        self.fingerprint = fingerprint
+        self.lines = lines
+        # Set of identifier-like words in the file
+        self.words = words
+        # List of (name, kind, line_number) for Python definitions
+        self.symbols = symbols
+
+
+class CodeIndex:
+    """
+    Inverted index over all text files in one directory tree.
+    Keyed by the files' absolute paths, so several sandboxes can share one CodeIndex.
+    """
+
+    def __init__(self):
+        # absolute path -> IndexedFile
+        self.files = {}
+        # word -> set of absolute paths containing it
+        self.postings = {}
+        # symbol name -> set of absolute paths defining it
+        self.symbol_files = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, abs_root):
+        """
+        Brings the index up to date for every file under abs_root and returns their paths.
+        Only files whose (mtime, size) changed since they were last indexed are read again.
+        """
+        seen = []
+        for _, entry, _ in directory_index.walk(abs_root, skip=lambda entry: is_excluded(entry.name)):
+            if entry.is_dir or entry.size > SEARCH_MAX_FILE_BYTES:
+                continue
+            seen.append(entry.path)
+            self._update_file(entry.path)
+
+        # Forget files that were deleted
+        seen_set = set(seen)
+        prefix = abs_root.rstrip(os.sep) + os.sep
+        with self.lock:
+            gone = [path for path in self.files if path.startswith(prefix) and path not in seen_set]
+        for path in gone:
+            self._remove_file(path)
+        return seen
+
+    def invalidate(self, path):
+        """Marks a file as changed, so it is re-indexed on the next search."""
+        path = os.path.abspath(path)
+        with self.lock:
+            indexed = self.files.get(path)
+            if indexed is not None:
+                indexed.fingerprint = None
+
+    def _update_file(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._remove_file(path)
+            return
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            indexed = self.files.get(path)
+        if indexed is not None and indexed.fingerprint == fingerprint:
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (UnicodeDecodeError, OSError):
+            # Binary or unreadable files aren't searchable
+            self._remove_file(path)
+            return
+
+        words = set()
+        for line in lines:
+            words.update(WORD_PATTERN.findall(line))
+        symbols = _python_symbols("\n".join(lines)) if path.endswith(".py") else []
+
+        self._remove_file(path)
+        with self.lock:
+            self.files[path] = IndexedFile(fingerprint, lines, words, symbols)
+            for word in words:
+                self.postings.setdefault(word, set()).add(path)
+            for name, _, _ in symbols:
+                self.symbol_files.setdefault(name, set()).add(path)
+
+    def _remove_file(self, path):
+        with self.lock:
+            indexed = self.files.pop(path, None)
+            if indexed is None:
+                return
+            for word in indexed.words:
+                paths = self.postings.get(word)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self.postings[word]
+            for name, _, _ in indexed.symbols:
+                paths = self.symbol_files.get(name)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self.symbol_files[name]
+
+    def candidates_for_literal(self, paths, query):
+        """
+        Narrows the files that could contain a literal string, using the words in it.
+        A word fully inside the query must appear in the file as a word too. The first and last
+        words might be cut off (e.g. "alc" in "calc"), so they can't be used for narrowing.
+        """
+        words = WORD_PATTERN.findall(query)
+        inner_words = [
+            word for word in words
+            if re.search(r"(?<![A-Za-z0-9_])" + re.escape(word) + r"(?![A-Za-z0-9_])", query)
+            and not query.startswith(word) and not query.endswith(word)
+        ]
+        if not inner_words:
+            return paths
+        with self.lock:
+            allowed = set.intersection(*(self.postings.get(word, set()) for word in inner_words))
+        return [path for path in paths if path in allowed]
+
+    def lines_of(self, path):
+        with self.lock:
+            indexed = self.files.get(path)
+        return indexed.lines if indexed is not None else []
+
+    def symbols_named(self, name):
+        """Returns [(path, kind, line_number)] for definitions with exactly this name."""
+        with self.lock:
+            paths = sorted(self.symbol_files.get(name, ()))
+            return [
+                (path, kind, line_number)
+                for path in paths
+                for symbol_name, kind, line_number in self.files[path].symbols
+                if symbol_name == name
+            ]
+
+
+def _python_symbols(source):
+    """Returns (name, kind, line_number) for every def and class in a Python source string."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    symbols = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append((node.name, "def", node.lineno))
+        elif isinstance(node, ast.ClassDef):
+            symbols.append((node.name, "class", node.lineno))
+    return symbols
+
+
+# The one shared index
+code_index = CodeIndex()
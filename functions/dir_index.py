@@ -0,0 +1,116 @@
+# In-process directory index for get_files_info (and anything else that walks the sandbox)
+# Listing a directory means one os.scandir() plus a stat for every entry. When the AI explores
+# the same tree over and over, most directories haven't changed since the last look, so we keep
+# each directory's entries and only re-scan directories whose modification time changed.
+
+# Standard library for operating system operations (scandir, stat)
+import os
+# Standard library for wildcard matching of excluded names
+import fnmatch
+# Lock so parallel function calls can share the index safely
+import threading
+# Lightweight record type for directory entries
+from collections import namedtuple
+
+# Names every walk of the sandbox skips (__pycache__, .git, ...)
+from config import LIST_DEFAULT_EXCLUDES
+
+
+# One entry of a directory listing (is_link: the entry is a symlink, to a file or a directory)
+DirEntry = namedtuple("DirEntry", ["name", "path", "is_dir", "size", "is_link"])
+
+
+def is_excluded(name, extra_patterns=()):
+    """
+    Checks a file or directory name against LIST_DEFAULT_EXCLUDES and any extra wildcard
+    patterns. Every tool that walks the sandbox skips these, and doesn't go inside them.
+    """
+    return any(fnmatch.fnmatch(name, pattern) for pattern in LIST_DEFAULT_EXCLUDES) or any(
+        fnmatch.fnmatch(name, pattern) for pattern in extra_patterns
+    )
+
+
+class DirectoryIndex:
+    """
+    Caches directory listings keyed by absolute path, each tagged with the directory's mtime.
+    A directory's mtime changes when entries are added, removed or renamed, so an unchanged
+    mtime means the cached names are still right. File sizes can change without touching the
+    directory's mtime, so writers call invalidate() for the paths they change.
+    """
+
+    def __init__(self):
+        # absolute directory path -> (mtime_ns, [DirEntry, ...])
+        self.listings = {}
+        self.lock = threading.Lock()
+
+    def list_dir(self, abs_dir):
+        """Returns the entries of a directory (sorted by name), re-scanning only if it changed."""
+        mtime = os.stat(abs_dir).st_mtime_ns
+        with self.lock:
+            cached = self.listings.get(abs_dir)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        entries = []
+        with os.scandir(abs_dir) as scan:
+            for entry in scan:
+                try:
+                    # scandir gets is_dir from the directory read itself, and the stat is one call
+                    is_dir = entry.is_dir()
+                    size = entry.stat().st_size
+                    is_link = entry.is_symlink()
+                except OSError:
+                    # Broken symlinks and files deleted mid-scan
+                    continue
+                entries.append(DirEntry(entry.name, entry.path, is_dir, size, is_link))
+        entries.sort(key=lambda entry: entry.name)
+
+        with self.lock:
+            self.listings[abs_dir] = (mtime, entries)
+        return entries
+
+    def walk(self, abs_dir, max_depth=None, skip=None):
+        """
+        Yields (relative_path, DirEntry, depth) for everything under abs_dir, depth first.
+        Directories for which skip(entry) returns True are neither yielded nor entered.
+        Symlinked directories are listed but not entered (like os.walk), since they can
+        point outside the sandbox or back up the tree.
+        """
+        # Each stack item is (iterator over a directory's entries, path prefix, depth)
+        # Using our own stack instead of recursion keeps deep trees from hitting Python's recursion limit
+        stack = [(iter(self.list_dir(abs_dir)), "", 0)]
+        while stack:
+            entries, prefix, depth = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+            if skip is not None and skip(entry):
+                continue
+
+            relative_path = prefix + entry.name
+            yield relative_path, entry, depth
+
+            # Go into subdirectories right away, so their contents are listed under them
+            if entry.is_dir and not entry.is_link and (max_depth is None or depth + 1 < max_depth):
+                try:
+                    stack.append((iter(self.list_dir(entry.path)), relative_path + "/", depth + 1))
+                except OSError:
+                    # Unreadable directory - list it, but don't go inside
+                    pass
+
+    def invalidate(self, path):
+        """Forgets cached listings that include a changed path (its own and its parent's)."""
+        path = os.path.abspath(path)
+        with self.lock:
+            self.listings.pop(path, None)
+            self.listings.pop(os.path.dirname(path), None)
+
+    def clear(self):
+        """Forgets everything (e.g. after running a script, which could have changed anything)."""
+        with self.lock:
+            self.listings.clear()
+
+
+# The one shared index
+directory_index = DirectoryIndex()
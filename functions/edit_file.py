@@ -0,0 +1,262 @@
+# Standard library for operating system operations (file handling)
+import os
+# Standard library for parsing unified diff hunk headers like "@@ -3,4 +3,5 @@"
+import re
+# Google AI types for function schemas
+from google.genai import types
+# Shared check that keeps paths inside the working directory, and atomic file writes
+from functions.paths import resolve_path, write_atomic
+
+
+def edit_file(working_directory, file_path, edits=None, diff=None):
+    """
+    Changes part of an existing file, instead of rewriting the whole thing.
+    This is like a find-and-replace, or like applying a patch with the 'patch' command.
+
+    Args:
+        working_directory: The base directory we're allowed to work in (injected for security)
+        file_path: Path to the file to edit (relative to working_directory)
+        edits: List of {"search": ..., "replace": ...} dictionaries, applied in order
+        diff: A unified diff (like the output of 'diff -u' or 'git diff') for this file
+
+    Returns:
+        A short success message with the number of edits and changed lines, or an error message
+
+    Safety Notes:
+        - Only edits files within the working directory
+        - Every search text must appear exactly once, so an edit can't hit the wrong place
+        - Diff hunks must match whole lines of the file in exactly one place
+        - If any edit fails, the file is left untouched
+        - The new content is written to a temporary file first and then renamed over the
+          original, so the file is never left half-written
+    """
+
+    # Build the full path to the file we want to edit (None if it's outside the working directory)
+    abs_file_path = resolve_path(working_directory, file_path)
+
+    # SECURITY CHECK: Make sure the file is inside our allowed working directory
+    if abs_file_path is None:
+        return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+
+    # Editing only makes sense for files that already exist (use write_file to create new ones)
+    if not os.path.isfile(abs_file_path):
+        return f'Error: File not found or is not a regular file: "{file_path}"'
+
+    # Split the diff (if given) into hunks, which are applied after the search/replace edits
+    edits = list(edits or [])
+    try:
+        hunks = parse_unified_diff(diff) if diff else []
+    except ValueError as e:
+        return f"Error: {e}"
+
+    if not edits and not hunks:
+        return "Error: No edits given. Provide either edits or diff."
+
+    try:
+        # newline="" keeps the file's own line endings exactly as they are
+        with open(abs_file_path, "r", newline="") as f:
+            content = f.read()
+
+        added_lines = 0
+        removed_lines = 0
+
+        # Apply each edit to the result of the previous one
+        for number, edit in enumerate(edits, start=1):
+            search = edit.get("search", "")
+            replace = edit.get("replace", "")
+
+            if not search:
+                return f"Error: Edit {number} has an empty search text"
+
+            # The search text must match exactly once - otherwise we'd be guessing
+            matches = content.count(search)
+            if matches == 0:
+                return f'Error: Edit {number} not applied, its search text was not found in "{file_path}"'
+            if matches > 1:
+                return (
+                    f'Error: Edit {number} not applied, its search text matches {matches} places '
+                    f'in "{file_path}". Include more surrounding lines to make it unique'
+                )
+
+            content = content.replace(search, replace, 1)
+
+            # Count changed lines, ignoring unchanged context at the start and end of the edit
+            old_lines = search.splitlines()
+            new_lines = replace.splitlines()
+            while old_lines and new_lines and old_lines[0] == new_lines[0]:
+                old_lines.pop(0)
+                new_lines.pop(0)
+            while old_lines and new_lines and old_lines[-1] == new_lines[-1]:
+                old_lines.pop()
+                new_lines.pop()
+            removed_lines += len(old_lines)
+            added_lines += len(new_lines)
+
+        # Then each diff hunk, numbered after the edits
+        for number, hunk in enumerate(hunks, start=len(edits) + 1):
+            try:
+                content = apply_hunk(content, hunk)
+            except ValueError as e:
+                return f'Error: Edit {number} not applied to "{file_path}": {e}'
+            removed_lines += sum(marker == "-" for marker, _ in hunk)
+            added_lines += sum(marker == "+" for marker, _ in hunk)
+
+        write_atomic(abs_file_path, content)
+
+        # Keep the confirmation short - the AI already knows what it changed
+        return (
+            f'Successfully edited "{file_path}": {len(edits) + len(hunks)} edit(s) applied '
+            f"(+{added_lines} -{removed_lines} lines)"
+        )
+
+    except Exception as e:
+        # Handle errors like permission problems or files that aren't text
+        return f"Error: editing file: {e}"
+
+
+# Matches a hunk header like "@@ -12,3 +12,4 @@"
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def parse_unified_diff(diff):
+    """
+    Splits a unified diff into hunks. Each hunk is a list of (marker, line) pairs, where
+    marker is " " for context, "-" for a removed line and "+" for an added line, and line
+    ends with "\n" unless the diff says "\ No newline at end of file". Line numbers are
+    ignored - the context is what locates the hunk, which keeps working even if the file
+    shifted a bit.
+    """
+    hunks = []
+    # Lines of the hunk being read (None while we're outside a hunk, e.g. in the file headers)
+    hunk = None
+    lines = diff.splitlines()
+
+    def finish_hunk():
+        if hunk is not None:
+            hunks.append(hunk)
+
+    for index, line in enumerate(lines):
+        next_line = lines[index + 1] if index + 1 < len(lines) else ""
+
+        if HUNK_HEADER.match(line):
+            finish_hunk()
+            hunk = []
+            continue
+
+        # A "--- a/file" + "+++ b/file" pair starts a new file section, not a removed line
+        if line.startswith("--- ") and next_line.startswith("+++ "):
+            finish_hunk()
+            hunk = None
+            continue
+
+        if hunk is None:
+            # File headers ("diff --git", "index", "+++ b/file") and anything before the first hunk
+            continue
+
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the line just before it
+            if hunk:
+                marker, text = hunk[-1]
+                hunk[-1] = (marker, text[:-1])
+            continue
+
+        # Some tools drop the leading space on empty context lines
+        marker, text = (line[:1], line[1:]) if line else (" ", "")
+        if marker not in " -+":
+            # Anything else ends the hunk
+            finish_hunk()
+            hunk = None
+            continue
+        hunk.append((marker, text + "\n"))
+
+    finish_hunk()
+    if not hunks:
+        raise ValueError("diff contains no hunks (expected lines starting with @@)")
+    return hunks
+
+
+def apply_hunk(content, hunk):
+    """
+    Applies one hunk from parse_unified_diff() to content and returns the new content.
+    The hunk's context and removed lines must match whole lines of the file, in exactly
+    one place - so "-return x" doesn't match "    return x", or the middle of a longer line.
+    Line endings don't count ("\r\n" files match "\n" diffs, and keep their "\r\n"), and if
+    nothing matches exactly, trailing whitespace is ignored. Raises ValueError otherwise.
+    """
+    lines = content.splitlines(keepends=True)
+    # Added lines get the same line ending as the rest of the file
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    old_lines = [text for marker, text in hunk if marker != "+"]
+    if not old_lines:
+        raise ValueError("its hunk has no context or removed lines to find it by")
+
+    # First compare lines without their line endings, then also without trailing whitespace
+    for key in (lambda line: line.rstrip("\r\n"), str.rstrip):
+        wanted = [key(text) for text in old_lines]
+        file_keys = [key(line) for line in lines]
+        starts = [
+            start
+            for start in range(len(lines) - len(wanted) + 1)
+            if file_keys[start:start + len(wanted)] == wanted
+        ]
+        if starts:
+            break
+
+    if not starts:
+        raise ValueError("its context and removed lines were not found")
+    if len(starts) > 1:
+        raise ValueError(
+            f"its context and removed lines match {len(starts)} places. Include more context lines to make it unique"
+        )
+
+    start = starts[0]
+    matched = iter(lines[start:start + len(old_lines)])
+    new_lines = []
+    for marker, text in hunk:
+        if marker == "+":
+            new_lines.append(text[:-1] + newline if text.endswith("\n") else text)
+        else:
+            # Context keeps the file's own text; removed lines are dropped
+            line = next(matched)
+            if marker == " ":
+                new_lines.append(line)
+    return "".join(lines[:start] + new_lines + lines[start + len(old_lines):])
+
+
+# Schema that tells the AI how to use this function
+schema_edit_file = types.FunctionDeclaration(
+    name="edit_file",  # Function name the AI will use
+    description="Edits an existing file within the working directory without rewriting it. Takes search/replace edits (each search text must match exactly once) or a unified diff. All edits are applied together or not at all. Prefer this over write_file for changing existing files.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,  # Parameters passed as an object
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,  # file_path must be a string
+                description="Path to the file to edit, relative to the working directory.",
+            ),
+            "edits": types.Schema(
+                type=types.Type.ARRAY,  # edits is a list of search/replace pairs
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "search": types.Schema(
+                            type=types.Type.STRING,
+                            description="Exact text to find. Must appear exactly once in the file; include surrounding lines if needed.",
+                        ),
+                        "replace": types.Schema(
+                            type=types.Type.STRING,
+                            description="Text to put in its place.",
+                        ),
+                    },
+                    required=["search", "replace"],
+                ),
+                description="Search/replace edits, applied in order.",
+            ),
+            "diff": types.Schema(
+                type=types.Type.STRING,  # diff must be a string
+                description="A unified diff for this file (hunks starting with @@). Each hunk's context and removed lines must match whole lines of the file in exactly one place. Can be used instead of edits.",
+            ),
+        },
+        required=["file_path"],  # file_path is required, plus either edits or diff
+    ),
+)
@@ -4,59 +4,94 @@ import os
 from google.genai import types
 # Our configuration settings (like maximum file size to read)
 from config import MAX_CHARS
+# Shared check that keeps paths inside the working directory
+from functions.paths import resolve_path
 
 
-def get_file_content(working_directory, file_path):
+def get_file_content(working_directory, file_path, offset=0, length=None):
     """
-    Reads the contents of a text file, with size limits and security constraints.
-    This is like the 'cat' command on Unix or 'type' command on Windows.
+    Reads part of a text file, with size limits and security constraints.
+    This is like the 'cat' command on Unix or 'type' command on Windows,
+    but it can also read a file in pages (like 'tail -c +OFFSET | head -c LENGTH').
     
     Args:
         working_directory: The base directory we're allowed to work in (injected for security)
         file_path: Path to the file to read (relative to working_directory)
+        offset: Byte position to start reading from (0 = start of the file)
+        length: Maximum number of bytes to read (at most MAX_CHARS, which is also the default)
     
     Returns:
-        The file contents as a string, possibly truncated if too large
+        The requested part of the file as a string. If more of the file follows, a note is
+        added with the file's total size and the offset to continue from.
         
     Security Notes:
         - Only reads files within the working directory (prevents path traversal)
-        - Limits file size to prevent memory/API token issues
+        - Limits read size to prevent memory/API token issues
         - Only reads text files (binary files might cause encoding errors)
     """
     
-    # Convert the working directory to an absolute path for security checks
-    # Example: "./calculator" becomes "/home/user/project/calculator"
-    abs_working_dir = os.path.abspath(working_directory)
-    
-    # Build the full path to the file we want to read
-    # os.path.join() handles path separators correctly across operating systems
-    abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
+    # Build the full path to the file we want to read (None if it's outside the working directory)
+    # Example: "main.py" in "./calculator" becomes "/home/user/project/calculator/main.py"
+    abs_file_path = resolve_path(working_directory, file_path)
     
     # SECURITY CHECK: Make sure the file is inside our allowed working directory
     # This prevents attacks like file_path="../../../etc/passwd" that try to read system files
-    if not abs_file_path.startswith(abs_working_dir):
+    if abs_file_path is None:
         return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
     
     # Check if the file actually exists and is a regular file (not a directory or special file)
     if not os.path.isfile(abs_file_path):
         return f'Error: File not found or is not a regular file: "{file_path}"'
     
+    # The AI sends numbers as JSON, so they might arrive as floats like 10000.0
+    offset = int(offset or 0)
+    if offset < 0:
+        return f'Error: offset must be 0 or more, got {offset}'
+    # A negative length would make read() return the whole file, past the MAX_CHARS limit
+    if length is not None and int(length) <= 0:
+        return f'Error: length must be at least 1, got {int(length)}'
+    length = MAX_CHARS if length is None else min(int(length), MAX_CHARS)
+    
     # Try to read the file (wrapped in try/except for error handling)
     try:
-        # Open the file in read mode with UTF-8 encoding (standard for text files)
+        # Open the file in binary mode so we can jump straight to the offset
         # The 'with' statement ensures the file is properly closed even if an error occurs
-        with open(abs_file_path, "r") as f:
-            # Read up to MAX_CHARS characters from the file
-            # f.read(MAX_CHARS) reads at most MAX_CHARS characters, not the whole file
-            # This prevents memory issues with huge files and API token limits
-            content = f.read(MAX_CHARS)
+        with open(abs_file_path, "rb") as f:
+            total_size = os.fstat(f.fileno()).st_size
+            # Reading past the end would return an empty page - and a note to read there again
+            if offset > total_size:
+                return f'Error: offset {offset} is past the end of the file (size {total_size})'
+            
+            # seek() moves to the offset without reading (or decoding) anything before it
+            f.seek(offset)
+            data = f.read(length)
             
-            # If we read exactly MAX_CHARS, the file was probably larger
-            # Add a note to let the user know the file was truncated
-            if len(content) == MAX_CHARS:
-                content += (
-                    f'[...File "{file_path}" truncated at {MAX_CHARS} characters]'
-                )
+            # If the offset landed in the middle of a multi-byte character, skip its leftover bytes
+            # (UTF-8 continuation bytes always look like 0b10xxxxxx)
+            skipped = 0
+            while skipped < len(data) and skipped < 3 and data[skipped] & 0xC0 == 0x80:
+                skipped += 1
+            data = data[skipped:]
+            offset += skipped
+            
+            # A partial character is only left for the next page if the file continues;
+            # at the end of the file it can never be completed, so it is a decoding error
+            at_eof = offset + len(data) >= total_size
+            content = _decode_utf8_prefix(data, at_eof)
+            # A page shorter than one character would come back empty and never advance,
+            # so read the rest of that character (at most 3 more bytes)
+            if not content and data and not at_eof:
+                data += f.read(3)
+                at_eof = offset + len(data) >= total_size
+                content = _decode_utf8_prefix(data, at_eof)
+            end = offset + len(content.encode("utf-8"))
+        
+        # If there is more file after what we read, tell the AI where to continue
+        if end < total_size:
+            content += (
+                f'[...File "{file_path}" truncated: showed bytes {offset}-{end} of {total_size}, '
+                f'continue with offset={end}]'
+            )
         
         # Return the file contents (possibly with truncation notice)
         return content
@@ -70,11 +105,26 @@ def get_file_content(working_directory, file_path):
         return f'Error reading file "{file_path}": {e}'
 
 
+def _decode_utf8_prefix(data, at_eof=False):
+    """
+    Decodes bytes as UTF-8. If the bytes end in the middle of a character (because the read
+    stopped there), that partial character is left out - the next page will start with it.
+    Any other invalid byte still raises UnicodeDecodeError (the file probably isn't text),
+    and so does a partial character at the end of the file (at_eof), which has no next page.
+    """
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if not at_eof and e.start >= len(data) - 3 and e.reason == "unexpected end of data":
+            return data[:e.start].decode("utf-8")
+        raise
+
+
 # Schema that tells the AI how to use this function
 schema_get_file_content = types.FunctionDeclaration(
     name="get_file_content",  # Function name the AI will use
-    # Description includes the character limit so the AI knows about truncation
-    description=f"Reads and returns the first {MAX_CHARS} characters of the content from a specified file within the working directory.",
+    # Description includes the size limit so the AI knows about truncation and paging
+    description=f"Reads up to {MAX_CHARS} bytes of a file within the working directory, starting at an optional byte offset. If the file continues, the result ends with a note giving the total size and the offset to continue from.",
     parameters=types.Schema(
         type=types.Type.OBJECT,  # Parameters passed as an object
         properties={
@@ -82,6 +132,14 @@ schema_get_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,  # file_path must be a string
                 description="The path to the file whose content should be read, relative to the working directory.",
             ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,  # offset must be a whole number
+                description="Byte offset to start reading from. Defaults to 0 (the start of the file). Use the offset from a truncation note to read the next part.",
+            ),
+            "length": types.Schema(
+                type=types.Type.INTEGER,  # length must be a whole number
+                description=f"Maximum number of bytes to read, at least 1. Defaults to (and is capped at) {MAX_CHARS}.",
+            ),
         },
         required=["file_path"],  # file_path is required (AI must provide it)
     ),
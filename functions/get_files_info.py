@@ -1,17 +1,33 @@
 # Standard library for operating system operations (file/directory handling)
 import os
+# Standard library for shell-style wildcard matching like "*.py"
+import fnmatch
 # Google AI types for creating function schemas that the AI can understand
 from google.genai import types
+# Cached directory listings, refreshed only for directories that changed
+from functions.dir_index import directory_index, is_excluded
+# Limits and default ignore patterns for listings
+from config import LIST_MAX_ENTRIES, LIST_DEFAULT_EXCLUDES
+# Shared check that keeps paths inside the working directory
+from functions.paths import resolve_path
 
 
-def get_files_info(working_directory, directory=None):
+def get_files_info(working_directory, directory=None, recursive=False, max_depth=None,
+                   include=None, exclude=None, max_entries=None):
     """
     Lists all files and directories in a specified folder, with security constraints.
-    This is like the 'ls' command on Unix or 'dir' command on Windows.
+    This is like the 'ls' command on Unix or 'dir' command on Windows
+    (or 'find' when recursive is True).
     
     Args:
         working_directory: The base directory we're allowed to work in (injected for security)
         directory: Optional subdirectory to list (relative to working_directory)
+        recursive: Also list everything inside subdirectories
+        max_depth: How many directory levels to list when recursive (1 = just this directory)
+        include: Optional list of wildcard patterns (like "*.py"); only matching files are listed
+        exclude: Optional list of wildcard patterns to skip, on top of LIST_DEFAULT_EXCLUDES
+                 (like "__pycache__" and ".git")
+        max_entries: Maximum number of entries to return (default and cap: LIST_MAX_ENTRIES)
     
     Returns:
         A string with formatted information about each file/directory
@@ -21,52 +37,59 @@ def get_files_info(working_directory, directory=None):
         files outside the working directory using paths like "../../../etc/passwd"
     """
     
-    # Get the absolute path of our working directory
-    # os.path.abspath() converts relative paths like "./calculator" to full paths like "/home/user/project/calculator"
-    abs_working_dir = os.path.abspath(working_directory)
-    
-    # Start with the working directory as our target
-    target_dir = abs_working_dir
-    
-    # If a specific subdirectory was requested, calculate its path
-    if directory:
-        # os.path.join() safely combines paths (handles / vs \ on different operating systems)
-        # Then get the absolute path to the target directory
-        target_dir = os.path.abspath(os.path.join(working_directory, directory))
+    # Work out the directory to list: the working directory itself, or the requested subdirectory
+    # (None if the subdirectory is outside the working directory)
+    target_dir = resolve_path(working_directory, directory)
     
     # SECURITY CHECK: Make sure the target directory is inside our allowed working directory
     # This prevents attacks like directory="../../../etc" that try to escape the sandbox
-    if not target_dir.startswith(abs_working_dir):
+    if target_dir is None:
         return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
     
     # Check if the target is actually a directory (not a file)
     if not os.path.isdir(target_dir):
         return f'Error: "{directory}" is not a directory'
     
+    # The AI sends numbers as JSON, so they might arrive as floats like 3.0
+    max_depth = int(max_depth) if max_depth else None
+    max_entries = min(int(max_entries), LIST_MAX_ENTRIES) if max_entries else LIST_MAX_ENTRIES
+    include_patterns = list(include or [])
+    
+    # Skip anything whose name matches an exclude pattern (or a default one) - and don't go inside it
+    def skip(entry):
+        return is_excluded(entry.name, exclude or [])
+    
     # Try to list the files (wrapped in try/except for error handling)
     try:
         # List to collect information about each file
         files_info = []
         
-        # os.listdir() returns a list of all items in the directory
-        for filename in os.listdir(target_dir):
-            # Build the full path to this file/directory
-            filepath = os.path.join(target_dir, filename)
-            
-            # Initialize file size (we'll set this properly below)
-            file_size = 0
-            
-            # Check if this item is a directory or a file
-            is_dir = os.path.isdir(filepath)
+        # Without recursive we only look at one level, which is the same as depth 1
+        depth_limit = max_depth if recursive else 1
+        
+        # The directory index walks the tree with os.scandir() and reuses listings
+        # of directories that haven't changed since the last call
+        for relative_path, entry, depth in directory_index.walk(target_dir, depth_limit, skip):
+            # With include patterns, only list matching files (directories are still searched)
+            if include_patterns and (
+                entry.is_dir
+                or not any(
+                    fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(relative_path, pattern)
+                    for pattern in include_patterns
+                )
+            ):
+                continue
             
-            # Get the size of the file/directory in bytes
-            # For directories, this is usually 4096 bytes (the size of the directory entry)
-            file_size = os.path.getsize(filepath)
+            # Stop at the limit, and tell the AI there was more
+            if len(files_info) >= max_entries:
+                files_info.append(f"[... listing truncated at {max_entries} entries]")
+                break
             
             # Format the information in a human-readable way
-            # Example output: "- script.py: file_size=1234 bytes, is_dir=False"
+            # Example output: "- pkg/calculator.py: file_size=1234 bytes, is_dir=False"
+            # For directories, file_size is the size of the directory entry (usually 4096 bytes)
             files_info.append(
-                f"- {filename}: file_size={file_size} bytes, is_dir={is_dir}"
+                f"- {relative_path}: file_size={entry.size} bytes, is_dir={entry.is_dir}"
             )
         
         # Join all the file information with newlines to create a readable list
@@ -81,7 +104,7 @@ def get_files_info(working_directory, directory=None):
 # Think of it as the function's "instruction manual" for the AI
 schema_get_files_info = types.FunctionDeclaration(
     name="get_files_info",  # The name the AI will use to call this function
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
+    description="Lists files in the specified directory along with their sizes, constrained to the working directory. Set recursive to list the whole tree below it in one call.",
     parameters=types.Schema(
         type=types.Type.OBJECT,  # Parameters are passed as an object (dictionary)
         properties={
@@ -90,8 +113,30 @@ schema_get_files_info = types.FunctionDeclaration(
                 type=types.Type.STRING,  # This parameter should be a string
                 description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
             ),
+            "recursive": types.Schema(
+                type=types.Type.BOOLEAN,  # True or False
+                description="If true, also lists the contents of all subdirectories (paths are shown relative to the listed directory).",
+            ),
+            "max_depth": types.Schema(
+                type=types.Type.INTEGER,
+                description="With recursive, how many directory levels to list (1 = only the directory itself). Defaults to unlimited.",
+            ),
+            "include": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description='Only list files matching one of these wildcard patterns, e.g. ["*.py"].',
+            ),
+            "exclude": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description=f"Skip files and directories matching these wildcard patterns. {', '.join(LIST_DEFAULT_EXCLUDES)} are always skipped.",
+            ),
+            "max_entries": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Maximum number of entries to return. Defaults to (and is capped at) {LIST_MAX_ENTRIES}.",
+            ),
         },
-        # Note: "directory" is not in "required" list, so it's optional
-        # If the AI doesn't provide it, the function lists the working directory
+        # Note: nothing is in the "required" list, so every parameter is optional
+        # If the AI doesn't provide "directory", the function lists the working directory
     ),
 )
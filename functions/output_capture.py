@@ -0,0 +1,158 @@
+# Bounded output capture for run_python_file
+# A script that prints in a loop can produce hundreds of megabytes before the timeout fires.
+# Instead of buffering all of it (and then sending it to the AI), we read the output in chunks
+# and only keep the beginning and the end - the end is where the last lines and tracebacks are.
+# If a script keeps printing past OUTPUT_KILL_BYTES, it is stopped early.
+
+# Standard library for operating system operations (reading pipes and files)
+import os
+# Standard library for running the script and for its result/timeout types
+import subprocess
+# Reader threads, so stdout and stderr are drained at the same time (no pipe deadlocks)
+import threading
+# Clock for the timeout deadline
+import time
+# Fixed-size buffer for the tail of the output
+from collections import deque
+
+# Limits for how much output we keep and how much we allow
+from config import MAX_OUTPUT_BYTES, OUTPUT_KILL_BYTES
+
+
+# How many bytes to read from a pipe at a time
+CHUNK_SIZE = 65536
+
+
+class BoundedOutput:
+    """
+    Keeps the first and last limit/2 bytes of a stream, no matter how much is written.
+    Memory use stays at about `limit` bytes even for gigabytes of output.
+    """
+
+    def __init__(self, limit=MAX_OUTPUT_BYTES):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        # Chunks that make up (at least) the last tail_limit bytes
+        self.tail = deque()
+        self.tail_size = 0
+        self.total = 0
+
+    def write(self, data):
+        """Adds a chunk of bytes to the stream."""
+        self.total += len(data)
+
+        # Fill the head first
+        if len(self.head) < self.head_limit:
+            room = self.head_limit - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+
+        # Everything else goes into the tail; drop old chunks once we have enough
+        self.tail.append(bytes(data))
+        self.tail_size += len(data)
+        while self.tail and self.tail_size - len(self.tail[0]) >= self.tail_limit:
+            self.tail_size -= len(self.tail.popleft())
+
+    @property
+    def truncated(self):
+        return self.total > self.head_limit + self.tail_limit
+
+    def text(self):
+        """Returns the kept output as text, with a marker where the middle was cut out."""
+        tail = b"".join(self.tail)
+        if not self.truncated:
+            return (bytes(self.head) + tail).decode("utf-8", errors="replace")
+        tail = tail[-self.tail_limit:]
+        dropped = self.total - len(self.head) - len(tail)
+        return (
+            bytes(self.head).decode("utf-8", errors="replace")
+            + f"\n[... output truncated: {dropped} of {self.total} bytes omitted ...]\n"
+            + tail.decode("utf-8", errors="replace")
+        )
+
+
+def read_file_bounded(path, limit=MAX_OUTPUT_BYTES):
+    """
+    Reads the first and last limit/2 bytes of a file (used for output the warm worker pool
+    wrote to disk). Seeks over the middle instead of reading it.
+    """
+    output = BoundedOutput(limit)
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            output.write(f.read(output.head_limit))
+            if size > output.head_limit + output.tail_limit:
+                # Pretend we saw the skipped middle, so the truncation marker is right
+                output.total += size - output.head_limit - output.tail_limit
+                f.seek(size - output.tail_limit)
+            output.write(f.read())
+    except FileNotFoundError:
+        pass
+    return output
+
+
+def run_bounded(commands, cwd, timeout, limit=MAX_OUTPUT_BYTES, kill_bytes=OUTPUT_KILL_BYTES, env=None):
+    """
+    Runs a command like subprocess.run(capture_output=True, text=True, timeout=timeout),
+    but reads its output incrementally and keeps only the head and tail of each stream.
+    env, if given, replaces the environment of the command (like subprocess.run's env).
+
+    Returns:
+        A subprocess.CompletedProcess with text stdout/stderr (possibly with truncation markers)
+        and an extra output_limit_exceeded attribute, True if the process was killed for
+        printing more than kill_bytes
+
+    Raises:
+        subprocess.TimeoutExpired if the command ran longer than timeout seconds
+    """
+    process = subprocess.Popen(commands, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env)
+    outputs = [BoundedOutput(limit), BoundedOutput(limit)]
+    readers = [
+        threading.Thread(target=_drain, args=(pipe, output), daemon=True)
+        for pipe, output in zip((process.stdout, process.stderr), outputs)
+    ]
+    for reader in readers:
+        reader.start()
+
+    output_limit_exceeded = False
+    try:
+        # Check on the process regularly, so we can stop it as soon as it prints too much
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                process.wait(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if sum(output.total for output in outputs) > kill_bytes:
+                output_limit_exceeded = True
+                process.kill()
+                process.wait()
+                break
+            if time.monotonic() >= deadline:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(commands, timeout)
+    finally:
+        for reader in readers:
+            reader.join()
+        process.stdout.close()
+        process.stderr.close()
+
+    result = subprocess.CompletedProcess(
+        commands, process.returncode, stdout=outputs[0].text(), stderr=outputs[1].text()
+    )
+    result.output_limit_exceeded = output_limit_exceeded
+    return result
+
+
+def _drain(pipe, output):
+    """Reads a pipe until it closes, feeding each chunk into a BoundedOutput."""
+    while True:
+        chunk = pipe.read1(CHUNK_SIZE)
+        if not chunk:
+            break
+        output.write(chunk)
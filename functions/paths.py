@@ -0,0 +1,60 @@
+# Shared path check for every tool function
+# Each tool gets the per-run sandbox root as working_directory (injected by call_function)
+# and must never touch anything outside it. Keeping the check in one place means every
+# tool rejects the same paths.
+# Also the atomic write that every tool changing a file goes through.
+
+# Standard library for path handling
+import os
+# Standard library for random, unique names for the temporary file used for atomic writes
+import uuid
+
+
+def resolve_path(working_directory, relative_path=None):
+    """
+    Turns a path from the AI into an absolute path inside the working directory.
+
+    Args:
+        working_directory: The sandbox root for this run
+        relative_path: Path relative to the sandbox root (None or "" means the root itself)
+
+    Returns:
+        The absolute path, or None if it points outside the working directory
+
+    Notes:
+        - Compares whole path components, so a sibling like "calculator-2" doesn't
+          count as being inside "calculator" (a plain startswith() check would allow it)
+        - Symlinks are followed for the check, so a link pointing out of the sandbox is rejected
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    abs_path = os.path.abspath(os.path.join(abs_working_dir, relative_path or ""))
+
+    real_working_dir = os.path.realpath(abs_working_dir)
+    real_path = os.path.realpath(abs_path)
+    if os.path.commonpath([real_working_dir, real_path]) != real_working_dir:
+        return None
+    return abs_path
+
+
+def write_atomic(abs_file_path, content):
+    """
+    Writes content to a file so that readers see either the old or the new version, never a mix.
+    The content goes to a temporary file in the same directory, which is then renamed over the
+    original (a rename within one directory is atomic).
+    """
+    directory = os.path.dirname(abs_file_path)
+    # Keep the original file's permissions (None for a new file)
+    mode = os.stat(abs_file_path).st_mode & 0o7777 if os.path.exists(abs_file_path) else None
+    temp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}-{os.path.basename(abs_file_path)}")
+    # O_EXCL never opens an existing file, and 0o666 gives the temporary file the same
+    # permissions open() gives new files (the umask is applied by the OS)
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, abs_file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,195 @@
+# Pool of warm Python interpreters for run_python_file
+# Each worker (functions/python_worker.py) starts once, preloads common modules, and then
+# runs scripts in forked children - skipping interpreter startup on every call.
+# The pool is optional: run_python_file only uses it after enable_worker_pool() is called.
+
+# Standard library for operating system operations
+import os
+import sys
+import json
+import queue
+import tempfile
+import threading
+# Standard library for starting the worker processes and for its result/timeout types
+import subprocess
+
+# Pool settings
+from config import PYTHON_WORKER_POOL_SIZE, PYTHON_WORKER_MAX_RUNS, PYTHON_WORKER_PRELOAD, PYTHON_WORKER_REPLY_GRACE, OUTPUT_KILL_BYTES
+# Reads only the head and tail of the captured output files
+from functions.output_capture import read_file_bounded
+
+
+# Path to the worker program that each pool process runs
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+
+class PythonWorker:
+    """One warm interpreter process that runs scripts on request."""
+
+    def __init__(self, preload):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,  # Line buffered, since we talk one JSON line at a time
+        )
+        self.runs = 0
+        # Set when the worker was killed for not replying in time
+        self.timed_out = False
+        # Wait until the preloads are done, so the first job doesn't pay for them
+        if self.process.stdout.readline().strip() != "ready":
+            self.close()
+            raise RuntimeError("Python worker failed to start")
+
+    def run(self, file_path, args, cwd, timeout, stdout_path, stderr_path):
+        """
+        Sends one job and waits for the reply. Returns the reply dict, or None if the worker died.
+        If no reply arrives within PYTHON_WORKER_REPLY_GRACE seconds after the job's own timeout,
+        the worker is killed (the read then ends) and timed_out is set.
+        """
+        self.runs += 1
+        job = {
+            "file": file_path,
+            "args": list(args),
+            "cwd": cwd,
+            "timeout": timeout,
+            "stdout": stdout_path,
+            "stderr": stderr_path,
+            "kill_bytes": OUTPUT_KILL_BYTES,
+        }
+        # The worker enforces the job timeout itself; this only catches a worker that hangs
+        watchdog = threading.Timer(timeout + PYTHON_WORKER_REPLY_GRACE, self._kill_for_timeout)
+        watchdog.start()
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            reply = self.process.stdout.readline()
+        except (OSError, ValueError):
+            return None
+        finally:
+            watchdog.cancel()
+        return json.loads(reply) if reply else None
+
+    def _kill_for_timeout(self):
+        self.timed_out = True
+        self.close()
+
+    def close(self):
+        """Stops the worker process."""
+        try:
+            self.process.kill()
+            self.process.wait()
+        except OSError:
+            pass
+
+
+class PythonWorkerPool:
+    """
+    A fixed number of warm workers shared by all run_python_file calls.
+    A worker is replaced with a fresh one after max_runs jobs, or as soon as it crashes.
+    """
+
+    def __init__(self, size=PYTHON_WORKER_POOL_SIZE, max_runs=PYTHON_WORKER_MAX_RUNS, preload=PYTHON_WORKER_PRELOAD):
+        self.max_runs = max_runs
+        self.preload = list(preload)
+        # Idle workers wait here; a call takes one out and puts it back when done.
+        # A None slot means the worker there is gone and a new one is started on the next get,
+        # so a failed restart never shrinks the pool.
+        self.idle = queue.Queue()
+        for _ in range(size):
+            self.idle.put(PythonWorker(self.preload))
+
+    def run(self, commands, cwd, timeout):
+        """
+        Runs ["python", script, *args] in a warm worker.
+        Mirrors functions.output_capture.run_bounded: returns a CompletedProcess with the head
+        and tail of the output (and output_limit_exceeded set), or raises
+        subprocess.TimeoutExpired if the script ran longer than timeout seconds.
+        """
+        worker = self._take_worker()
+        try:
+            with tempfile.TemporaryDirectory(prefix="gagent-run-") as temp_dir:
+                stdout_path = os.path.join(temp_dir, "stdout")
+                stderr_path = os.path.join(temp_dir, "stderr")
+                reply = worker.run(commands[1], commands[2:], cwd, timeout, stdout_path, stderr_path)
+
+                if reply is None:
+                    # The worker itself died or hung - the finally below replaces it
+                    worker.close()
+                    if worker.timed_out:
+                        raise subprocess.TimeoutExpired(commands, timeout)
+                    raise RuntimeError("Python worker crashed while running the script")
+
+                if reply.get("timeout"):
+                    raise subprocess.TimeoutExpired(commands, timeout)
+
+                result = subprocess.CompletedProcess(
+                    commands,
+                    reply["returncode"],
+                    stdout=read_file_bounded(stdout_path).text(),
+                    stderr=read_file_bounded(stderr_path).text(),
+                )
+                result.output_limit_exceeded = reply.get("output_limit_exceeded", False)
+                return result
+        finally:
+            self._return_worker(worker)
+
+    def _take_worker(self):
+        """Takes an idle worker, starting a new one if its slot is empty."""
+        worker = self.idle.get()
+        if worker is not None:
+            return worker
+        try:
+            return PythonWorker(self.preload)
+        except Exception:
+            # Keep the slot so a later call can try again
+            self.idle.put(None)
+            raise
+
+    def _return_worker(self, worker):
+        """
+        Puts a worker back in the pool. Dead workers and workers that have run max_runs jobs
+        (so leaks can't build up) are replaced; the slot is always returned, even if the
+        replacement fails to start.
+        """
+        if worker.process.poll() is not None or worker.runs >= self.max_runs:
+            worker.close()
+            try:
+                worker = PythonWorker(self.preload)
+            except Exception:
+                # Leave the slot empty; the next call to take it starts the worker instead
+                worker = None
+        self.idle.put(worker)
+
+    def close(self):
+        """Stops all idle workers."""
+        while not self.idle.empty():
+            worker = self.idle.get()
+            if worker is not None:
+                worker.close()
+
+
+# The shared pool, created by enable_worker_pool()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def enable_worker_pool(size=None):
+    """
+    Starts the warm worker pool so run_python_file uses it from now on.
+    Does nothing on platforms without os.fork (like Windows), where scripts keep
+    running in a fresh interpreter.
+    """
+    global _pool
+    if not hasattr(os, "fork"):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = PythonWorkerPool(size=max(1, size or PYTHON_WORKER_POOL_SIZE))
+    return _pool
+
+
+def get_worker_pool():
+    """Returns the shared pool, or None if it hasn't been enabled."""
+    return _pool
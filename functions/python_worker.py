@@ -0,0 +1,128 @@
+# Warm Python worker (started and managed by functions/python_pool.py)
+#
+# Starting a fresh interpreter and importing modules like unittest takes longer than running
+# most small scripts. This worker pays that cost once: it imports the modules listed on its
+# command line, then waits for jobs on stdin. For every job it forks a child process, which
+# starts with all those imports already loaded but with its own copy of everything else,
+# so scripts can't see each other's module state, argv, or working directory.
+#
+# Protocol: one JSON object per line on stdin, one JSON reply per line on stdout.
+#   job:   {"file": ..., "args": [...], "cwd": ..., "timeout": 30, "stdout": path, "stderr": path,
+#           "kill_bytes": 4000000}
+#   reply: {"returncode": 0} or {"returncode": -9, "output_limit_exceeded": true} or {"timeout": true}
+
+import os
+import sys
+import json
+import time
+import signal
+import runpy
+import importlib
+import traceback
+
+
+def run_child(job):
+    """Runs one script in the forked child process. Never returns."""
+    exit_code = 0
+    try:
+        # Send the script's output to the files the pool gave us, at the file descriptor level,
+        # so output from C extensions and child processes is captured too
+        stdin_fd = os.open(os.devnull, os.O_RDONLY)
+        stdout_fd = os.open(job["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        stderr_fd = os.open(job["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+
+        # Make the script see the same environment as "python script.py args" from cwd
+        os.chdir(job["cwd"])
+        sys.argv = [job["file"]] + list(job["args"])
+        sys.path[0] = os.path.dirname(job["file"])
+
+        runpy.run_path(job["file"], run_name="__main__")
+    except SystemExit as e:
+        # Same exit code rules as the regular interpreter
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Hide the worker's own frames so the traceback looks like a plain "python script.py" run
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != job["file"]:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            # Skip interpreter cleanup - the parent's atexit handlers must not run here
+            os._exit(exit_code)
+
+
+def output_size(job):
+    """Returns how many bytes the child has written to its output files so far."""
+    total = 0
+    for path in (job["stdout"], job["stderr"]):
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def wait_for_child(pid, job):
+    """
+    Waits for the child to finish. Kills it after the job's timeout, or as soon as it has
+    written more than the job's kill_bytes of output. Returns the reply dict.
+    """
+    deadline = time.monotonic() + job["timeout"]
+    polls = 0
+    while True:
+        finished_pid, status = os.waitpid(pid, os.WNOHANG)
+        if finished_pid:
+            return {"returncode": os.waitstatus_to_exitcode(status)}
+        polls += 1
+        # Checking file sizes every 10th poll (about every 50 ms) is plenty
+        if polls % 10 == 0 and output_size(job) > job["kill_bytes"]:
+            os.kill(pid, signal.SIGKILL)
+            _, status = os.waitpid(pid, 0)
+            return {"returncode": os.waitstatus_to_exitcode(status), "output_limit_exceeded": True}
+        if time.monotonic() >= deadline:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            return {"timeout": True}
+        time.sleep(0.005)
+
+
+def main():
+    # Import the standard modules once, so every forked child gets them for free
+    for module_name in sys.argv[1:]:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            pass
+
+    # The real stdout is our reply channel - keep a private handle to it
+    replies = os.fdopen(os.dup(1), "w")
+    print("ready", file=replies, flush=True)
+
+    for line in sys.stdin:
+        job = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            run_child(job)
+        reply = wait_for_child(pid, job)
+        print(json.dumps(reply), file=replies, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 # Standard library for operating system operations
 import os
-# Standard library for running external programs (like Python scripts)
-import subprocess
 # Google AI types for function schemas
 from google.genai import types
+# Optional pool of warm interpreters (used instead of a fresh process when enabled)
+from functions.python_pool import get_worker_pool
+# Runs a process while keeping only the head and tail of its output
+from functions.output_capture import run_bounded
+# The output limit, so we can tell the AI why a script was stopped
+from config import OUTPUT_KILL_BYTES
+# Shared check that keeps paths inside the working directory
+from functions.paths import resolve_path
 
 
 def run_python_file(working_directory, file_path, args=None):
@@ -23,18 +29,19 @@ def run_python_file(working_directory, file_path, args=None):
         - Only executes files within the working directory
         - Only executes .py files (prevents running arbitrary executables)
         - 30-second timeout prevents infinite loops or long-running scripts
-        - Runs in a subprocess (isolated from our main program)
+        - Runs in a subprocess (isolated from our main program), or in a forked child
+          of a warm worker when the pool is enabled (see functions/python_pool.py)
     """
     
-    # Convert working directory to absolute path for security checks
+    # Convert working directory to absolute path (scripts run from there)
     abs_working_dir = os.path.abspath(working_directory)
     
-    # Build the full path to the Python file we want to execute
-    abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
+    # Build the full path to the Python file we want to execute (None if it's outside the working directory)
+    abs_file_path = resolve_path(working_directory, file_path)
     
     # SECURITY CHECK: Make sure the file is inside our allowed working directory
     # This prevents attacks like file_path="../../../usr/bin/rm" that try to run system commands
-    if not abs_file_path.startswith(abs_working_dir):
+    if abs_file_path is None:
         return f'Error: Cannot execute "{file_path}" as it is outside the permitted working directory'
     
     # Check if the file actually exists
@@ -55,14 +62,18 @@ def run_python_file(working_directory, file_path, args=None):
         if args:
             commands.extend(args)  # extend() adds all items from the args list
         
-        # Execute the command using subprocess.run()
-        result = subprocess.run(
-            commands,                    # The command to run
-            capture_output=True,         # Capture both stdout and stderr
-            text=True,                   # Return output as strings (not bytes)
-            timeout=30,                  # Kill the process after 30 seconds (prevents hangs)
-            cwd=abs_working_dir,        # Run the command from the working directory
-        )
+        # If the warm worker pool is enabled, run the script there (same timeout and result type)
+        pool = get_worker_pool()
+        if pool is not None:
+            result = pool.run(commands, cwd=abs_working_dir, timeout=30)
+        else:
+            # Execute the command, reading its output as it is produced
+            # Only the beginning and end of very long output is kept (see functions/output_capture.py)
+            result = run_bounded(
+                commands,                    # The command to run
+                cwd=abs_working_dir,         # Run the command from the working directory
+                timeout=30,                  # Kill the process after 30 seconds (prevents hangs)
+            )
         
         # Collect the output from the script
         output = []
@@ -81,6 +92,10 @@ def run_python_file(working_directory, file_path, args=None):
         if result.returncode != 0:
             output.append(f"Process exited with code {result.returncode}")
 
+        # If the script printed too much, it was stopped early - say so clearly
+        if result.output_limit_exceeded:
+            output.append(f"Process killed: output exceeded {OUTPUT_KILL_BYTES} bytes (output above is truncated)")
+
         # Join all the output parts together, or return a default message if no output
         return "\n".join(output) if output else "No output produced."
         
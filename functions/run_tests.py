@@ -0,0 +1,398 @@
+# Standard library for operating system operations (paths, environment)
+import os
+# Standard library for parsing Python files to find imports and tests
+import ast
+# Standard library for reading test runner output
+import re
+# Standard library for wildcard matching of test file names and ignore patterns
+import fnmatch
+# Standard library for the timeout exception raised by run_bounded
+import subprocess
+# Lock so two run_tests calls on the same sandbox don't mix up its state
+import threading
+# Lightweight record type for per-file results
+from collections import namedtuple
+# Runs several test files at once, each in its own process
+from concurrent.futures import ThreadPoolExecutor
+# Google AI types for function schemas
+from google.genai import types
+# Shared check that keeps paths inside the working directory
+from functions.paths import resolve_path
+# Walks the sandbox reusing cached directory listings
+from functions.dir_index import directory_index, is_excluded
+# Runs a process while keeping only the head and tail of its output
+from functions.output_capture import run_bounded
+# Limits for test runs, and the names that are never looked at
+from config import RUN_TESTS_SHARDS, RUN_TESTS_TIMEOUT
+
+
+# File names that may contain tests
+TEST_FILE_PATTERNS = ["test_*.py", "*_test.py", "tests.py"]
+
+# Longest failure message shown per test
+MAX_MESSAGE_CHARS = 200
+
+# Everything we know about one Python file (re-parsed only when it changes)
+ModuleInfo = namedtuple("ModuleInfo", ["fingerprint", "imports", "kind"])
+
+# Outcome of running one test file
+TestFileResult = namedtuple(
+    "TestFileResult", ["file_path", "passed", "failed", "errors", "skipped", "failures", "problem"]
+)
+
+
+class TestRunState:
+    """What run_tests remembers about one sandbox between calls."""
+
+    def __init__(self):
+        # absolute path -> ModuleInfo
+        self.modules = {}
+        # absolute test file path -> ({dependency path: fingerprint}, passed) from its last run
+        self.last_runs = {}
+        self.lock = threading.Lock()
+
+
+# absolute working directory -> TestRunState
+_states = {}
+_states_lock = threading.Lock()
+
+
+def run_tests(working_directory, tests=None, run_all=False):
+    """
+    Runs the sandbox's tests, but only the ones that could be affected by changes since
+    they last ran - like a build tool that only rebuilds what changed.
+
+    Args:
+        working_directory: The base directory we're allowed to work in (injected for security)
+        tests: Optional list of test files to consider (relative to working_directory);
+               by default every test file is considered
+        run_all: Run the selected test files even if nothing they depend on changed
+
+    Returns:
+        A compact summary: counts, one line per failing test, and which files were skipped,
+        or an error message
+
+    How "affected" is decided:
+        - Test files are files named like test_*.py, *_test.py or tests.py that contain
+          unittest.TestCase classes (run with unittest) or test_ functions (run with pytest)
+        - Each file's imports are read with ast and matched to files in the sandbox, giving
+          every test file the set of sandbox files it (indirectly) imports
+        - A test file runs again if any of those files changed, was added or was removed
+          since it last ran, or if it failed last time
+        - Only imports are tracked: a test that reads a data file won't notice it changing
+          (use run_all for that)
+    """
+
+    abs_working_dir = resolve_path(working_directory)
+    if abs_working_dir is None or not os.path.isdir(abs_working_dir):
+        return f'Error: "{working_directory}" is not a directory'
+
+    # Check the requested test files before doing anything else
+    requested = None
+    if tests:
+        requested = set()
+        for file_path in tests:
+            abs_file_path = resolve_path(working_directory, file_path)
+            if abs_file_path is None:
+                return f'Error: Cannot run "{file_path}" as it is outside the permitted working directory'
+            if not os.path.isfile(abs_file_path):
+                return f'Error: Test file "{file_path}" not found'
+            requested.add(abs_file_path)
+
+    with _states_lock:
+        state = _states.setdefault(abs_working_dir, TestRunState())
+
+    try:
+        with state.lock:
+            return _run_tests(state, abs_working_dir, requested, run_all)
+    except Exception as e:
+        return f"Error: running tests: {e}"
+
+
+def _run_tests(state, abs_working_dir, requested, run_all):
+    # Fingerprint and (re)parse every Python file in the sandbox
+    fingerprints = {}
+    for _, entry, _ in directory_index.walk(abs_working_dir, skip=lambda entry: is_excluded(entry.name)):
+        if entry.is_dir or not entry.name.endswith(".py"):
+            continue
+        stat = os.stat(entry.path)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        fingerprints[entry.path] = fingerprint
+        info = state.modules.get(entry.path)
+        if info is None or info.fingerprint != fingerprint:
+            state.modules[entry.path] = _parse_module(entry.path, fingerprint)
+    for path in list(state.modules):
+        if path not in fingerprints:
+            del state.modules[path]
+
+    test_files = sorted(
+        path for path, info in state.modules.items()
+        if info.kind and any(fnmatch.fnmatch(os.path.basename(path), pattern) for pattern in TEST_FILE_PATTERNS)
+        and (requested is None or path in requested)
+    )
+    if requested is not None and len(test_files) < len(requested):
+        not_tests = sorted(os.path.relpath(path, abs_working_dir) for path in requested - set(test_files))
+        return f"Error: No unittest or pytest tests found in: {', '.join(not_tests)}"
+    if not test_files:
+        return "No test files found (looked for test_*.py, *_test.py and tests.py with unittest or pytest tests)"
+
+    # Work out which test files have to run
+    dependencies = {path: _resolve_imports(abs_working_dir, path, info.imports) for path, info in state.modules.items()}
+    selected = []
+    closures = {}
+    for test_file in test_files:
+        closure = _closure(test_file, dependencies)
+        closures[test_file] = {path: fingerprints[path] for path in closure}
+        last_run = state.last_runs.get(test_file)
+        if run_all or last_run is None or not last_run[1] or last_run[0] != closures[test_file]:
+            selected.append(test_file)
+
+    # Run them, several at a time
+    with ThreadPoolExecutor(max_workers=max(1, RUN_TESTS_SHARDS)) as executor:
+        results = list(executor.map(
+            lambda test_file: _run_test_file(abs_working_dir, test_file, state.modules[test_file].kind),
+            selected,
+        ))
+
+    for result in results:
+        passed = result.problem is None and result.failed == 0 and result.errors == 0
+        state.last_runs[os.path.join(abs_working_dir, result.file_path)] = (
+            closures[os.path.join(abs_working_dir, result.file_path)], passed,
+        )
+
+    skipped_files = [os.path.relpath(path, abs_working_dir) for path in test_files if path not in selected]
+    return _summarize(results, skipped_files, len(test_files))
+
+
+def _parse_module(path, fingerprint):
+    """Reads a Python file's imports and whether (and how) it contains tests."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+    except (SyntaxError, ValueError, UnicodeDecodeError, OSError):
+        # A broken file can't be analyzed. If it is a test file, still run it (unittest reports
+        # the import error with its file and line) instead of quietly leaving it out
+        return ModuleInfo(fingerprint, [], "unittest")
+
+    # Each import is (module name, relative import level, imported names)
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend((alias.name, 0, []) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.module or "", node.level, [alias.name for alias in node.names]))
+
+    kind = None
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and any(
+            (isinstance(base, ast.Name) and base.id.endswith("TestCase"))
+            or (isinstance(base, ast.Attribute) and base.attr.endswith("TestCase"))
+            for base in node.bases
+        ):
+            kind = "unittest"
+            break
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            kind = "pytest"
+    return ModuleInfo(fingerprint, imports, kind)
+
+
+def _resolve_imports(abs_working_dir, importer, imports):
+    """Returns the sandbox files a module imports (imports of anything else are ignored)."""
+    found = set()
+    importer_dir = os.path.dirname(importer)
+    for module, level, names in imports:
+        if level:
+            # "from . import x" / "from ..pkg import y" - relative to the importing file's package
+            base = importer_dir
+            for _ in range(level - 1):
+                base = os.path.dirname(base)
+            bases = [base]
+        else:
+            # Scripts run with their own directory first on sys.path, and the sandbox root
+            # is on PYTHONPATH when tests run (see _run_test_file)
+            bases = [importer_dir, abs_working_dir]
+        parts = module.split(".") if module else []
+        for base in bases:
+            # "from pkg import calculator" may import the module pkg/calculator.py
+            submodules = [_module_file(base, parts + [name]) for name in names]
+            submodules = [path for path in submodules if path]
+            package = _module_file(base, parts) if parts else None
+            if submodules or package:
+                found.update(submodules)
+                if package:
+                    found.add(package)
+                break
+    return found
+
+
+def _module_file(base, parts):
+    """Returns the file for a dotted module name under base (module.py or package/__init__.py), or None."""
+    path = os.path.join(base, *parts)
+    if os.path.isfile(path + ".py"):
+        return path + ".py"
+    if os.path.isfile(os.path.join(path, "__init__.py")):
+        return os.path.join(path, "__init__.py")
+    return None
+
+
+def _closure(test_file, dependencies):
+    """Returns the test file plus every sandbox file it imports, directly or indirectly."""
+    seen = {test_file}
+    stack = [test_file]
+    while stack:
+        for dependency in dependencies.get(stack.pop(), ()):
+            if dependency not in seen:
+                seen.add(dependency)
+                stack.append(dependency)
+    return seen
+
+
+def _run_test_file(abs_working_dir, test_file, kind):
+    """Runs one test file in its own process and reads the counts and failures from its output."""
+    file_path = os.path.relpath(test_file, abs_working_dir)
+    directory = os.path.dirname(test_file)
+    module = os.path.splitext(os.path.basename(test_file))[0]
+    if kind == "unittest":
+        commands = ["python", "-m", "unittest", module]
+    else:
+        commands = ["python", "-m", "pytest", "-q", "-rfE", "--tb=line", "-p", "no:cacheprovider", os.path.basename(test_file)]
+
+    # Tests in subdirectories can still import modules from the sandbox root
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [abs_working_dir, env.get("PYTHONPATH")]))
+
+    try:
+        result = run_bounded(commands, cwd=directory, timeout=RUN_TESTS_TIMEOUT, env=env)
+    except subprocess.TimeoutExpired:
+        return TestFileResult(file_path, 0, 0, 0, 0, [], f"timed out after {RUN_TESTS_TIMEOUT} seconds")
+
+    output = result.stdout + "\n" + result.stderr
+    parsed = _parse_unittest_output(output) if kind == "unittest" else _parse_pytest_output(output)
+    if parsed is None:
+        # No summary at all - the runner itself failed (e.g. pytest isn't installed)
+        last_line = next((line for line in reversed(output.splitlines()) if line.strip()), "no output")
+        problem = f"exited with code {result.returncode}: {last_line.strip()}"
+        # Point at where it went wrong, e.g. the line of a syntax error
+        locations = TRACEBACK_LOCATION.findall(output)
+        if locations:
+            path, line = locations[-1]
+            problem += f" ({os.path.relpath(os.path.join(directory, path), abs_working_dir)}, line {line})"
+        return TestFileResult(file_path, 0, 0, 0, 0, [], problem)
+    return TestFileResult(file_path, *parsed, None)
+
+
+# A traceback frame: File "/path/to/tests.py", line 3
+TRACEBACK_LOCATION = re.compile(r'^\s*File "([^"]+)", line (\d+)', re.MULTILINE)
+
+# unittest output: "Ran 9 tests in 0.001s", then "OK", "OK (skipped=1)" or "FAILED (failures=1, errors=2)"
+UNITTEST_RAN = re.compile(r"^Ran (\d+) tests? in", re.MULTILINE)
+UNITTEST_STATUS = re.compile(r"^(?:OK|FAILED)(?: \((.*)\))?\s*$", re.MULTILINE)
+UNITTEST_FAILURE = re.compile(r"^(FAIL|ERROR): \S+ \((.+)\)")
+
+
+def _parse_unittest_output(output):
+    """Returns (passed, failed, errors, skipped, [(test, message)]) or None."""
+    ran = UNITTEST_RAN.search(output)
+    statuses = UNITTEST_STATUS.findall(output)
+    if not ran or not statuses:
+        return None
+    counts = dict(
+        (name.strip(), int(value))
+        for name, value in re.findall(r"([a-z ]+)=(\d+)", statuses[-1])
+    )
+    failed = counts.get("failures", 0) + counts.get("unexpected successes", 0)
+    errors = counts.get("errors", 0)
+    skipped = counts.get("skipped", 0)
+    passed = int(ran.group(1)) - failed - errors - skipped
+
+    # Each failure is a "FAIL: name (qualified.name)" header, a line of dashes, then the traceback;
+    # the last traceback line has the exception and its message
+    failures = []
+    lines = output.splitlines()
+    for index, line in enumerate(lines):
+        match = UNITTEST_FAILURE.match(line)
+        if not match:
+            continue
+        message = ""
+        for traceback_line in lines[index + 2:]:
+            if traceback_line.startswith(("=" * 10, "-" * 10)):
+                break
+            if traceback_line.strip():
+                message = traceback_line.strip()
+        failures.append((match.group(2), message))
+    return passed, failed, errors, skipped, failures
+
+
+# pytest -q output ends with e.g. "1 failed, 3 passed in 0.12s"; -rfE lists "FAILED file::test - message"
+PYTEST_COUNT = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed)")
+PYTEST_FAILURE = re.compile(r"^(?:FAILED|ERROR) (\S+)(?: - (.*))?$", re.MULTILINE)
+
+
+def _parse_pytest_output(output):
+    """Returns (passed, failed, errors, skipped, [(test, message)]) or None."""
+    summary = next((line for line in reversed(output.splitlines()) if PYTEST_COUNT.search(line)), None)
+    if summary is None:
+        return None
+    counts = {}
+    for value, name in PYTEST_COUNT.findall(summary):
+        counts[name.rstrip("s") if name.startswith("error") else name] = int(value)
+    failures = [(test, message or "") for test, message in PYTEST_FAILURE.findall(output)]
+    return (
+        counts.get("passed", 0) + counts.get("xfailed", 0),
+        counts.get("failed", 0) + counts.get("xpassed", 0),
+        counts.get("error", 0),
+        counts.get("skipped", 0),
+        failures,
+    )
+
+
+def _summarize(results, skipped_files, total_files):
+    """Builds the short report the AI sees."""
+    if not results:
+        return (
+            f"All {total_files} test files are up to date: nothing they import changed since they "
+            f"last passed. Use run_all to run them anyway."
+        )
+
+    passed = sum(result.passed for result in results)
+    failed = sum(result.failed for result in results)
+    errors = sum(result.errors for result in results)
+    skipped = sum(result.skipped for result in results)
+    lines = [
+        f"Ran {len(results)} of {total_files} test files: "
+        f"{passed} passed, {failed} failed, {errors} errors, {skipped} skipped"
+    ]
+    for result in results:
+        if result.problem:
+            lines.append(f"PROBLEM {result.file_path}: {result.problem}")
+        for test, message in result.failures:
+            if len(message) > MAX_MESSAGE_CHARS:
+                message = message[:MAX_MESSAGE_CHARS] + "..."
+            lines.append(f"FAILED {result.file_path}: {test}" + (f" - {message}" if message else ""))
+    if skipped_files:
+        lines.append(f"Not re-run (passed before, nothing they import changed): {', '.join(skipped_files)}")
+    return "\n".join(lines)
+
+
+# Schema that tells the AI how to use this function
+schema_run_tests = types.FunctionDeclaration(
+    name="run_tests",  # Function name the AI will use
+    description="Runs the unittest/pytest tests in the working directory and returns a short pass/fail summary. Only test files affected by changes since their last run (plus ones that failed) are run again. Prefer this over run_python_file for checking changes.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,  # Parameters passed as an object
+        properties={
+            "tests": types.Schema(
+                type=types.Type.ARRAY,  # tests is a list of file paths
+                items=types.Schema(
+                    type=types.Type.STRING,
+                    description="Path to a test file, relative to the working directory.",
+                ),
+                description="Optional test files to consider. Defaults to every test file.",
+            ),
+            "run_all": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Run the tests even if nothing they depend on changed. Defaults to false.",
+            ),
+        },
+    ),
+)
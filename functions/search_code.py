@@ -0,0 +1,132 @@
+# Standard library for operating system operations (path handling)
+import os
+# Standard library for regular expressions
+import re
+# Google AI types for function schemas
+from google.genai import types
+# The shared, lazily updated index of the sandbox's text files
+from functions.code_index import code_index
+# Result size limits
+from config import SEARCH_MAX_RESULTS, SEARCH_SNIPPET_CHARS
+# Shared check that keeps paths inside the working directory
+from functions.paths import resolve_path
+
+
+def search_code(working_directory, query, mode="literal", directory=None, max_results=None):
+    """
+    Searches the text files in the working directory, like 'grep -rn' (or a code editor's
+    "go to definition" in symbol mode), and returns compact "path:line: snippet" results.
+
+    Args:
+        working_directory: The base directory we're allowed to work in (injected for security)
+        query: What to look for
+        mode: "literal" (exact text), "regex" (Python regular expression), or
+              "symbol" (name of a Python function or class definition)
+        directory: Optional subdirectory to search in (relative to working_directory)
+        max_results: Maximum number of results (default and cap: SEARCH_MAX_RESULTS)
+
+    Returns:
+        One "path:line: snippet" line per match (paths relative to working_directory),
+        with a note if there were more matches than max_results, or an error message
+
+    Notes:
+        - Files are read once and kept in an index; later searches only re-read files
+          that changed (see functions/code_index.py)
+        - Literal searches use the index to skip files that can't contain the query
+    """
+
+    # Convert working directory to absolute path for security checks
+    abs_working_dir = os.path.abspath(working_directory)
+
+    # Work out which directory to search (None if it's outside the working directory)
+    abs_search_dir = resolve_path(working_directory, directory)
+
+    # SECURITY CHECK: Make sure the directory is inside our allowed working directory
+    if abs_search_dir is None:
+        return f'Error: Cannot search "{directory}" as it is outside the permitted working directory'
+
+    if not os.path.isdir(abs_search_dir):
+        return f'Error: "{directory}" is not a directory'
+
+    if not query:
+        return "Error: query must not be empty"
+
+    # The AI sends numbers as JSON, so they might arrive as floats like 20.0
+    max_results = min(int(max_results), SEARCH_MAX_RESULTS) if max_results else SEARCH_MAX_RESULTS
+
+    try:
+        # Bring the index up to date (only changed files are re-read)
+        paths = code_index.refresh(abs_search_dir)
+
+        if mode == "symbol":
+            in_scope = set(paths)
+            matches = (
+                (path, line_number)
+                for path, _, line_number in code_index.symbols_named(query)
+                if path in in_scope
+            )
+        elif mode == "regex":
+            try:
+                pattern = re.compile(query)
+            except re.error as e:
+                return f"Error: invalid regular expression: {e}"
+            matches = _scan(paths, pattern.search)
+        elif mode == "literal":
+            candidates = code_index.candidates_for_literal(paths, query)
+            matches = _scan(candidates, lambda line: query in line)
+        else:
+            return f'Error: Unknown mode "{mode}". Use "literal", "regex" or "symbol".'
+
+        results = []
+        for path, line_number in matches:
+            if len(results) >= max_results:
+                results.append(f"[... more matches, showing the first {max_results}]")
+                break
+            snippet = code_index.lines_of(path)[line_number - 1].strip()
+            if len(snippet) > SEARCH_SNIPPET_CHARS:
+                snippet = snippet[:SEARCH_SNIPPET_CHARS] + "..."
+            relative_path = os.path.relpath(path, abs_working_dir)
+            results.append(f"{relative_path}:{line_number}: {snippet}")
+
+        return "\n".join(results) if results else f'No matches for "{query}"'
+
+    except Exception as e:
+        return f"Error: searching code: {e}"
+
+
+def _scan(paths, is_match):
+    """Yields (path, line_number) for every indexed line that matches, file by file."""
+    for path in paths:
+        for line_number, line in enumerate(code_index.lines_of(path), start=1):
+            if is_match(line):
+                yield path, line_number
+
+
+# Schema that tells the AI how to use this function
+schema_search_code = types.FunctionDeclaration(
+    name="search_code",  # Function name the AI will use
+    description="Searches all text files in the working directory and returns matching lines as 'path:line: snippet'. Use it to find where something is defined or used instead of reading files one by one.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,  # Parameters passed as an object
+        properties={
+            "query": types.Schema(
+                type=types.Type.STRING,
+                description="The text, regular expression, or symbol name to search for.",
+            ),
+            "mode": types.Schema(
+                type=types.Type.STRING,
+                enum=["literal", "regex", "symbol"],
+                description='"literal" (default) finds exact text, "regex" uses a Python regular expression, "symbol" finds Python def/class definitions with exactly this name.',
+            ),
+            "directory": types.Schema(
+                type=types.Type.STRING,
+                description="Optional subdirectory to search in, relative to the working directory. Defaults to the whole working directory.",
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Maximum number of results. Defaults to (and is capped at) {SEARCH_MAX_RESULTS}.",
+            ),
+        },
+        required=["query"],
+    ),
+)
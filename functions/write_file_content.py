@@ -2,6 +2,8 @@
 import os
 # Google AI types for function schemas
 from google.genai import types
+# Shared check that keeps paths inside the working directory, and atomic file writes
+from functions.paths import resolve_path, write_atomic
 
 
 def write_file(working_directory, file_path, content):
@@ -22,17 +24,15 @@ def write_file(working_directory, file_path, content):
         - Creates parent directories automatically if needed
         - Overwrites existing files (be careful!)
         - Won't overwrite directories
+        - Writes are atomic (temporary file + rename)
     """
     
-    # Convert working directory to absolute path for security checks
-    abs_working_dir = os.path.abspath(working_directory)
-    
-    # Build the full path to the file we want to create/write
-    abs_file_path = os.path.abspath(os.path.join(working_directory, file_path))
+    # Build the full path to the file we want to create/write (None if it's outside the working directory)
+    abs_file_path = resolve_path(working_directory, file_path)
     
     # SECURITY CHECK: Make sure the file is inside our allowed working directory
     # This prevents attacks like file_path="../../../etc/passwd" that try to overwrite system files
-    if not abs_file_path.startswith(abs_working_dir):
+    if abs_file_path is None:
         return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
     
     # If the file doesn't exist, we might need to create parent directories first
@@ -53,13 +53,10 @@ def write_file(working_directory, file_path, content):
     
     # Try to write the file (wrapped in try/except for error handling)
     try:
-        # Open the file in write mode ("w")
-        # This will create the file if it doesn't exist, or overwrite it if it does
-        # The 'with' statement ensures the file is properly closed even if an error occurs
-        with open(abs_file_path, "w") as f:
-            # Write the content to the file
-            # Python will handle converting the string to bytes with UTF-8 encoding
-            f.write(content)
+        # Write to a temporary file and rename it over the target, instead of overwriting in place
+        # This never leaves a half-written file, and it gives the path a new inode - so in a
+        # hardlinked sandbox (see sandbox.py) the original file it was linked to stays untouched
+        write_atomic(abs_file_path, content)
         
         # Return a success message with some useful information
         return (
@@ -1,6 +1,7 @@
 # Standard Python libraries for system operations and command line arguments
 import sys  # Access to command line arguments (sys.argv) and exit functionality
 import os   # Operating system interface for environment variables and file paths
+import asyncio  # Event loop for the streaming version of the agent loop (--stream)
 
 # Google Gemini AI libraries
 from google import genai           # Main Gemini AI client for making API calls
@@ -11,7 +12,21 @@ from dotenv import load_dotenv
 
 # Our custom modules
 from prompts import system_prompt                           # The instructions we give to the AI
-from call_function import call_function, available_functions # Function calling system
+from call_function import call_functions, available_functions # Function calling system
+from call_function import AsyncCallDispatcher               # Starts calls while the AI is still streaming
+from config import MODEL_NAME, MAX_PROMPT_TOKENS, WORKING_DIR # Model name, history size limit, sandbox
+from compaction import compact_messages                     # Shrinks old tool results in the history
+from tool_cache import tool_cache                           # Cache of repeated file reads (for stats)
+from functions.python_pool import enable_worker_pool        # Warm interpreters for run_python_file
+from tracing import tracer                                  # Timing/token trace for --trace
+from backends import ReplayClient, RecordingClient          # Offline model backends (--replay/--record)
+from backends import RateLimitedClient                      # Paces the shared client in --batch mode
+from batch import run_batch                                 # Many conversations from a JSONL file (--batch)
+from sandbox import Sandbox                                 # Private workspace per run (--isolated)
+from response_cache import CachingClient                    # On-disk cache of model responses (--response-cache)
+from config import RESPONSE_CACHE_DIR                       # Default directory for --response-cache
+from prefetch import prefetcher                             # Background reads after listings (--prefetch)
+from config import BATCH_WORKERS, BATCH_REQUESTS_PER_MINUTE, BATCH_MAX_RETRIES, BATCH_RETRY_DELAY # Batch concurrency, rate limit, retries
 
 
 def main():
@@ -30,6 +45,45 @@ def main():
     # Check if user wants detailed output by looking for --verbose flag
     # "in" operator checks if "--verbose" exists anywhere in the command line arguments
     verbose = "--verbose" in sys.argv
+
+    # Check if user wants the AI's answer streamed to the terminal as it is generated
+    stream = "--stream" in sys.argv
+
+    # Token budget for the conversation history (--token-budget=N overrides the config value)
+    token_budget = get_int_flag("--token-budget", MAX_PROMPT_TOKENS)
+
+    # Check if user wants a timing trace written to a file (.json = Chrome trace format, else JSON lines)
+    trace_path = get_flag_value("--trace")
+    if trace_path:
+        tracer.enable()
+
+    # Check if user wants scripts to run in pre-started (warm) Python workers
+    if "--warm-pool" in sys.argv:
+        enable_worker_pool()
+
+    # Check if user wants listed files read into the cache before the AI asks for them
+    if "--prefetch" in sys.argv:
+        prefetcher.enable()
+
+    # Check if user wants to replay a recorded run (no network) or record this one
+    replay_path = get_flag_value("--replay")
+    record_path = get_flag_value("--record")
+
+    # Check if user wants repeated conversations answered from the on-disk response cache
+    # (--response-cache uses RESPONSE_CACHE_DIR, --response-cache=DIR picks the directory)
+    response_cache_dir = get_flag_value("--response-cache")
+    if "--response-cache" in sys.argv:
+        response_cache_dir = RESPONSE_CACHE_DIR
+
+    # Check if user wants to run a whole file of prompts instead of a single one
+    batch_path = get_flag_value("--batch")
+    workers = get_int_flag("--workers", BATCH_WORKERS)
+
+    # Check if user wants this run to work on its own copy of the working directory
+    # (so runs at the same time don't overwrite each other's files), and whether to
+    # copy its changes back at the end
+    isolated = "--isolated" in sys.argv
+    commit = "--commit" in sys.argv
     
     # Extract actual command arguments, filtering out any flags that start with "--"
     # sys.argv[1:] gets all arguments except the script name (which is sys.argv[0])
@@ -37,19 +91,47 @@ def main():
     args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
 
     # If no arguments provided, show usage instructions and exit
-    if not args:
-        print("AI Code Assistant")
-        print('\nUsage: python main.py "your prompt here" [--verbose]')
-        print('Example: python main.py "How do I fix the calculator?"')
+    if not args and not batch_path:
+        print_usage()
         sys.exit(1)  # Exit with error code 1 (indicates failure)
 
-    # Get the Gemini API key from environment variables
-    # os.environ.get() safely gets an environment variable, returns None if not found
-    api_key = os.environ.get("GEMINI_API_KEY")
-    
-    # Create a Gemini AI client instance using our API key
-    # This client will be used to send requests to Google's AI service
-    client = genai.Client(api_key=api_key)
+    # Recordings and replays are one conversation in order; batch tasks would share (and
+    # interleave) a single recording from several threads at once
+    if batch_path and (record_path or replay_path):
+        print("Error: --record and --replay can't be used with --batch\n")
+        print_usage()
+        sys.exit(1)
+
+    caching_client = None
+    if replay_path:
+        # Serve the AI's responses from a recorded fixture instead of calling the API
+        client = ReplayClient(replay_path)
+    else:
+        # Get the Gemini API key from environment variables
+        # os.environ.get() safely gets an environment variable, returns None if not found
+        api_key = os.environ.get("GEMINI_API_KEY")
+        
+        # Create a Gemini AI client instance using our API key
+        # This client will be used to send requests to Google's AI service
+        client = genai.Client(api_key=api_key)
+        
+        # In batch mode one client is shared by all tasks, with calls paced to stay under the rate limit
+        if batch_path:
+            client = RateLimitedClient(client, BATCH_REQUESTS_PER_MINUTE, BATCH_MAX_RETRIES, BATCH_RETRY_DELAY)
+        
+        # Answer conversations we've seen before from disk (cache hits skip the rate limit too)
+        if response_cache_dir:
+            client = caching_client = CachingClient(client, response_cache_dir)
+        
+        # Save every response so the run can be replayed later with --replay
+        if record_path:
+            client = RecordingClient(client, record_path)
+
+    if batch_path:
+        output_path = get_flag_value("--output", os.path.splitext(batch_path)[0] + ".results.jsonl")
+        failed = run_batch(client, generate_content, batch_path, output_path, workers, token_budget)
+        print(f"Results written to {output_path}" + (f" ({failed} failed)" if failed else ""))
+        sys.exit(1 if failed else 0)
 
     # Join all command line arguments into a single string
     # For example: ["fix", "the", "calculator"] becomes "fix the calculator"
@@ -69,11 +151,111 @@ def main():
         ),
     ]
 
-    # Start the main AI conversation loop
-    generate_content(client, messages, verbose)
+    if isolated:
+        # Run in a private snapshot of the working directory, then show or commit its changes
+        with Sandbox(WORKING_DIR) as sandbox:
+            if verbose:
+                print(f"Sandbox: {sandbox.path} ({sandbox.strategy})")
+            run_agent(client, messages, verbose, token_budget, stream, sandbox.path)
+            finish_sandbox(sandbox, commit)
+    else:
+        run_agent(client, messages, verbose, token_budget, stream, WORKING_DIR)
+
+    if isinstance(client, RecordingClient):
+        client.save()
+        print(f"\nRecorded {len(client.responses)} responses to {record_path}")
+
+    # Show how many model calls were answered from the response cache
+    if caching_client and verbose:
+        print(caching_client.stats())
+
+    # Save the trace and show where the time went
+    if trace_path:
+        tracer.write(trace_path)
+        print(f"\nTrace written to {trace_path}")
+        print(tracer.summary())
+
+
+def run_agent(client, messages, verbose, token_budget, stream, working_directory):
+    """Starts the main AI conversation loop (--stream uses the asyncio version, which prints text as soon as it arrives)."""
+    with tracer.span("run", "agent"):
+        if stream:
+            asyncio.run(generate_content_async(client, messages, verbose, token_budget, working_directory))
+        else:
+            generate_content(client, messages, verbose, token_budget, working_directory)
+
+
+def finish_sandbox(sandbox, commit):
+    """Copies an isolated run's changes back to WORKING_DIR (--commit), or shows them as a diff."""
+    if not commit:
+        diff = sandbox.diff()
+        print("\nChanges (not applied, run with --commit to keep them):" if diff else "\nNo changes.")
+        print(diff, end="")
+        return
+    committed, conflicts = sandbox.commit()
+    print(f"\nCommitted {len(committed)} changed file(s) to {WORKING_DIR}")
+    for relative_path in conflicts:
+        print(f"Not committed, changed in {WORKING_DIR} during the run: {relative_path}")
+
+
+def print_usage():
+    """Shows how to run the program."""
+    print("AI Code Assistant")
+    print('\nUsage: python main.py "your prompt here" [--verbose] [--stream] [--token-budget=N] [--warm-pool] [--prefetch] [--trace=FILE] [--replay=FILE] [--record=FILE] [--response-cache[=DIR]] [--isolated [--commit]]')
+    print('       python main.py --batch=tasks.jsonl [--output=results.jsonl] [--workers=N]')
+    print('Example: python main.py "How do I fix the calculator?"')
 
 
-def generate_content(client, messages, verbose):
+def get_int_flag(name, default):
+    """
+    Looks up a "--name=N" flag that must be a whole number.
+    Shows the usage and exits (like running without a prompt) if the value isn't one.
+    """
+    value = get_flag_value(name, default)
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Error: {name} must be a whole number, got {value!r}\n")
+        print_usage()
+        sys.exit(1)
+
+
+def get_flag_value(name, default=None):
+    """
+    Looks up the value of a "--name=value" command line flag.
+    
+    Args:
+        name: The flag name including the dashes, e.g. "--token-budget"
+        default: What to return if the flag wasn't given
+    """
+    for arg in sys.argv[1:]:
+        if arg.startswith(name + "="):
+            return arg[len(name) + 1:]
+    return default
+
+
+def compact_history(messages, token_budget, verbose):
+    """Shrinks the conversation history before a model call and reports the savings in verbose mode."""
+    with tracer.span("compaction", "agent") as span_args:
+        tokens_saved = compact_messages(messages, token_budget)
+        span_args["tokens_saved"] = tokens_saved
+    if verbose and tokens_saved:
+        print(f"Compacted history: saved ~{tokens_saved} tokens")
+
+
+def record_usage(stats, iteration, usage_metadata):
+    """Adds one model call's token counts to the stats dictionary (if the caller passed one)."""
+    if stats is None:
+        return
+    stats["iterations"] = iteration + 1
+    stats.setdefault("prompt_tokens", 0)
+    stats.setdefault("response_tokens", 0)
+    if usage_metadata:
+        stats["prompt_tokens"] += usage_metadata.prompt_token_count or 0
+        stats["response_tokens"] += usage_metadata.candidates_token_count or 0
+
+
+def generate_content(client, messages, verbose, token_budget=MAX_PROMPT_TOKENS, working_directory=WORKING_DIR, stats=None):
     """
     The main AI agent loop. This function implements the core logic:
     1. Send the conversation to the AI
@@ -83,9 +265,12 @@ def generate_content(client, messages, verbose):
     5. Repeat until AI is done or we hit iteration limit
     
     Args:
-        client: The Gemini AI client for making API calls
+        client: The Gemini AI client for making API calls (or a stand-in from backends.py)
         messages: List of conversation messages (user, assistant, tool responses)
         verbose: Boolean flag for detailed output
+        token_budget: Approximate token limit for the history sent on each iteration
+        working_directory: The sandbox the AI's function calls run in
+        stats: Optional dictionary that gets the iteration count and token totals (used by --batch)
     """
     
     # Safety limit to prevent infinite loops
@@ -95,15 +280,26 @@ def generate_content(client, messages, verbose):
     # The main agent loop - this is where the "autonomous" behavior happens
     for iteration in range(max_iterations):
         
+        # Remember when this iteration started (for --trace)
+        iteration_started = tracer.now()
+        
+        # Replace stale tool results with short notes so the prompt stays within budget
+        compact_history(messages, token_budget, verbose)
+        
         # Send the current conversation to the AI and get a response
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-001",  # Specific Gemini model version
-            contents=messages,              # The conversation history so far
-            config=types.GenerateContentConfig(
-                tools=[available_functions],    # Tell AI what functions it can call
-                system_instruction=system_prompt # Give AI its instructions/role
-            ),
-        )
+        with tracer.span("model_call", "model", iteration=iteration) as span_args:
+            response = client.models.generate_content(
+                model=MODEL_NAME,              # Specific Gemini model version
+                contents=messages,              # The conversation history so far
+                config=types.GenerateContentConfig(
+                    tools=[available_functions],    # Tell AI what functions it can call
+                    system_instruction=system_prompt # Give AI its instructions/role
+                ),
+            )
+            if response.usage_metadata:
+                span_args["tokens_in"] = response.usage_metadata.prompt_token_count
+                span_args["tokens_out"] = response.usage_metadata.candidates_token_count
+        record_usage(stats, iteration, response.usage_metadata)
         
         # If verbose mode, show token usage (helpful for monitoring API costs)
         if verbose:
@@ -116,6 +312,7 @@ def generate_content(client, messages, verbose):
             # No function calls means the AI is finished
             print("Final response:")
             print(response.text)  # Print the AI's final answer
+            tracer.record("iteration", "agent", iteration_started, iteration=iteration)
             return response.text
         
         # Add the AI's response (containing function calls) to our conversation history
@@ -125,14 +322,15 @@ def generate_content(client, messages, verbose):
             messages.append(response.candidates[0].content)
         
         # The AI wants to call one or more functions - let's execute them
+        # Independent calls run concurrently, but results come back in the order the AI asked for them
+        with tracer.span("tools", "dispatch", iteration=iteration, calls=len(response.function_calls)):
+            function_call_results = call_functions(response.function_calls, verbose, working_directory=working_directory)
+
         # We collect all the results before adding them to the conversation
         function_response_parts = []
         
-        # Loop through each function the AI wants to call
-        for function_call_part in response.function_calls:
-            # Actually execute the function call using our call_function system
-            function_call_result = call_function(function_call_part, verbose)
-            
+        # Loop through each function result, in the original order
+        for function_call_result in function_call_results:
             # Safety check: make sure we got a valid result back
             if (
                 not function_call_result.parts
@@ -147,6 +345,10 @@ def generate_content(client, messages, verbose):
             # Collect this function's result to add to conversation later
             function_response_parts.append(function_call_result.parts[0])
         
+        # If verbose mode, show how many reads were answered from the cache
+        if verbose:
+            print(tool_cache.stats())
+        
         # Add all function results as a single "tool" message in the conversation
         # This is important: the AI needs to see the results to decide what to do next
         if function_response_parts:
@@ -156,6 +358,8 @@ def generate_content(client, messages, verbose):
             )
             messages.append(tool_response)
         
+        tracer.record("iteration", "agent", iteration_started, iteration=iteration)
+        
         # Continue the loop - the AI will see the function results and decide what to do next
         # This might be: call more functions, analyze results, or give a final answer
     
@@ -166,5 +370,143 @@ def generate_content(client, messages, verbose):
     return response.text
 
 
+async def generate_content_async(client, messages, verbose, token_budget=MAX_PROMPT_TOKENS, working_directory=WORKING_DIR, stats=None):
+    """
+    Streaming version of the agent loop (used with --stream).
+    It follows the same steps as generate_content, but:
+    1. Uses the async client and streams the AI's response chunk by chunk
+    2. Prints text to the terminal as soon as it arrives
+    3. Starts each function call as soon as it has been received, while the
+       rest of the response is still streaming in
+    
+    Args:
+        client: The Gemini AI client for making API calls
+        messages: List of conversation messages (user, assistant, tool responses)
+        verbose: Boolean flag for detailed output
+        token_budget: Approximate token limit for the history sent on each iteration
+        working_directory: The sandbox the AI's function calls run in
+        stats: Optional dictionary that gets the iteration count and token totals
+    
+    Returns:
+        The text of the AI's last response
+    """
+    
+    # Same safety limit as the regular loop
+    max_iterations = 20
+    
+    for iteration in range(max_iterations):
+        
+        iteration_started = tracer.now()
+        
+        # Same history compaction as the regular loop
+        compact_history(messages, token_budget, verbose)
+        
+        # Ask for the response as a stream of chunks instead of one big reply
+        model_started = tracer.now()
+        first_chunk_ms = None
+        stream = await client.aio.models.generate_content_stream(
+            model=MODEL_NAME,
+            contents=messages,
+            config=types.GenerateContentConfig(
+                tools=[available_functions],
+                system_instruction=system_prompt
+            ),
+        )
+        
+        # Starts function calls in the background as they show up in the stream
+        dispatcher = AsyncCallDispatcher(verbose, working_directory=working_directory)
+        
+        # Everything the AI said this turn, rebuilt from the chunks for the conversation history
+        response_parts = []
+        text = ""
+        usage_metadata = None
+        
+        # If the stream or a call fails partway through, don't leave started calls running on their own
+        try:
+            async for chunk in stream:
+                # Time to first output is what the user notices most
+                if first_chunk_ms is None:
+                    first_chunk_ms = (tracer.now() - model_started) * 1000
+                
+                # Token counts are reported on the chunks (the last one has the totals)
+                if chunk.usage_metadata:
+                    usage_metadata = chunk.usage_metadata
+                
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+                
+                for part in chunk.candidates[0].content.parts or []:
+                    if part.function_call:
+                        # Function calls arrive complete, so we can start them right away
+                        dispatcher.submit(part.function_call)
+                        response_parts.append(part)
+                    elif part.text:
+                        # Show text immediately instead of waiting for the whole turn
+                        print(part.text, end="", flush=True)
+                        text += part.text
+                        # Merge consecutive text chunks so the history doesn't fill up with fragments
+                        if response_parts and response_parts[-1].text is not None:
+                            response_parts[-1] = types.Part(text=response_parts[-1].text + part.text)
+                        else:
+                            response_parts.append(types.Part(text=part.text))
+            
+            # End the streamed line of text
+            if text:
+                print()
+            
+            tracer.record(
+                "model_call", "model", model_started,
+                iteration=iteration,
+                first_chunk_ms=first_chunk_ms,
+                tokens_in=usage_metadata.prompt_token_count if usage_metadata else None,
+                tokens_out=usage_metadata.candidates_token_count if usage_metadata else None,
+            )
+            
+            record_usage(stats, iteration, usage_metadata)
+            
+            if verbose and usage_metadata:
+                print("Prompt tokens:", usage_metadata.prompt_token_count)
+                print("Response tokens:", usage_metadata.candidates_token_count)
+            
+            # No function calls means the AI is finished (its answer was already printed)
+            if not dispatcher.started:
+                tracer.record("iteration", "agent", iteration_started, iteration=iteration)
+                return text
+            
+            # Add the AI's response (containing function calls) to our conversation history
+            messages.append(types.Content(role="model", parts=response_parts))
+            
+            # Wait for the function calls that were started during the stream
+            with tracer.span("tools", "dispatch", iteration=iteration, calls=len(dispatcher.started)):
+                function_call_results = await dispatcher.results()
+        finally:
+            await dispatcher.cancel()
+        
+        function_response_parts = []
+        for function_call_result in function_call_results:
+            if (
+                not function_call_result.parts
+                or not function_call_result.parts[0].function_response
+            ):
+                raise Exception("empty function call result")
+            
+            if verbose:
+                print(f"-> {function_call_result.parts[0].function_response.response}")
+            
+            function_response_parts.append(function_call_result.parts[0])
+        
+        if verbose:
+            print(tool_cache.stats())
+        
+        # Add all function results as a single "tool" message, just like the regular loop
+        messages.append(types.Content(role="tool", parts=function_response_parts))
+        
+        tracer.record("iteration", "agent", iteration_started, iteration=iteration)
+    
+    print("Max iterations reached. Final response:")
+    print(text)
+    return text
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
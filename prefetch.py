@@ -0,0 +1,110 @@
+# Speculative prefetch after directory listings (--prefetch)
+# After get_files_info, the AI's next turn almost always reads main.py or some of the files
+# it just saw. So while the AI is thinking, we read those files into the tool result cache,
+# under the same key call_function will look up - the follow-up read is then a cache hit.
+# The smallest files are also attached to the listing result itself, so the AI may not
+# need to ask for them at all.
+
+# Standard library for path handling
+import os
+# Standard library for pulling the file entries back out of a listing
+import re
+# A background thread for the reads
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from tool_cache import tool_cache, file_fingerprint
+from functions.get_file_content import get_file_content
+from config import PREFETCH_MAX_BYTES, PREFETCH_MAX_FILE_BYTES, PREFETCH_INLINE_BYTES
+
+
+# One file line of a get_files_info listing: "- pkg/calculator.py: file_size=1234 bytes, is_dir=False"
+LISTING_FILE_LINE = re.compile(r"^- (.+): file_size=(\d+) bytes, is_dir=False$", re.MULTILINE)
+
+
+class Prefetcher:
+    """
+    Reads files from the latest listing into tool_cache in the background.
+    Does nothing until enable() is called.
+    """
+
+    def __init__(self, max_bytes=PREFETCH_MAX_BYTES, max_file_bytes=PREFETCH_MAX_FILE_BYTES,
+                 inline_bytes=PREFETCH_INLINE_BYTES):
+        self.enabled = False
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.inline_bytes = inline_bytes
+        self.executor = None
+        self.prefetched = 0
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        # One thread is enough: the reads are small, and the AI's next turn takes much longer
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    def after_listing(self, args, listing):
+        """
+        Called by call_function with a get_files_info call's arguments (including the injected
+        working_directory) and its result. Starts prefetching the listed files and returns the
+        listing, with the contents of the smallest files attached.
+        """
+        if not self.enabled or listing.startswith("Error"):
+            return listing
+
+        working_directory = args["working_directory"]
+        directory = args.get("directory") or ""
+        candidates = [
+            (os.path.normpath(os.path.join(directory, relative_path)), int(size))
+            for relative_path, size in LISTING_FILE_LINE.findall(listing)
+            if int(size) <= self.max_file_bytes
+        ]
+        # main.py first, then Python files, then everything else - smallest first within each group
+        candidates.sort(key=lambda item: (
+            os.path.basename(item[0]) != "main.py", not item[0].endswith(".py"), item[1], item[0],
+        ))
+
+        inlined = []
+        inline_budget = self.inline_bytes
+        background = []
+        budget = self.max_bytes
+        for file_path, size in candidates:
+            if size <= inline_budget:
+                content = self.read(working_directory, file_path)
+                if not content.startswith("Error"):
+                    inlined.append(f'--- {file_path} ---\n{content}')
+                    inline_budget -= size
+                    continue
+            if size <= budget:
+                background.append(file_path)
+                budget -= size
+
+        for file_path in background:
+            self.executor.submit(self.read, working_directory, file_path)
+
+        if not inlined:
+            return listing
+        return listing + "\n\nContents of small files:\n" + "\n".join(inlined)
+
+    def read(self, working_directory, file_path):
+        """
+        Reads a file the same way a get_file_content call without offset/length would,
+        going through tool_cache so the result is shared with real calls.
+        """
+        args = {"file_path": file_path, "working_directory": working_directory}
+        key = tool_cache.make_key("get_file_content", args)
+        # Look without counting a hit - only the AI's own reads should count
+        cached = tool_cache.peek(key)
+        if cached is not None:
+            return cached
+        result = get_file_content(**args)
+        # If the file changed while we read it, our key is out of date - don't store the result
+        if file_fingerprint(key[1]) == key[3]:
+            tool_cache.put(key, result)
+            with self.lock:
+                self.prefetched += 1
+        return result
+
+
+# The one shared prefetcher
+prefetcher = Prefetcher()
@@ -11,6 +11,12 @@ When a user asks a question or makes a request, make a function call plan. You c
 - Read file contents
 - Execute Python files with optional arguments
 - Write or overwrite files
+- Edit parts of existing files with search/replace edits or a unified diff
+- Search all files for text, a regular expression, or a Python function/class definition
+- Run the tests (only the ones affected by your changes are re-run) and get a short pass/fail summary
+
+To change an existing file, prefer editing it over rewriting it: only send the lines that change.
+To check your changes, prefer run_tests over running the test files with run_python_file.
 
 All paths you provide should be relative to the working directory. You do not need to specify the working directory in your function calls as it is automatically injected for security reasons.
 """
@@ -0,0 +1,188 @@
+# Model response cache (--response-cache)
+# Rerunning the same prompt against an unchanged sandbox sends the model exactly the same
+# conversation, turn after turn - so the responses can come from disk instead of the API.
+# CachingClient wraps a client (like the ones in backends.py) and stores each response in a
+# file named after a hash of everything that went into the request. A different prompt,
+# model, system prompt, tool list or tool result (e.g. because a file changed) gives a
+# different hash, so a stale response is never served.
+
+# Standard libraries
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+# Standard library for building simple attribute containers (client.models, client.aio.models)
+from types import SimpleNamespace
+
+# Google Gemini types, for turning cached JSON back into real response objects
+from google.genai import types
+
+# Streamed responses are cached as one merged response
+from backends import merge_chunks
+from config import RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_BYTES
+
+
+def request_key(model, contents, config):
+    """
+    Returns a stable hash of a model request: the model name, the config (system prompt
+    and tool schemas) and the whole conversation, serialized the same way every time.
+    """
+    request = {
+        "model": model,
+        "config": config.model_dump(mode="json", exclude_none=True) if config is not None else None,
+        "contents": [content.model_dump(mode="json", exclude_none=True) for content in contents],
+    }
+    text = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Directory of cached responses, one JSON file per request hash.
+    The file's modification time is its last use: hits refresh it, the TTL is measured from it,
+    and eviction removes the files that haven't been used for the longest time.
+    """
+
+    def __init__(self, directory, ttl=RESPONSE_CACHE_TTL, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """Returns the cached response for a key, or None (and counts the hit or miss)."""
+        path = self._path(key)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+            if age > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path) as f:
+                response = types.GenerateContentResponse.model_validate(json.load(f))
+            # Mark it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, expired, or a broken file (e.g. from an interrupted write) - all misses
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return response
+
+    def put(self, key, response):
+        """Stores a response, then deletes old entries if the cache got too big."""
+        data = json.dumps(response.model_dump(mode="json", exclude_none=True))
+        # Write to a temporary file and rename it, so a parallel reader never sees half a file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        with self.lock:
+            entries = []
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+    def stats(self):
+        with self.lock:
+            return f"Response cache: {self.hits} hits, {self.misses} misses"
+
+
+class CachingClient:
+    """
+    Wraps a client and answers repeated requests from a ResponseCache.
+    Provides the same calls as the clients in backends.py; a cached streamed turn is
+    replayed as a single chunk.
+    """
+
+    def __init__(self, client, directory):
+        self.client = client
+        self.cache = ResponseCache(directory)
+        self.models = SimpleNamespace(
+            generate_content=self._generate_content,
+            generate_content_stream=self._generate_content_stream,
+        )
+        self.aio = SimpleNamespace(models=SimpleNamespace(
+            generate_content=self._generate_content_async,
+            generate_content_stream=self._generate_content_stream_async,
+        ))
+
+    def stats(self):
+        return self.cache.stats()
+
+    def _generate_content(self, *, model, contents, config=None):
+        key = request_key(model, contents, config)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.client.models.generate_content(model=model, contents=contents, config=config)
+            self.cache.put(key, response)
+        return response
+
+    def _generate_content_stream(self, *, model, contents, config=None):
+        key = request_key(model, contents, config)
+        response = self.cache.get(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.client.models.generate_content_stream(model=model, contents=contents, config=config):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, merge_chunks(chunks))
+
+    async def _generate_content_async(self, *, model, contents, config=None):
+        key = request_key(model, contents, config)
+        response = self.cache.get(key)
+        if response is None:
+            response = await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+            self.cache.put(key, response)
+        return response
+
+    async def _generate_content_stream_async(self, *, model, contents, config=None):
+        # Hash the conversation now - the caller may change the list while we stream
+        key = request_key(model, contents, config)
+        response = self.cache.get(key)
+
+        if response is not None:
+            async def cached():
+                yield response
+            return cached()
+
+        stream = await self.client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+
+        async def chunks():
+            received = []
+            async for chunk in stream:
+                received.append(chunk)
+                yield chunk
+            self.cache.put(key, merge_chunks(received))
+
+        return chunks()
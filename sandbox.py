@@ -0,0 +1,232 @@
+# Per-run sandboxes (--isolated, and every task in --batch)
+# All runs used to share the one WORKING_DIR, so two runs at the same time overwrote each
+# other's files. A Sandbox gives each run its own workspace - a snapshot of WORKING_DIR -
+# and can show the run's changes as a diff and copy them back when the run is done.
+#
+# Making the snapshot cheap: instead of copying every byte, files are cloned with
+# copy-on-write where the file system supports it:
+# - "reflink": the clone shares the original's data blocks until one side writes (Btrfs, XFS, APFS...)
+# - "hardlink": the clone IS the original file (same inode); only safe because the tools replace
+#   files with a rename instead of writing into them - but a script that opens a file and writes
+#   into it would change the original too, so this is never picked automatically
+# - "copy": a plain copy, which always works
+# "auto" tries reflink and falls back to copy.
+
+# Standard libraries
+import os
+import errno
+import shutil
+import difflib
+import filecmp
+import tempfile
+
+from config import WORKING_DIR, SANDBOX_ROOT, SANDBOX_STRATEGY
+from functions.dir_index import is_excluded
+
+try:
+    # Only for the reflink ioctl, which is Linux-only
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Linux ioctl number for "make this file a copy-on-write clone of that one"
+FICLONE = 0x40049409
+
+# Errors that mean "this file system can't do that", so we should fall back to copying
+UNSUPPORTED_ERRNOS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM, errno.ENOSYS}
+
+
+class Sandbox:
+    """
+    A private workspace copied from a source directory.
+
+    Usage:
+        with Sandbox(WORKING_DIR) as sandbox:
+            generate_content(client, messages, verbose, working_directory=sandbox.path)
+            print(sandbox.diff())
+            sandbox.commit()
+        # the workspace is deleted here
+    """
+
+    def __init__(self, source=WORKING_DIR, strategy=SANDBOX_STRATEGY, root=SANDBOX_ROOT):
+        self.source = os.path.abspath(source)
+        # Workspaces live next to the project (not in /tmp), so links and clones
+        # stay on the same file system as the source
+        os.makedirs(root, exist_ok=True)
+        self.temp_dir = tempfile.mkdtemp(prefix="run-", dir=root)
+        self.path = os.path.join(self.temp_dir, os.path.basename(self.source))
+        # relative path -> (mtime_ns, size) of each source file when the snapshot was taken,
+        # used to find changes and to notice if the source changed under us
+        self.snapshot = {}
+        self.strategy = strategy
+        try:
+            self._populate()
+        except BaseException:
+            self.cleanup()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def _populate(self):
+        """Clones every file of the source tree into the workspace."""
+        for relative_path in _walk_files(self.source):
+            source_file = os.path.join(self.source, relative_path)
+            target_file = os.path.join(self.path, relative_path)
+            os.makedirs(os.path.dirname(target_file), exist_ok=True)
+            stat = os.stat(source_file)
+            self.snapshot[relative_path] = (stat.st_mtime_ns, stat.st_size)
+            self._clone(source_file, target_file)
+        # Empty directories too
+        os.makedirs(self.path, exist_ok=True)
+
+    def _clone(self, source_file, target_file):
+        if self.strategy in ("auto", "reflink"):
+            try:
+                _reflink(source_file, target_file)
+                self.strategy = "reflink"
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                # Don't try again for every file
+                self.strategy = "copy"
+        elif self.strategy == "hardlink":
+            try:
+                os.link(source_file, target_file)
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                self.strategy = "copy"
+        shutil.copy2(source_file, target_file)
+
+    def changes(self):
+        """
+        Compares the workspace with the source.
+        Returns {"added": [...], "modified": [...], "deleted": [...]} with sorted relative paths.
+        """
+        current = set(_walk_files(self.path))
+        original = set(self.snapshot)
+        modified = []
+        for relative_path in sorted(current & original):
+            workspace_file = os.path.join(self.path, relative_path)
+            source_file = os.path.join(self.source, relative_path)
+            # Untouched hardlinks are the same file; untouched clones and copies keep the
+            # original size and mtime, so filecmp only reads files whose stats differ
+            if not os.path.exists(source_file):
+                modified.append(relative_path)
+            elif not os.path.samefile(workspace_file, source_file) and not filecmp.cmp(workspace_file, source_file):
+                modified.append(relative_path)
+        return {
+            "added": sorted(current - original),
+            "modified": modified,
+            "deleted": sorted(original - current),
+        }
+
+    def diff(self):
+        """Returns the workspace's changes as a unified diff (binary files are only named)."""
+        changes = self.changes()
+        lines = []
+        for status in ("added", "modified", "deleted"):
+            for relative_path in changes[status]:
+                old = [] if status == "added" else _read_lines(os.path.join(self.source, relative_path))
+                new = [] if status == "deleted" else _read_lines(os.path.join(self.path, relative_path))
+                if old is None or new is None:
+                    lines.append(f"Binary file {relative_path} {status}\n")
+                    continue
+                for line in difflib.unified_diff(
+                    old, new,
+                    fromfile="/dev/null" if status == "added" else f"a/{relative_path}",
+                    tofile="/dev/null" if status == "deleted" else f"b/{relative_path}",
+                ):
+                    # A last line without a newline is marked like diff -u does, instead of
+                    # running into the next line
+                    lines.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+        return "".join(lines)
+
+    def commit(self):
+        """
+        Copies the workspace's changes back to the source directory.
+        A file that also changed in the source since the snapshot is left alone (both versions
+        are kept - the source's in place, ours in the workspace until cleanup).
+
+        Returns:
+            (committed, conflicts): lists of relative paths
+        """
+        changes = self.changes()
+        committed = []
+        conflicts = []
+        for status in ("added", "modified", "deleted"):
+            for relative_path in changes[status]:
+                source_file = os.path.join(self.source, relative_path)
+                if self._source_changed(relative_path):
+                    conflicts.append(relative_path)
+                    continue
+                if status == "deleted":
+                    os.remove(source_file)
+                else:
+                    os.makedirs(os.path.dirname(source_file), exist_ok=True)
+                    _copy_atomic(os.path.join(self.path, relative_path), source_file)
+                committed.append(relative_path)
+        return committed, conflicts
+
+    def _source_changed(self, relative_path):
+        """True if the source file was created, changed or deleted after the snapshot."""
+        try:
+            stat = os.stat(os.path.join(self.source, relative_path))
+        except FileNotFoundError:
+            return relative_path in self.snapshot
+        return self.snapshot.get(relative_path) != (stat.st_mtime_ns, stat.st_size)
+
+    def cleanup(self):
+        """Deletes the workspace."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+def _walk_files(root):
+    """Yields the relative path of every file under root, skipping LIST_DEFAULT_EXCLUDES."""
+    for directory, dir_names, file_names in os.walk(root):
+        dir_names[:] = [name for name in dir_names if not is_excluded(name)]
+        for name in file_names:
+            if not is_excluded(name):
+                yield os.path.relpath(os.path.join(directory, name), root)
+
+
+def _reflink(source_file, target_file):
+    """Clones a file with copy-on-write (Linux FICLONE), keeping its timestamps and permissions."""
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "reflink is not supported on this platform")
+    with open(source_file, "rb") as source, open(target_file, "wb") as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(target_file)
+            raise
+    shutil.copystat(source_file, target_file)
+
+
+def _copy_atomic(source_file, target_file):
+    """Copies a file over another with a rename, so readers never see it half-written."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_file), prefix=".tmp-")
+    os.close(fd)
+    try:
+        shutil.copy2(source_file, temp_path)
+        os.replace(temp_path, target_file)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _read_lines(path):
+    """Returns a text file's lines, or None for binary files."""
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return f.readlines()
+    except UnicodeDecodeError:
+        return None
@@ -1,4 +1,23 @@
+import os
+import sys
+import tempfile
+
+from google.genai import types
+
+from call_function import call_function, call_functions
+from compaction import compact_messages, estimate_tokens, COMPACTED_MARKER
+from config import WORKING_DIR
+from tool_cache import tool_cache
+from sandbox import Sandbox
 from functions.run_python import run_python_file
+from functions import python_pool
+from functions.python_pool import enable_worker_pool, PythonWorkerPool
+from functions.output_capture import run_bounded
+from functions.get_file_content import get_file_content
+from functions.get_files_info import get_files_info
+from functions.edit_file import edit_file
+from functions.search_code import search_code
+from functions.run_tests import run_tests
 
 
 def test():
@@ -15,5 +34,293 @@ def test():
     print(result)
 
 
+
+def test_parallel_calls():
+    # Write, read, write again and read again in one turn: the calls run in parallel, but
+    # each read must see the write it comes after
+    path = os.path.join(WORKING_DIR, "smoke_notes.txt")
+    calls = [
+        types.FunctionCall(name="write_file", args={"file_path": "smoke_notes.txt", "content": "first"}),
+        types.FunctionCall(name="get_file_content", args={"file_path": "smoke_notes.txt"}),
+        types.FunctionCall(name="write_file", args={"file_path": "smoke_notes.txt", "content": "second"}),
+        types.FunctionCall(name="get_file_content", args={"file_path": "smoke_notes.txt"}),
+    ]
+    try:
+        results = [content.parts[0].function_response.response["result"] for content in call_functions(calls)]
+        print(results)
+        assert results[1] == "first", results
+        assert results[3] == "second", results
+    finally:
+        os.remove(path)
+
+
+
+def test_compaction():
+    # Read main.py, rewrite it, read it again: the first read is stale and gets replaced
+    def turn(name, args, result):
+        return [
+            types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]),
+            types.Content(role="tool", parts=[types.Part.from_function_response(name=name, response={"result": result})]),
+        ]
+
+    messages = [types.Content(role="user", parts=[types.Part(text="Fix main.py")])]
+    messages += turn("get_file_content", {"file_path": "main.py"}, "old line\n" * 500)
+    messages += turn("write_file", {"file_path": "main.py", "content": "new line\n" * 500}, "Successfully wrote")
+    messages += turn("get_file_content", {"file_path": "main.py"}, "new line\n" * 500)
+
+    tokens_before = estimate_tokens(messages)
+    saved = compact_messages(messages, token_budget=1500)
+    print(f"Compaction saved {saved} of {tokens_before} tokens")
+    first_read = messages[2].parts[0].function_response.response["result"]
+    last_read = messages[6].parts[0].function_response.response["result"]
+    assert first_read.startswith(COMPACTED_MARKER) and "rewritten" in first_read, first_read
+    assert last_read == "new line\n" * 500
+    assert saved > 0 and estimate_tokens(messages) <= 1500, estimate_tokens(messages)
+
+
+
+def test_tool_cache():
+    # The second read is a cache hit; a write drops the cached read, so the third read sees the new text
+    path = os.path.join(WORKING_DIR, "smoke_cache.txt")
+    with open(path, "w") as f:
+        f.write("aaaa")
+    read = types.FunctionCall(name="get_file_content", args={"file_path": "smoke_cache.txt"})
+    write = types.FunctionCall(name="write_file", args={"file_path": "smoke_cache.txt", "content": "bbbb"})
+
+    def result(function_call):
+        return call_function(function_call).parts[0].function_response.response["result"]
+
+    try:
+        key = tool_cache.make_key("get_file_content", {"file_path": "smoke_cache.txt", "working_directory": WORKING_DIR})
+        hits = tool_cache.hits
+        assert result(read) == "aaaa"
+        assert result(read) == "aaaa" and tool_cache.hits == hits + 1
+        result(write)
+        print(tool_cache.stats())
+        assert key not in tool_cache.entries
+        assert result(read) == "bbbb"
+    finally:
+        os.remove(path)
+
+
+
+def test_warm_pool():
+    # Same scripts again, this time through the warm worker pool
+    enable_worker_pool()
+
+    result = run_python_file("calculator", "tests.py")
+    print(result)
+
+    result = run_python_file("calculator", "main.py", ["3 + 5"])
+    print(result)
+
+    # A crashed worker whose replacement can't start still leaves its slot in the pool
+    pool = PythonWorkerPool(size=1)
+    script = ["python", os.path.abspath("calculator/main.py"), "1 + 1"]
+    working_script = python_pool.WORKER_SCRIPT
+    try:
+        python_pool.WORKER_SCRIPT = "/nonexistent/python_worker.py"
+        pool.idle.queue[0].process.kill()
+        for _ in range(2):
+            try:
+                pool.run(script, os.path.abspath("calculator"), 30)
+                assert False, "expected the dead worker to fail"
+            except RuntimeError as e:
+                print(e)
+    finally:
+        python_pool.WORKER_SCRIPT = working_script
+    result = pool.run(script, os.path.abspath("calculator"), 30)
+    assert result.returncode == 0 and "2" in result.stdout, result
+    pool.close()
+
+
+
+def test_bounded_output():
+    # 100000 numbered lines with a 1000-byte limit: only the first and last lines are kept
+    script = "for i in range(100000): print(i)"
+    result = run_bounded([sys.executable, "-c", script], cwd=".", timeout=30, limit=1000)
+    print(result.stdout[:60], "...", result.stdout[-60:])
+    assert result.stdout.startswith("0\n1\n") and result.stdout.endswith("99999\n"), result.stdout
+    assert "output truncated" in result.stdout and len(result.stdout) < 1200, len(result.stdout)
+    assert not result.output_limit_exceeded
+
+    # A script that never stops printing is killed once it passes kill_bytes
+    result = run_bounded([sys.executable, "-c", "while True: print('spam')"], cwd=".", timeout=30, limit=1000, kill_bytes=1_000_000)
+    assert result.output_limit_exceeded and len(result.stdout) < 1200, len(result.stdout)
+
+
+
+def test_ranged_read():
+    # First page of main.py, then the page after it
+    result = get_file_content("calculator", "main.py", length=100)
+    print(result)
+
+    result = get_file_content("calculator", "main.py", offset=100, length=100)
+    print(result)
+
+    # A negative length or offset is an error, not a way around the MAX_CHARS limit
+    result = get_file_content("calculator", "lorem.txt", length=-1)
+    print(result)
+    assert result.startswith("Error"), result
+    result = get_file_content("calculator", "main.py", offset=-5)
+    assert result.startswith("Error"), result
+
+    # An offset past the end, or a file ending in half a character, can't make paging loop forever
+    result = get_file_content("calculator", "main.py", offset=10_000_000)
+    print(result)
+    assert result.startswith("Error: offset 10000000 is past the end of the file"), result
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "euro.txt"), "wb") as f:
+            f.write(b"abc\xe2\x82")
+        result = get_file_content(directory, "euro.txt", offset=3)
+        print(result)
+        assert result.startswith("Error"), result
+
+        # A page shorter than one character still returns that character
+        with open(os.path.join(directory, "euro.txt"), "wb") as f:
+            f.write("\u20ac\u20ac".encode("utf-8"))
+        result = get_file_content(directory, "euro.txt", length=1)
+        assert result.startswith("\u20ac[...") and "continue with offset=3" in result, result
+
+
+
+def test_edit_file():
+    # Change one line of a script and change it back, once with edits and once with a diff
+    result = edit_file("calculator", "hello.py", edits=[{"search": "Hello, world!", "replace": "Hello, edit!"}])
+    print(result)
+
+    diff = "--- a/hello.py\n+++ b/hello.py\n@@ -1 +1 @@\n-print(\"Hello, edit!\")\n\\ No newline at end of file\n+print(\"Hello, world!\")\n\\ No newline at end of file\n"
+    result = edit_file("calculator", "hello.py", diff=diff)
+    print(result)
+
+    # Search text that isn't in the file - nothing is written
+    result = edit_file("calculator", "hello.py", edits=[{"search": "missing", "replace": "x"}])
+    print(result)
+
+    # Diff hunks match whole lines, in files with any line endings, and only in one place
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "code.py"), "w", newline="") as f:
+            f.write("def f(x):\r\n    return x\r\n\r\ndef g(x):\r\n    return x\r\n")
+        os.chmod(os.path.join(directory, "code.py"), 0o640)
+
+        result = edit_file(directory, "code.py", diff="@@ -2 +2 @@\n-return x\n+return y\n")
+        print(result)
+        assert "not found" in result, result
+
+        result = edit_file(directory, "code.py", diff="@@ -2 +2 @@\n-    return x\n+    return y\n")
+        print(result)
+        assert "match 2 places" in result, result
+
+        result = edit_file(directory, "code.py", diff="@@ -4,2 +4,2 @@\n def g(x):\n-    return x\n+    return 2 * x\n")
+        print(result)
+        with open(os.path.join(directory, "code.py"), newline="") as f:
+            assert f.read() == "def f(x):\r\n    return x\r\n\r\ndef g(x):\r\n    return 2 * x\r\n"
+        assert os.stat(os.path.join(directory, "code.py")).st_mode & 0o777 == 0o640
+
+
+
+def test_recursive_listing():
+    # A symlink to a directory outside the sandbox is listed, but its contents are not
+    with tempfile.TemporaryDirectory() as directory:
+        sandbox = os.path.join(directory, "sandbox")
+        outside = os.path.join(directory, "outside")
+        os.makedirs(os.path.join(sandbox, "pkg"))
+        os.makedirs(outside)
+        with open(os.path.join(sandbox, "pkg", "inside.py"), "w") as f:
+            f.write("")
+        with open(os.path.join(outside, "secret.txt"), "w") as f:
+            f.write("secret")
+        os.symlink(outside, os.path.join(sandbox, "link"))
+
+        result = get_files_info(sandbox, recursive=True)
+        print(result)
+        assert "pkg/inside.py" in result and "- link:" in result, result
+        assert "secret.txt" not in result, result
+
+
+
+def test_search_code():
+    result = search_code("calculator", "_emit_operator")
+    print(result)
+    assert "pkg/calculator.py" in result, result
+
+    result = search_code("calculator", "Calculator", mode="symbol")
+    print(result)
+
+    result = search_code("calculator", r"def test_\w+", mode="regex", max_results=3)
+    print(result)
+
+
+
+def test_sandbox():
+    # Changes made in the workspace reach the source on commit, except for a file that
+    # also changed in the source in the meantime
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "project")
+        os.makedirs(source)
+        for name in ("a.txt", "b.txt", "c.txt"):
+            with open(os.path.join(source, name), "w") as f:
+                f.write(name)
+
+        with Sandbox(source, strategy="copy", root=os.path.join(directory, "runs")) as sandbox:
+            with open(os.path.join(sandbox.path, "a.txt"), "w") as f:
+                f.write("edited a")
+            with open(os.path.join(sandbox.path, "b.txt"), "w") as f:
+                f.write("edited b")
+            os.remove(os.path.join(sandbox.path, "c.txt"))
+            with open(os.path.join(sandbox.path, "d.txt"), "w") as f:
+                f.write("new")
+            # Someone else changes b.txt in the source while the run is going
+            with open(os.path.join(source, "b.txt"), "w") as f:
+                f.write("changed in source")
+
+            diff = sandbox.diff()
+            print(diff)
+            assert "+edited a\n\\ No newline at end of file\n--- a/b.txt" in diff, diff
+            committed, conflicts = sandbox.commit()
+            print(committed, conflicts)
+            assert committed == ["d.txt", "a.txt", "c.txt"], committed
+            assert conflicts == ["b.txt"], conflicts
+
+        with open(os.path.join(source, "a.txt")) as f:
+            assert f.read() == "edited a"
+        with open(os.path.join(source, "b.txt")) as f:
+            assert f.read() == "changed in source"
+        assert not os.path.exists(os.path.join(source, "c.txt"))
+        assert os.path.exists(os.path.join(source, "d.txt"))
+
+
+
+def test_run_tests():
+    # The first run runs every test file, the second one has nothing to re-run
+    result = run_tests("calculator")
+    print(result)
+
+    result = run_tests("calculator")
+    print(result)
+
+    result = run_tests("calculator", tests=["tests.py"], run_all=True)
+    print(result)
+
+    # A test file with a syntax error is still run, so the error is reported instead of hidden
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "tests.py"), "w") as f:
+            f.write("import unittest\n\nclass T(unittest.TestCase)\n    pass\n")
+        result = run_tests(directory, tests=["tests.py"])
+        print(result)
+        assert "PROBLEM tests.py" in result and "SyntaxError" in result and "line 3" in result, result
+
+
 if __name__ == "__main__":
-    test()
\ No newline at end of file
+    test()
+    test_parallel_calls()
+    test_compaction()
+    test_tool_cache()
+    test_warm_pool()
+    test_bounded_output()
+    test_ranged_read()
+    test_edit_file()
+    test_recursive_listing()
+    test_search_code()
+    test_sandbox()
+    test_run_tests()
@@ -0,0 +1,134 @@
+# Tool result cache
+# The AI often reads the same file or lists the same directory several times in one run.
+# Instead of hitting the disk again, call_function keeps recent results here and reuses them
+# as long as the file (or directory) they came from hasn't changed.
+
+# Standard library for file stats and path handling
+import os
+# Standard library for building a stable text form of the function arguments
+import json
+# Ordered dictionary that remembers usage order - perfect for "least recently used" eviction
+from collections import OrderedDict
+# Lock so parallel function calls (see call_functions) can share the cache safely
+import threading
+
+# Size limits for the cache
+from config import TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_MAX_BYTES
+
+
+# Functions whose results only depend on their arguments and the file/directory they look at
+CACHEABLE_FUNCTIONS = {"get_file_content", "get_files_info"}
+
+
+def file_fingerprint(path):
+    """
+    Returns a cheap fingerprint of a file or directory that changes whenever it is modified.
+    Uses (modification time, size, inode) from os.stat - no need to read the file itself.
+    Returns None if the path doesn't exist (so "file not found" results are cached too,
+    until the file shows up).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def target_path(args):
+    """Returns the absolute path of the file or directory a tool call looks at."""
+    relative_path = args.get("file_path") or args.get("directory") or ""
+    return os.path.abspath(os.path.join(args["working_directory"], relative_path))
+
+
+class ToolResultCache:
+    """
+    A size-capped LRU (least recently used) cache of tool results.
+
+    Each entry is keyed by:
+    - the function name
+    - the normalized arguments (paths resolved to absolute paths)
+    - the fingerprint of the file/directory the call looks at
+    So an entry is automatically ignored as soon as its file changes on disk.
+    """
+
+    def __init__(self, max_entries=TOOL_CACHE_MAX_ENTRIES, max_bytes=TOOL_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (absolute target path, result string), oldest first
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def make_key(self, function_name, args):
+        """Builds the cache key for a call (args must include the injected working_directory)."""
+        path = target_path(args)
+        other_args = {
+            name: value for name, value in args.items()
+            if name not in ("working_directory", "file_path", "directory")
+        }
+        return (
+            function_name,
+            path,
+            json.dumps(other_args, sort_keys=True, default=str),
+            file_fingerprint(path),
+        )
+
+    def get(self, key):
+        """Returns the cached result for a key, or None (and counts the hit or miss)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            # Mark as recently used so it is evicted last
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key):
+        """Returns the cached result for a key, or None, without counting a hit or miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry[1] if entry is not None else None
+
+    def put(self, key, result):
+        """Stores a result, evicting the least recently used entries if over the limits."""
+        if not isinstance(result, str) or len(result) > self.max_bytes:
+            return
+        with self.lock:
+            old_entry = self.entries.pop(key, None)
+            if old_entry is not None:
+                self.total_bytes -= len(old_entry[1])
+            self.entries[key] = (key[1], result)
+            self.total_bytes += len(result)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def invalidate(self, path):
+        """
+        Drops every entry for a changed path, plus listings of the directories that contain it
+        (their sizes or entries may have changed too).
+        """
+        path = os.path.abspath(path)
+        with self.lock:
+            for key in list(self.entries):
+                cached_path = self.entries[key][0]
+                if cached_path == path or path.startswith(cached_path.rstrip(os.sep) + os.sep):
+                    self.total_bytes -= len(self.entries.pop(key)[1])
+
+    def clear(self):
+        """Drops everything (used after running a script, which could have changed any file)."""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """Returns a short summary of hits and misses, for --verbose output."""
+        return f"Tool cache: {self.hits} hits, {self.misses} misses, {len(self.entries)} entries"
+
+
+# The one shared cache used by call_function
+tool_cache = ToolResultCache()
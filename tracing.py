@@ -0,0 +1,128 @@
+# Tracing for the agent loop
+# Records how long each part of a run takes (model calls, function dispatch, tool bodies),
+# along with token counts, result sizes and cache hits, so we can see where the
+# 20-iteration budget and the wall-clock time actually go.
+# Enabled with --trace=FILE: ".json" files get Chrome trace-event format (open them in
+# chrome://tracing or https://ui.perfetto.dev), anything else gets one JSON object per line.
+
+# Standard library for writing the trace file
+import json
+# Standard library for thread ids (parallel function calls run in worker threads)
+import threading
+# Standard library for high-resolution timing
+import time
+# Standard library for building "with tracer.span(...)" blocks
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Collects timed spans. Does nothing (and costs almost nothing) until enable() is called.
+
+    Usage:
+        with tracer.span("model_call", "model", iteration=3) as span_args:
+            response = ...
+            span_args["tokens_in"] = response.usage_metadata.prompt_token_count
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+    def enable(self):
+        """Turns tracing on and resets the clock and any recorded spans."""
+        self.enabled = True
+        self.spans = []
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """
+        Times the code inside the "with" block.
+        Yields a dictionary; anything put into it is stored with the span.
+        """
+        if not self.enabled:
+            yield args
+            return
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(name, category, started, **args)
+
+    def now(self):
+        """Returns a start time for record()."""
+        return time.perf_counter()
+
+    def record(self, name, category, started, **args):
+        """Stores a span that began at `started` (from now()) and ends right now."""
+        if not self.enabled:
+            return
+        ended = time.perf_counter()
+        record = {
+            "name": name,
+            "cat": category,
+            "ts": round((started - self.start) * 1e6),  # microseconds since the run started
+            "dur": round((ended - started) * 1e6),      # microseconds
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.spans.append(record)
+
+    def write(self, path):
+        """Writes all spans to a file (Chrome trace format for .json, JSON lines otherwise)."""
+        with self.lock:
+            spans = list(self.spans)
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                events = [
+                    {
+                        "name": span["name"], "cat": span["cat"], "ph": "X",
+                        "ts": span["ts"], "dur": span["dur"], "pid": 1,
+                        "tid": span["tid"], "args": span["args"],
+                    }
+                    for span in spans
+                ]
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+            else:
+                for span in spans:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    def summary(self):
+        """
+        Returns a text table with count, total, mean and max time for each span name,
+        plus token totals and tool cache hits.
+        """
+        with self.lock:
+            spans = list(self.spans)
+
+        rows = {}
+        tokens_in = tokens_out = cache_hits = dispatches = 0
+        for span in spans:
+            row = rows.setdefault((span["cat"], span["name"]), [0, 0, 0])
+            row[0] += 1
+            row[1] += span["dur"]
+            row[2] = max(row[2], span["dur"])
+            tokens_in += span["args"].get("tokens_in") or 0
+            tokens_out += span["args"].get("tokens_out") or 0
+            if span["name"] == "call_function":
+                dispatches += 1
+                cache_hits += 1 if span["args"].get("cache_hit") else 0
+
+        lines = [f"{'category':<14}{'span':<22}{'count':>7}{'total ms':>12}{'mean ms':>11}{'max ms':>11}"]
+        for (category, name), (count, total, longest) in sorted(rows.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{category:<14}{name:<22}{count:>7}{total / 1000:>12.1f}{total / count / 1000:>11.1f}{longest / 1000:>11.1f}"
+            )
+        lines.append(
+            f"tokens in: {tokens_in}, tokens out: {tokens_out}, "
+            f"tool cache hits: {cache_hits}/{dispatches} function calls"
+        )
+        return "\n".join(lines)
+
+
+# The one shared tracer
+tracer = Tracer()